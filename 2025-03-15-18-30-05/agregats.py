@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Indicateurs des tableaux de bord tenus à jour à l'arrivée des données.
+
+Les panneaux relisaient à chaque image tout l'historique (max, min, somme
+d'une fenêtre) et toute la table Q (moyenne des maxima), puis réinterrogeaient
+SUMO pour chaque feu. Ici, chaque valeur est intégrée une fois, au moment où
+elle arrive : sommes courantes, maximum et minimum d'une fenêtre glissante par
+files monotones, compteurs par feu. Un panneau ne lit plus que des valeurs
+déjà calculées, en O(1), quelle que soit la taille de la table Q ou de
+l'historique.
+"""
+
+from collections import deque
+
+LONGUEUR = 100  # Valeurs gardées par fenêtre glissante
+
+
+class FenetreGlissante:
+    """Dernières valeurs d'une série, avec somme, maximum et minimum tenus à jour"""
+
+    def __init__(self, longueur=LONGUEUR):
+        self.longueur = longueur
+        self.vider()
+
+    def vider(self):
+        self.valeurs = deque(maxlen=self.longueur)
+        self.somme = 0
+        self.n = 0  # Valeurs reçues depuis vider() ; la fenêtre couvre les indices >= n - longueur
+        # (indice, valeur), valeurs décroissantes (resp. croissantes) : la tête est le max (resp. min)
+        self.maxima = deque()
+        self.minima = deque()
+
+    def ajouter(self, valeur):
+        if len(self.valeurs) == self.longueur:
+            self.somme -= self.valeurs[0]
+        self.valeurs.append(valeur)
+        self.somme += valeur
+        while self.maxima and self.maxima[-1][1] <= valeur:
+            self.maxima.pop()
+        self.maxima.append((self.n, valeur))
+        while self.minima and self.minima[-1][1] >= valeur:
+            self.minima.pop()
+        self.minima.append((self.n, valeur))
+        self.n += 1
+        debut = self.n - self.longueur
+        if self.maxima[0][0] < debut:
+            self.maxima.popleft()
+        if self.minima[0][0] < debut:
+            self.minima.popleft()
+
+    @property
+    def max(self):
+        return self.maxima[0][1] if self.maxima else 0
+
+    @property
+    def min(self):
+        return self.minima[0][1] if self.minima else 0
+
+    @property
+    def moyenne(self):
+        return self.somme / len(self.valeurs) if self.valeurs else 0.0
+
+    @property
+    def derniere(self):
+        return self.valeurs[-1] if self.valeurs else 0
+
+    def __len__(self):
+        return len(self.valeurs)
+
+    def __iter__(self):
+        return iter(self.valeurs)
+
+    def __reversed__(self):
+        return reversed(self.valeurs)
+
+
+class CompteursFeux:
+    """Par feu : dernière attente, changements sur une fenêtre glissante et depuis le début ; totaux courants"""
+
+    def __init__(self, longueur=LONGUEUR):
+        self.longueur = longueur
+        self.vider()
+
+    def vider(self):
+        self.attentes = {}  # Feu -> dernière attente connue
+        self.decisions = {}  # Feu -> FenetreGlissante des actions (1 = changement)
+        self.changements_cumules = {}  # Feu -> changements depuis vider()
+        self.attente_totale = 0
+        self.changements = 0  # Somme des changements de toutes les fenêtres
+
+    def noter(self, tl_id, attente, action):
+        if tl_id not in self.decisions:
+            self.decisions[tl_id] = FenetreGlissante(self.longueur)
+            self.changements_cumules[tl_id] = 0
+        self.attente_totale += attente - self.attentes.get(tl_id, 0)
+        self.attentes[tl_id] = attente
+        fenetre = self.decisions[tl_id]
+        avant = fenetre.somme
+        fenetre.ajouter(int(action))
+        self.changements += fenetre.somme - avant
+        self.changements_cumules[tl_id] += int(action)
+
+    @property
+    def attente_moyenne(self):
+        return self.attente_totale / max(1, len(self.attentes))
+
+    def __len__(self):
+        return len(self.attentes)
+
+
+class MoyenneMaxQ:
+    """Moyenne sur les états de la table Q de la meilleure valeur d'action, tenue à jour entrée par entrée"""
+
+    def __init__(self, q_table=None):
+        self.reconstruire(q_table or {})
+
+    def reconstruire(self, q_table):
+        """Recalcule tout (table Q chargée depuis un fichier ou remplacée)"""
+        self.maxima = {cle: max(valeurs) for cle, valeurs in q_table.items()}
+        self.somme = sum(self.maxima.values())
+
+    def noter(self, cle, valeurs):
+        """À appeler après chaque modification de q_table[cle]"""
+        nouveau = max(valeurs)
+        self.somme += nouveau - self.maxima.get(cle, 0)
+        self.maxima[cle] = nouveau
+
+    @property
+    def moyenne(self):
+        return self.somme / len(self.maxima) if self.maxima else 0.0
+
+    def __len__(self):
+        return len(self.maxima)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Empreintes de contenu pour les caches sur disque.
+
+Une clé de cache est le SHA-256 des entrées qui déterminent un résultat :
+contenu des fichiers, paramètres, graines. Tant qu'aucune entrée ne change, la
+clé reste la même et le résultat en cache peut être réutilisé.
+"""
+
+import os
+import json
+import hashlib
+import xml.etree.ElementTree as ET
+
+DOSSIER_CACHE = "cache"
+
+_empreintes_fichiers = {}  # (chemin, taille, date) -> empreinte, pour ne pas relire les gros fichiers
+
+
+def empreinte_fichier(chemin):
+    """SHA-256 du contenu d'un fichier"""
+    stat = os.stat(chemin)
+    cle = (os.path.abspath(chemin), stat.st_size, stat.st_mtime_ns)
+    if cle not in _empreintes_fichiers:
+        h = hashlib.sha256()
+        with open(chemin, "rb") as f:
+            for bloc in iter(lambda: f.read(1 << 20), b""):
+                h.update(bloc)
+        _empreintes_fichiers[cle] = h.hexdigest()
+    return _empreintes_fichiers[cle]
+
+
+def empreinte(*elements):
+    """SHA-256 d'éléments sérialisables en JSON (paramètres, autres empreintes...)"""
+    texte = json.dumps(elements, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texte.encode("utf-8")).hexdigest()
+
+
+def fichiers_config(config_file):
+    """Fichiers d'entrée référencés par un .sumocfg (réseau, routes, additionnels)"""
+    dossier = os.path.dirname(config_file)
+    fichiers = []
+    racine = ET.parse(config_file).getroot()
+    entrees = racine.find("input")
+    if entrees is not None:
+        for element in entrees:
+            for nom in element.get("value", "").split(","):
+                nom = nom.strip()
+                if nom:
+                    fichiers.append(os.path.join(dossier, nom))
+    return fichiers
+
+
+def empreinte_config(config_file):
+    """Empreinte d'une configuration SUMO et de tous les fichiers qu'elle charge"""
+    return empreinte(empreinte_fichier(config_file),
+                     [empreinte_fichier(f) for f in fichiers_config(config_file)])
+
+
+def chemin_cache(categorie, cle, extension=""):
+    """Chemin d'une entrée de cache, regroupée par catégorie"""
+    dossier = os.path.join(DOSSIER_CACHE, categorie)
+    os.makedirs(dossier, exist_ok=True)
+    return os.path.join(dossier, cle[:16] + extension)
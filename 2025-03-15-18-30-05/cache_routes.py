@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de routes précalculées.
+
+osm.sumocfg charge des fichiers *.trips.xml : SUMO calcule l'itinéraire de
+chaque trip à l'insertion, à chaque exécution et à chaque traci.load. Ce module
+route une fois toute la demande avec duarouter (une classe de véhicules par
+processus), range les .rou.xml dans cache/routes sous l'empreinte du réseau,
+des trips et des options, et génère une configuration qui pointe vers eux.
+
+Utilisation :
+    python cache_routes.py                 # construit les routes et la configuration
+    python cache_routes.py --mesurer 300   # compare démarrage et premiers pas
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from cache_contenu import empreinte, empreinte_fichier, empreinte_config, chemin_cache
+from scenarios_curriculum import fichiers_routes, fichier_reseau, ecrire_config
+
+if "SUMO_HOME" in os.environ:
+    sys.path.append(os.path.join(os.environ["SUMO_HOME"], "tools"))
+import sumolib
+
+config_file = "osm.sumocfg"
+
+# Options de duarouter, alignées sur le routage fait par randomTrips.py (-r) dans build.bat
+OPTIONS_DUAROUTER = ["--ignore-errors", "--repair", "--remove-loops",
+                     "--begin", "0", "--end", "3600",
+                     "--no-step-log", "--no-warnings"]
+
+
+def router_demande(net_file, trips, options=OPTIONS_DUAROUTER):
+    """Route un fichier trips ; renvoie le .rou.xml en cache (calculé au besoin)"""
+    cle = empreinte(empreinte_fichier(net_file), empreinte_fichier(trips), options)
+    nom = os.path.basename(trips).replace(".trips.xml", "")
+    sortie = chemin_cache("routes", cle, f".{nom}.rou.xml")
+    if not os.path.exists(sortie):
+        # Nom propre au processus (routages concurrents) ; alternatives non écrites : rien ne reste à côté
+        temporaire = f"{sortie}.{os.getpid()}.tmp"
+        subprocess.run([sumolib.checkBinary("duarouter"), "-n", net_file, "--route-files", trips,
+                        "-o", temporaire, "--alternatives-output", "/dev/null"] + list(options), check=True)
+        os.replace(temporaire, sortie)  # Une entrée de cache n'est jamais à moitié écrite
+    return sortie
+
+
+def construire_routes(base=config_file, workers=None):
+    """Route en parallèle tous les fichiers trips d'une configuration"""
+    net_file = fichier_reseau(base)
+    sources = fichiers_routes(base)
+    # duarouter tourne dans des sous-processus : des threads suffisent à les paralléliser
+    with ThreadPoolExecutor(max_workers=workers or len(sources)) as pool:
+        routes = list(pool.map(
+            lambda f: router_demande(net_file, f) if f.endswith(".trips.xml") else f, sources))
+    return routes
+
+
+def config_routee(base=config_file, workers=None):
+    """Configuration équivalente à `base` qui charge les routes précalculées"""
+    config = chemin_cache("routes", empreinte(empreinte_config(base), OPTIONS_DUAROUTER),
+                          "." + os.path.basename(base))
+    if not os.path.exists(config):
+        ecrire_config(base, config, construire_routes(base, workers))
+    return config
+
+
+def mesurer(config, pas=300):
+    """Durée de démarrage et durée moyenne des premiers pas d'une configuration"""
+    import traci
+
+    label = f"mesure_{os.path.basename(config)}"
+    debut = time.perf_counter()
+    traci.start([sumolib.checkBinary("sumo"), "-c", config, "--no-step-log", "true"], label=label)
+    conn = traci.getConnection(label)
+    demarrage = time.perf_counter() - debut
+    debut = time.perf_counter()
+    for _ in range(pas):
+        conn.simulationStep()
+    duree_pas = (time.perf_counter() - debut) / pas
+    conn.close()
+    return demarrage, duree_pas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Routes précalculées pour les configurations SUMO")
+    parser.add_argument("--config", default=config_file)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--mesurer", type=int, metavar="PAS", default=0,
+                        help="comparer démarrage et durée des premiers pas avec la configuration trips")
+    args = parser.parse_args()
+
+    debut = time.perf_counter()
+    config = config_routee(args.config, args.workers)
+    print(f"Configuration routée : {config} ({time.perf_counter() - debut:.1f}s)")
+
+    if args.mesurer:
+        for nom, c in (("trips", args.config), ("routes", config)):
+            demarrage, duree_pas = mesurer(c, args.mesurer)
+            print(f"{nom:<7} : démarrage {demarrage:.2f}s, {duree_pas * 1000:.2f} ms/pas "
+                  f"sur les {args.mesurer} premiers pas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Cache des textes rendus et placement des étiquettes pour les tableaux de bord pygame.
+
+font.render rastérise le texte à chaque appel : c'est le poste le plus
+coûteux d'une image quand chaque véhicule, chaque feu et chaque libellé est
+redessiné 30 fois par seconde. CacheTextes garde les surfaces déjà rendues,
+sous la clé (police, texte, couleur), dans un LRU borné en octets.
+PlacementEtiquettes écarte les étiquettes hors de la zone visible ou qui en
+chevaucheraient une déjà posée, et plafonne leur nombre : le coût des
+étiquettes ne croît plus avec le nombre de véhicules.
+"""
+
+from collections import OrderedDict
+
+import pygame
+
+OCTETS_MAX = 16 * 1024 * 1024  # Mémoire des surfaces gardées en cache
+N_ETIQUETTES = 60  # Étiquettes posées au plus par image
+
+
+class CacheTextes:
+    """LRU des surfaces de texte, borné par la mémoire totale des surfaces"""
+
+    def __init__(self, octets_max=OCTETS_MAX):
+        self.octets_max = octets_max
+        self.surfaces = OrderedDict()
+        self.octets = 0
+        self.succes = 0
+        self.echecs = 0
+
+    def rendre(self, police, texte, couleur, antialias=True):
+        """Surface du texte, rendue au premier appel puis reprise du cache"""
+        cle = (police, texte, tuple(couleur), antialias)
+        surface = self.surfaces.get(cle)
+        if surface is not None:
+            self.surfaces.move_to_end(cle)
+            self.succes += 1
+            return surface
+
+        self.echecs += 1
+        surface = police.render(texte, antialias, couleur)
+        self.surfaces[cle] = surface
+        self.octets += _taille(surface)
+        # Évincer les moins récemment utilisées, en gardant toujours la dernière
+        while self.octets > self.octets_max and len(self.surfaces) > 1:
+            _, ancienne = self.surfaces.popitem(last=False)
+            self.octets -= _taille(ancienne)
+        return surface
+
+    def vider(self):
+        self.surfaces.clear()
+        self.octets = 0
+
+
+def _taille(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+class PlacementEtiquettes:
+    """Étiquettes d'une image : visibles, sans chevauchement, en nombre borné"""
+
+    def __init__(self, zone, n_max=N_ETIQUETTES, cellule=32):
+        self.zone = pygame.Rect(zone)
+        self.n_max = n_max
+        self.cellule = cellule
+        self.grille = {}  # Cellule -> rectangles déjà posés qui la touchent
+        self.n = 0
+
+    def _cellules(self, rect):
+        c = self.cellule
+        for i in range(rect.left // c, rect.right // c + 1):
+            for j in range(rect.top // c, rect.bottom // c + 1):
+                yield i, j
+
+    @property
+    def plein(self):
+        """Plus aucune étiquette ne sera posée : inutile de mesurer les suivantes"""
+        return self.n >= self.n_max
+
+    def placer(self, rect):
+        """Réserve `rect` s'il est entièrement visible et ne chevauche aucune étiquette posée"""
+        if self.n >= self.n_max or not self.zone.contains(rect):
+            return False
+        cellules = list(self._cellules(rect))
+        for cellule in cellules:
+            if rect.collidelist(self.grille.get(cellule, ())) != -1:
+                return False
+        for cellule in cellules:
+            self.grille.setdefault(cellule, []).append(rect)
+        self.n += 1
+        return True
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Canal de visualisation hors processus.
+
+Le processus d'entraînement (ou de simulation) publie à chaque pas un état
+compact — positions et vitesses des véhicules, états des feux, congestion,
+récompense, entrées modifiées de la table Q — sur une socket TCP locale.
+Les tableaux de bord s'y abonnent comme processus séparés, à leur propre
+cadence, et peuvent se connecter ou partir à tout moment.
+
+Le producteur ne bloque jamais : sockets non bloquantes, au plus une trame
+en attente par spectateur. Un spectateur qui n'a pas fini de lire la trame
+précédente perd les suivantes (pas de contre-pression) et reçoit, dès qu'il
+est de nouveau prêt, une trame complète avec toute la table Q pour se
+resynchroniser. Chaque trame n'est encodée qu'une fois pour tous les
+spectateurs, et rien n'est encodé quand personne n'écoute.
+
+Trame : longueur de l'en-tête et de la charge (2 x uint32), en-tête JSON,
+puis positions (N x 2) et vitesses (N) en float32.
+"""
+
+import json
+import time
+import socket
+import struct
+
+import numpy as np
+
+HOTE = "127.0.0.1"
+PORT = 8765
+PERIODE = 1 / 30  # s entre deux trames : inutile de publier plus vite qu'un écran
+ATTENTE_RECONNEXION = 1.0  # s entre deux tentatives de connexion d'un abonné
+ENTETE_TRAME = struct.Struct("!II")
+
+
+def encoder(entete, positions, vitesses):
+    """Trame binaire d'un état : en-tête JSON et tableaux float32"""
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+    vitesses = np.asarray(vitesses, dtype=np.float32).reshape(-1)
+    texte = json.dumps(entete, separators=(",", ":"), default=lambda o: o.item()).encode("utf-8")  # Scalaires numpy
+    charge = positions.tobytes() + vitesses.tobytes()
+    return ENTETE_TRAME.pack(len(texte), len(charge)) + texte + charge
+
+
+def decoder(texte, charge):
+    """Inverse d'encoder (sans l'en-tête de longueurs) : dictionnaire avec positions et vitesses"""
+    message = json.loads(texte.decode("utf-8"))
+    n = len(message["vehicules"])
+    tableau = np.frombuffer(charge, dtype=np.float32)
+    message["positions"] = tableau[:2 * n].reshape(n, 2)
+    message["vitesses"] = tableau[2 * n:3 * n]
+    return message
+
+
+def message_instantane(instantane, recompense=0.0):
+    """En-tête et tableaux d'une trame à partir d'un Instantane (instantanes.py)"""
+    congestion = instantane.series["congestion"]
+    entete = {
+        "numero": instantane.numero,
+        "temps": instantane.temps,
+        "vehicules": list(instantane.vehicules),
+        "feux": list(instantane.feux),
+        "etats_feux": list(instantane.etats_feux),
+        "congestion": float(congestion[-1]) if len(congestion) else 0.0,
+        "recompense": float(recompense),
+    }
+    return entete, instantane.positions, instantane.vitesses
+
+
+class _Spectateur:
+    def __init__(self, sock, adresse):
+        self.sock = sock
+        self.adresse = adresse
+        self.attente = b""  # Reste de la trame en cours d'envoi
+        self.resynchroniser = True  # Prochaine trame : table Q complète
+        self.perdues = 0
+
+
+class Diffuseur:
+    """Côté producteur : accepte les spectateurs et leur envoie les trames sans jamais attendre"""
+
+    def __init__(self, q_table=None, positions_feux=None, hote=HOTE, port=PORT, periode=PERIODE):
+        self.q_table = q_table if q_table is not None else {}
+        self.positions_feux = positions_feux or {}
+        self.periode = periode
+        self.derniere = 0.0
+        self.q_modifiees = set()
+        self.spectateurs = []
+        self.serveur = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.serveur.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.serveur.bind((hote, port))
+        self.serveur.listen()
+        self.serveur.setblocking(False)
+
+    def noter_q(self, cle):
+        """Signale une entrée de la table Q modifiée (envoyée dans la prochaine trame)"""
+        self.q_modifiees.add(cle)
+
+    def accepter(self):
+        """Accepte les spectateurs en attente, sans bloquer ; renvoie le nombre de spectateurs"""
+        while True:
+            try:
+                sock, adresse = self.serveur.accept()
+            except (BlockingIOError, InterruptedError):
+                return len(self.spectateurs)
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.spectateurs.append(_Spectateur(sock, adresse))
+
+    def _envoyer(self, spectateur):
+        """Envoie ce que la socket accepte sans attendre ; retire le spectateur s'il est parti"""
+        try:
+            n = spectateur.sock.send(spectateur.attente)
+            spectateur.attente = spectateur.attente[n:]
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            self._retirer(spectateur)
+
+    def _retirer(self, spectateur):
+        spectateur.sock.close()
+        self.spectateurs.remove(spectateur)
+
+    def _table_q(self, cles):
+        return [[tl_id, etat, [float(v) for v in self.q_table[(tl_id, etat)]]] for tl_id, etat in cles]
+
+    def publier(self, fabriquer, forcer=False):
+        """`fabriquer` renvoie (en-tête, positions, vitesses) ; appelé seulement si une trame part"""
+        if not self.accepter():
+            self.q_modifiees.clear()  # Un nouveau spectateur commencera par une trame complète
+            return
+        maintenant = time.perf_counter()
+        if not forcer and maintenant - self.derniere < self.periode:
+            return
+        self.derniere = maintenant
+
+        for spectateur in list(self.spectateurs):
+            if spectateur.attente:
+                self._envoyer(spectateur)
+        prets = [s for s in self.spectateurs if not s.attente]
+        for spectateur in self.spectateurs:
+            if spectateur.attente:
+                spectateur.perdues += 1
+                spectateur.resynchroniser = True  # Les modifications de Q de cette trame lui échappent
+        if not prets:
+            self.q_modifiees.clear()
+            return
+
+        entete, positions, vitesses = fabriquer()
+        trames = {}
+        for spectateur in prets:
+            complete = spectateur.resynchroniser
+            if complete not in trames:
+                if complete:
+                    q = self._table_q(self.q_table)
+                    extra = {"q": q, "q_complete": True, "positions_feux": self.positions_feux}
+                else:
+                    extra = {"q": self._table_q(self.q_modifiees), "q_complete": False}
+                trames[complete] = encoder(dict(entete, **extra), positions, vitesses)
+            spectateur.attente = trames[complete]
+            spectateur.resynchroniser = False
+            self._envoyer(spectateur)
+        self.q_modifiees.clear()
+
+    def fermer(self):
+        for spectateur in list(self.spectateurs):
+            self._retirer(spectateur)
+        self.serveur.close()
+
+
+class Abonne:
+    """Côté tableau de bord : lit sans attendre et ne garde que la trame la plus récente"""
+
+    def __init__(self, hote=HOTE, port=PORT):
+        self.adresse = (hote, port)
+        self.sock = None
+        self.recu = bytearray()
+        self.dernier_essai = float("-inf")
+        self.q_table = {}  # Reconstituée trame après trame (complète, puis modifications)
+        self.positions_feux = {}
+        self.trames = 0
+
+    @property
+    def connecte(self):
+        return self.sock is not None
+
+    def _connecter(self):
+        maintenant = time.perf_counter()
+        if maintenant - self.dernier_essai < ATTENTE_RECONNEXION:
+            return
+        self.dernier_essai = maintenant
+        try:
+            self.sock = socket.create_connection(self.adresse, timeout=0.2)
+        except OSError:
+            self.sock = None
+            return
+        self.sock.setblocking(False)
+        self.recu.clear()
+
+    def fermer(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def _lire(self):
+        while self.sock is not None:
+            try:
+                donnees = self.sock.recv(1 << 20)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                donnees = b""
+            if not donnees:  # Producteur arrêté : on réessaiera plus tard
+                self.fermer()
+                return
+            self.recu += donnees
+
+    def recevoir(self):
+        """Trame la plus récente arrivée depuis l'appel précédent, ou None"""
+        if self.sock is None:
+            self._connecter()
+            if self.sock is None:
+                return None
+        self._lire()
+
+        dernier = None
+        debut = 0
+        while len(self.recu) - debut >= ENTETE_TRAME.size:
+            n_entete, n_charge = ENTETE_TRAME.unpack_from(self.recu, debut)
+            fin = debut + ENTETE_TRAME.size + n_entete + n_charge
+            if len(self.recu) < fin:
+                break
+            milieu = debut + ENTETE_TRAME.size + n_entete
+            message = decoder(bytes(self.recu[debut + ENTETE_TRAME.size:milieu]), bytes(self.recu[milieu:fin]))
+            # Les modifications de Q de toutes les trames sont appliquées, même celles qu'on n'affiche pas
+            if message["q_complete"]:
+                self.q_table = {}
+                self.positions_feux = {tl_id: tuple(p) for tl_id, p in message["positions_feux"].items()}
+            for tl_id, etat, valeurs in message["q"]:
+                self.q_table[(tl_id, etat)] = valeurs
+            dernier = message
+            self.trames += 1
+            debut = fin
+        del self.recu[:debut]
+        return dernier
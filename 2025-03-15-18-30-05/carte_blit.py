@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Carte Matplotlib à artistes persistants, redessinée par blitting.
+
+Le réseau, les noms des feux et les axes forment un fond statique dessiné une
+seule fois puis copié (copy_from_bbox) ; à chaque image, seuls les artistes
+animés sont mis à jour en place (set_offsets, set_segments...) et recopiés
+sur ce fond. Le coût d'une image ne dépend plus du nombre d'artistes créés :
+un nuage de points pour tous les véhicules, une LineCollection pour toutes
+les trajectoires. Quand les véhicules visibles sont trop nombreux pour la
+vue, une image de densité (ou de vitesse moyenne) par cases les remplace.
+"""
+
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.image import AxesImage
+
+from carte_densite import NiveauDetail, forme_grille, grille, COULEURS_MPL, VITESSE_MAX
+
+N_ETIQUETTES = 30  # Étiquettes de véhicules affichées au plus (les plus proches du centre de la vue)
+COULEURS_FEUX = {"r": "red", "y": "orange", "g": "green"}
+
+
+def couleur_feu(etat):
+    """Couleur d'un feu d'après son état rouge/jaune/vert (rouge si une voie est au rouge)"""
+    etat = etat.lower()
+    for c in ("r", "y", "g"):
+        if c in etat:
+            return COULEURS_FEUX[c]
+    return "gray"
+
+
+class CarteBlit:
+    """Carte des véhicules, trajectoires et feux sur un axe Matplotlib intégré à Qt"""
+
+    def __init__(self, canvas, ax, titre="", n_etiquettes=N_ETIQUETTES):
+        self.canvas = canvas
+        self.ax = ax
+        ax.set_title(titre)
+        ax.set_xlabel('X (m)')
+        ax.set_ylabel('Y (m)')
+        ax.set_aspect('equal', adjustable='datalim')
+        ax.grid(True)
+
+        # Fond statique
+        self.reseau = LineCollection([], colors='0.8', linewidths=0.5, zorder=1)
+        ax.add_collection(self.reseau)
+
+        # Artistes animés : jamais dessinés par canvas.draw(), seulement par blitting
+        self.trajectoires = LineCollection([], colors='b', alpha=0.3, linewidths=0.5, animated=True, zorder=2)
+        ax.add_collection(self.trajectoires)
+        self.vehicules = ax.scatter([], [], s=12, c='b', animated=True, zorder=3)
+        self.feux = ax.scatter([], [], s=60, marker='s', animated=True, zorder=4)
+        self.etiquettes = [ax.text(0, 0, "", fontsize=6, animated=True, visible=False, zorder=5)
+                           for _ in range(n_etiquettes)]
+        # Carte de densité : remplace marqueurs et étiquettes quand les véhicules visibles sont trop nombreux
+        self.densite = AxesImage(ax, interpolation='nearest', origin='lower', alpha=0.8, animated=True, zorder=2)
+        self.densite.set_data(np.zeros((1, 1)))
+        self.densite.set_visible(False)
+        ax.add_image(self.densite)
+        self.niveau_detail = NiveauDetail()
+        self.carte = "densite"  # "vitesse" : vitesse moyenne par case
+        self.animes = [self.densite, self.trajectoires, self.vehicules, self.feux] + self.etiquettes
+
+        self.fond = None
+        canvas.mpl_connect('draw_event', self._sur_dessin)
+
+    def definir_fond(self, segments=(), feux=None, limites=None):
+        """Réseau (liste de polylignes), feux {id: (x, y)} et limites (xmin, ymin, xmax, ymax)"""
+        self.reseau.set_segments([np.asarray(s) for s in segments])
+        if feux:
+            self.feux.set_offsets(np.array(list(feux.values())))
+            for tl_id, (x, y) in feux.items():
+                self.ax.text(x, y, tl_id, fontsize=7, zorder=1)
+        if limites is not None:
+            xmin, ymin, xmax, ymax = limites
+            self.ax.set_xlim(xmin, xmax)
+            self.ax.set_ylim(ymin, ymax)
+        self.canvas.draw_idle()  # Le draw_event qui suit capture le nouveau fond
+
+    def _sur_dessin(self, event):
+        # Redessin complet (premier affichage, redimensionnement, changement de fond) : recopier le fond
+        self.fond = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._dessiner_animes()
+
+    def _dessiner_animes(self):
+        for artiste in self.animes:
+            self.ax.draw_artist(artiste)
+
+    def mettre_a_jour(self, positions, ids=(), trajectoires=(), couleurs_feux=None, etiquettes=True, vitesses=None):
+        """Met à jour les artistes animés puis les recopie sur le fond"""
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        if couleurs_feux is not None:
+            self.feux.set_color(couleurs_feux)
+        (xmin, xmax), (ymin, ymax) = self.ax.get_xlim(), self.ax.get_ylim()
+        visibles = np.flatnonzero((positions[:, 0] >= xmin) & (positions[:, 0] <= xmax)
+                                  & (positions[:, 1] >= ymin) & (positions[:, 1] <= ymax))
+
+        # Niveau de détail : trop de véhicules visibles pour les pixels de la vue -> densité par cases
+        largeur, hauteur = self.ax.bbox.width, self.ax.bbox.height
+        densite = self.niveau_detail.choisir(len(visibles), largeur, hauteur)
+        self.densite.set_visible(densite)
+        self.vehicules.set_visible(not densite)
+        self.trajectoires.set_visible(not densite)
+        if densite:
+            mode = self.carte if vitesses is not None else "densite"
+            valeurs, comptes = grille(positions[visibles], None if vitesses is None else np.asarray(vitesses)[visibles],
+                                      (xmin, xmax, ymin, ymax), forme_grille(largeur, hauteur), mode)
+            self.densite.set_data(np.ma.masked_where(comptes == 0, valeurs).T)  # Lignes = y pour l'image
+            self.densite.set_cmap(COULEURS_MPL[mode])
+            self.densite.set_clim(0, VITESSE_MAX if mode == "vitesse" else max(valeurs.max(), 1.0))
+            self.densite.set_extent((xmin, xmax, ymin, ymax))
+        else:
+            self.vehicules.set_offsets(positions)
+            self.trajectoires.set_segments([t for t in trajectoires if len(t) > 1])
+
+        # Étiquettes : uniquement les véhicules visibles, les plus proches du centre de la vue
+        choisis = []
+        if etiquettes and not densite and len(ids):
+            centre = np.array([(xmin + xmax) / 2, (ymin + ymax) / 2])
+            distances = np.sum((positions[visibles] - centre) ** 2, axis=1)
+            choisis = visibles[np.argsort(distances)[:len(self.etiquettes)]]
+        for texte, i in zip(self.etiquettes, choisis):
+            texte.set_position(positions[i])
+            texte.set_text(ids[i])
+            texte.set_visible(True)
+        for texte in self.etiquettes[len(choisis):]:
+            texte.set_visible(False)
+
+        if self.fond is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.fond)
+        self._dessiner_animes()
+        self.canvas.blit(self.ax.bbox)
+
+
+class CourbesTemps:
+    """Courbes temporelles mises à jour en place (set_data) au lieu d'être retracées"""
+
+    def __init__(self, canvas, ax, styles, titre="", xlabel="", ylabel=""):
+        self.canvas = canvas
+        self.ax = ax
+        self.lignes = [ax.plot([], [], style)[0] for style in styles]
+        ax.set_title(titre)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.grid(True)
+
+    def mettre_a_jour(self, *series):
+        """Une série (x, y) par courbe"""
+        for ligne, (x, y) in zip(self.lignes, series):
+            ligne.set_data(x, y)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.canvas.draw_idle()  # Regroupe les demandes : au plus un dessin par tour de boucle Qt
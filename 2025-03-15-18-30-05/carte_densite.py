@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Niveau de détail des cartes : marqueurs par véhicule ou carte de densité.
+
+Quand les véhicules visibles sont trop nombreux pour la surface de la carte
+(vue d'ensemble, toutes les demandes chargées), dessiner un point et une
+étiquette par véhicule ne montre plus rien et coûte cher. NiveauDetail
+décide du mode d'après le nombre de véhicules visibles rapporté aux pixels
+de la vue (donc selon le zoom), avec une hystérésis pour ne pas clignoter.
+grille() agrège alors les positions en cases de TAILLE_CASE pixels par un
+histogramme 2D vectorisé : nombre de véhicules ou vitesse moyenne par case.
+Le coût du rendu dépend de la taille de l'écran, plus du nombre de véhicules.
+Module sans dépendance graphique : utilisé par la carte pygame et par CarteBlit.
+"""
+
+import numpy as np
+
+SEUIL_VEHICULES = 400  # Véhicules visibles au-delà desquels on passe toujours en densité
+PIXELS_PAR_VEHICULE = 150  # Surface d'écran qu'il faut à un marqueur et son étiquette pour rester lisibles
+HYSTERESIS = 0.8  # Retour aux marqueurs seulement sous 80 % du seuil
+TAILLE_CASE = 8  # px par case de la grille
+VITESSE_MAX = 13.89  # m/s, haut de l'échelle des vitesses (50 km/h)
+VIDE = (0, 0, 0)  # Couleur des cases vides (transparente côté pygame)
+
+
+def _palette(*couleurs):
+    """Table de 256 couleurs interpolées entre des couleurs repères"""
+    reperes = np.linspace(0, 255, len(couleurs))
+    return np.stack([np.interp(np.arange(256), reperes, [c[k] for c in couleurs]) for k in range(3)],
+                    axis=1).astype(np.uint8)
+
+
+# Aucune couleur noire : le noir est réservé aux cases vides
+PALETTES = {
+    "densite": _palette((255, 240, 150), (255, 140, 0), (180, 0, 0)),
+    "vitesse": _palette((200, 0, 0), (240, 220, 0), (0, 170, 0)),  # Rouge à l'arrêt, vert à VITESSE_MAX
+}
+COULEURS_MPL = {"densite": "YlOrRd", "vitesse": "RdYlGn"}  # Équivalents Matplotlib
+
+
+class NiveauDetail:
+    """Choix marqueurs / densité selon les véhicules visibles par pixel, avec hystérésis"""
+
+    def __init__(self, seuil=SEUIL_VEHICULES, pixels_par_vehicule=PIXELS_PAR_VEHICULE):
+        self.seuil = seuil
+        self.pixels_par_vehicule = pixels_par_vehicule
+        self.densite = False
+
+    def choisir(self, n_visibles, largeur, hauteur):
+        """True si la carte doit passer (ou rester) en densité"""
+        capacite = min(self.seuil, largeur * hauteur / self.pixels_par_vehicule)
+        if self.densite:
+            self.densite = n_visibles > capacite * HYSTERESIS
+        else:
+            self.densite = n_visibles > capacite
+        return self.densite
+
+
+def forme_grille(largeur, hauteur, taille_case=TAILLE_CASE):
+    """Nombre de cases (x, y) pour une vue de largeur x hauteur pixels"""
+    return max(int(largeur) // taille_case, 1), max(int(hauteur) // taille_case, 1)
+
+
+def grille(points, vitesses, bornes, forme, mode="densite"):
+    """Histogramme 2D des positions sur bornes (x0, x1, y0, y1) : (valeurs, comptes), indexés [x, y]
+
+    mode "densite" : valeurs = véhicules par case ; "vitesse" : vitesse moyenne par case.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    x0, x1, y0, y1 = bornes
+    plages = [sorted((x0, x1)), sorted((y0, y1))]
+    comptes, _, _ = np.histogram2d(points[:, 0], points[:, 1], bins=forme, range=plages)
+    if mode == "vitesse":
+        sommes, _, _ = np.histogram2d(points[:, 0], points[:, 1], bins=forme, range=plages, weights=vitesses)
+        valeurs = np.divide(sommes, comptes, out=np.zeros_like(sommes), where=comptes > 0)
+    else:
+        valeurs = comptes
+    return valeurs, comptes
+
+
+def couleurs(valeurs, comptes, mode="densite", vmax=None):
+    """Image RVB (x, y, 3) de la grille ; cases vides en VIDE"""
+    if vmax is None:
+        vmax = VITESSE_MAX if mode == "vitesse" else max(valeurs.max(), 1.0)
+    indices = np.clip(valeurs / vmax * 255, 0, 255).astype(np.uint8)
+    image = PALETTES[mode][indices]
+    image[comptes == 0] = VIDE
+    return image
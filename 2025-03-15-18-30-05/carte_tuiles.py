@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Fond de carte pygame : géométrie du réseau rendue en tuiles.
+
+La forme des voies est lue une fois dans osm.net.xml.gz (en flux), mise en
+cache sous l'empreinte du réseau, puis dessinée dans des tuiles de
+TAILLE_TUILE pixels, une grille par niveau de zoom. Le zoom avance par
+paliers fixes : une tuile rendue reste valable tant que son niveau est
+affiché, et le fond d'une image ne coûte qu'un blit par tuile visible, quel
+que soit le nombre de voies. Vue porte la transformation monde -> écran
+commune au fond, aux véhicules et aux feux.
+"""
+
+import os
+import gzip
+import math
+import xml.etree.ElementTree as ET
+from collections import namedtuple, OrderedDict
+
+import numpy as np
+import pygame
+
+from cache_contenu import empreinte, empreinte_fichier, chemin_cache
+
+TAILLE_TUILE = 256  # px
+FACTEUR_ZOOM = 2 ** 0.5  # Rapport d'échelle entre deux niveaux
+NIVEAUX_ZOOM = 12  # Niveaux au-delà de la vue d'ensemble
+NIVEAUX_PRERENDUS = 3  # Niveaux rendus entièrement au démarrage
+OCTETS_TUILES = 128 * 1024 * 1024  # Mémoire des tuiles gardées en cache
+LARGEUR_VOIE = 3.2  # m
+COULEUR_FOND = (240, 240, 240)
+COULEURS_VOIES = [(150, 150, 150), (210, 210, 210)]  # Voies ouvertes aux véhicules, voies piétonnes
+VERSION_GEOMETRIE = 1  # À incrémenter si le format du cache change
+
+Geometrie = namedtuple("Geometrie", ["points", "debuts", "categories", "limites"])
+
+
+def lire_geometrie(net_file):
+    """Polylignes des voies (hors jonctions), concaténées, et limites du réseau"""
+    points, debuts, categories = [], [], []
+    limites = None
+    ouvrir = gzip.open if net_file.endswith(".gz") else open
+    with ouvrir(net_file, "rb") as f:
+        for _, element in ET.iterparse(f):
+            if element.tag == "location":
+                limites = tuple(float(v) for v in element.get("convBoundary").split(","))
+            elif element.tag == "edge":
+                if element.get("function") in (None, "normal"):
+                    for lane in element.iter("lane"):
+                        forme = [tuple(map(float, p.split(","))) for p in lane.get("shape").split()]
+                        debuts.append(len(points))
+                        points.extend(forme)
+                        categories.append(1 if lane.get("allow") == "pedestrian" else 0)
+                element.clear()
+            elif element.tag in ("junction", "connection", "tlLogic", "roundabout"):
+                element.clear()
+    points = np.array(points, dtype=np.float32).reshape(-1, 2)
+    if limites is None:
+        limites = (*points.min(axis=0), *points.max(axis=0))
+    return Geometrie(points, np.array(debuts, dtype=np.int64), np.array(categories, dtype=np.int8),
+                     np.array(limites, dtype=float))
+
+
+def geometrie_reseau(net_file):
+    """Géométrie du réseau, relue depuis le cache si le réseau n'a pas changé"""
+    cle = empreinte(empreinte_fichier(net_file), VERSION_GEOMETRIE)
+    chemin = chemin_cache("geometrie", cle, ".npz")
+    if os.path.exists(chemin):
+        with np.load(chemin) as donnees:
+            return Geometrie(*(donnees[nom] for nom in Geometrie._fields))
+    geometrie = lire_geometrie(net_file)
+    temporaire = chemin + ".tmp"
+    with open(temporaire, "wb") as f:
+        np.savez(f, **geometrie._asdict())
+    os.replace(temporaire, chemin)
+    return geometrie
+
+
+class Vue:
+    """Transformation monde -> écran d'une zone de carte : centre, niveau de zoom, taille"""
+
+    def __init__(self, limites, rect):
+        self.limites = tuple(float(v) for v in limites)
+        self.rect = pygame.Rect(rect)
+        xmin, ymin, xmax, ymax = self.limites
+        # Échelle du niveau 0 (réseau entier dans la zone) : fixée une fois, les tuiles en dépendent
+        self.echelle_base = min(self.rect.width / max(xmax - xmin, 1.0), self.rect.height / max(ymax - ymin, 1.0))
+        self.ajuster()
+
+    def ajuster(self):
+        """Vue d'ensemble du réseau"""
+        xmin, ymin, xmax, ymax = self.limites
+        self.niveau = 0
+        self.centre = ((xmin + xmax) / 2, (ymin + ymax) / 2)
+
+    def redimensionner(self, rect):
+        self.rect = pygame.Rect(rect)
+
+    @property
+    def echelle(self):
+        """Pixels par mètre au niveau courant"""
+        return echelle_niveau(self.echelle_base, self.niveau)
+
+    def origine(self):
+        """Position écran (locale à la zone, entière) du coin haut gauche du réseau"""
+        xmin, _, _, ymax = self.limites
+        e = self.echelle
+        return (round(self.rect.width / 2 - (self.centre[0] - xmin) * e),
+                round(self.rect.height / 2 - (ymax - self.centre[1]) * e))
+
+    def vers_ecran(self, points):
+        """Positions monde (N, 2) -> positions écran locales à la zone"""
+        xmin, _, _, ymax = self.limites
+        ox, oy = self.origine()
+        e = self.echelle
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return np.column_stack([ox + (points[:, 0] - xmin) * e, oy + (ymax - points[:, 1]) * e])
+
+    def vers_monde(self, x, y):
+        xmin, _, _, ymax = self.limites
+        ox, oy = self.origine()
+        e = self.echelle
+        return xmin + (x - ox) / e, ymax - (y - oy) / e
+
+    def deplacer(self, dx, dy):
+        """Glisser de (dx, dy) pixels"""
+        e = self.echelle
+        self.centre = (self.centre[0] - dx / e, self.centre[1] + dy / e)
+
+    def zoomer(self, pas, point):
+        """Change de `pas` niveaux en gardant fixe le point du monde sous `point` (écran local)"""
+        niveau = min(max(self.niveau + pas, 0), NIVEAUX_ZOOM)
+        if niveau == self.niveau:
+            return
+        x, y = self.vers_monde(*point)
+        self.niveau = niveau
+        e = self.echelle
+        self.centre = (x + (self.rect.width / 2 - point[0]) / e, y - (self.rect.height / 2 - point[1]) / e)
+
+
+def echelle_niveau(echelle_base, niveau):
+    return echelle_base * FACTEUR_ZOOM ** niveau
+
+
+class TuilesReseau:
+    """Tuiles du réseau rendues à la demande, une grille par niveau, gardées dans un LRU borné en octets"""
+
+    def __init__(self, geometrie, echelle_base, taille=TAILLE_TUILE, octets_max=OCTETS_TUILES):
+        self.geometrie = geometrie
+        self.echelle_base = echelle_base
+        self.taille = taille
+        self.octets_max = octets_max
+        self.surfaces = OrderedDict()  # (niveau, i, j) -> Surface
+        self.octets = 0
+        # Boîte englobante de chaque polyligne : sélection vectorisée des voies d'une tuile
+        self.fins = np.append(geometrie.debuts[1:], len(geometrie.points))
+        self.mins = np.minimum.reduceat(geometrie.points, geometrie.debuts, axis=0)
+        self.maxs = np.maximum.reduceat(geometrie.points, geometrie.debuts, axis=0)
+
+    def dimensions(self, niveau):
+        """Nombre de tuiles (colonnes, lignes) d'un niveau"""
+        xmin, ymin, xmax, ymax = self.geometrie.limites
+        cote = self.taille / echelle_niveau(self.echelle_base, niveau)
+        return max(math.ceil((xmax - xmin) / cote), 1), max(math.ceil((ymax - ymin) / cote), 1)
+
+    def _rendre(self, niveau, i, j):
+        xmin, _, _, ymax = self.geometrie.limites
+        e = echelle_niveau(self.echelle_base, niveau)
+        cote = self.taille / e
+        x0, y1 = xmin + i * cote, ymax - j * cote  # Coin haut gauche de la tuile, en mètres
+        largeur = max(int(LARGEUR_VOIE * e), 1)
+        marge = LARGEUR_VOIE
+        choisies = np.flatnonzero((self.maxs[:, 0] >= x0 - marge) & (self.mins[:, 0] <= x0 + cote + marge)
+                                  & (self.maxs[:, 1] >= y1 - cote - marge) & (self.mins[:, 1] <= y1 + marge))
+
+        surface = pygame.Surface((self.taille, self.taille))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()  # Format de l'écran : blit sans conversion
+        surface.fill(COULEUR_FOND)
+        points, categories = self.geometrie.points, self.geometrie.categories
+        # Voies piétonnes d'abord, voies routières par-dessus
+        for k in choisies[np.argsort(-categories[choisies], kind="stable")]:
+            forme = points[self.geometrie.debuts[k]:self.fins[k]]
+            if len(forme) < 2:
+                continue
+            ecran = np.column_stack([(forme[:, 0] - x0) * e, (y1 - forme[:, 1]) * e]).tolist()
+            pygame.draw.lines(surface, COULEURS_VOIES[categories[k]], False, ecran, largeur)
+        return surface
+
+    def tuile(self, niveau, i, j):
+        cle = (niveau, i, j)
+        surface = self.surfaces.get(cle)
+        if surface is not None:
+            self.surfaces.move_to_end(cle)
+            return surface
+        surface = self._rendre(niveau, i, j)
+        self.surfaces[cle] = surface
+        self.octets += surface.get_width() * surface.get_height() * surface.get_bytesize()
+        while self.octets > self.octets_max and len(self.surfaces) > 1:
+            _, ancienne = self.surfaces.popitem(last=False)
+            self.octets -= ancienne.get_width() * ancienne.get_height() * ancienne.get_bytesize()
+        return surface
+
+    def prerendre(self, niveaux=NIVEAUX_PRERENDUS):
+        """Rend d'avance toutes les tuiles des premiers niveaux (vue d'ensemble et zooms proches)"""
+        for niveau in range(niveaux):
+            colonnes, lignes = self.dimensions(niveau)
+            for i in range(colonnes):
+                for j in range(lignes):
+                    self.tuile(niveau, i, j)
+
+    def dessiner(self, cible, vue):
+        """Blitte les seules tuiles visibles de la vue sur `cible` ; renvoie leur nombre"""
+        ox, oy = vue.origine()
+        t = self.taille
+        colonnes, lignes = self.dimensions(vue.niveau)
+        largeur, hauteur = cible.get_size()
+        i0, i1 = max(-ox // t, 0), min((largeur - 1 - ox) // t, colonnes - 1)
+        j0, j1 = max(-oy // t, 0), min((hauteur - 1 - oy) // t, lignes - 1)
+        n = 0
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                cible.blit(self.tuile(vue.niveau, i, j), (ox + i * t, oy + j * t))
+                n += 1
+        return n
@@ -3,52 +3,143 @@
 Created on Tue Apr  1 22:30:20 2025
 
 @author: user
+
+Suivi de la densité, du débit et de l'occupation des voies contrôlées par les
+feux. Les mesures de chaque pas sont agrégées par fenêtres de temps fixes
+(consécutives, sans recouvrement), écrites dans un fichier de séries
+temporelles au fil de l'eau ; les dernières fenêtres closes restent dans un
+tampon circulaire pour l'affichage, et la console ne reçoit qu'un résumé par
+fenêtre.
 """
 
+import csv
+
+import numpy as np
 import traci
+import traci.constants as tc
+
+from profils_simulation import commande_sumo
 
 # Chemin vers ton fichier de configuration SUMO
 config_file = "osm.sumocfg"
+profil = "demo"  # "entrainement" pour la version sans interface graphique
+
+# Agrégation
+FENETRE = 60  # s simulées par fenêtre
+N_FENETRES = 60  # Fenêtres closes gardées en mémoire (tampon circulaire)
+FICHIER_SERIES = "densite_flux.csv"
+RESUME_CONSOLE = True  # Résumé des voies les plus chargées à la fin de chaque fenêtre
+N_VOIES_RESUME = 5
+
+VARIABLES = [tc.LAST_STEP_VEHICLE_NUMBER, tc.LAST_STEP_MEAN_SPEED, tc.LAST_STEP_OCCUPANCY]
+
+
+class FenetresFixes:
+    """Moyennes par fenêtre de temps fixe des mesures par voie ; dernières fenêtres dans un tampon circulaire"""
+
+    def __init__(self, n_voies, n_fenetres=N_FENETRES, mesures=("densite", "debit", "occupation")):
+        self.mesures = mesures
+        self.tampon = np.zeros((n_fenetres, len(mesures), n_voies))
+        self.debuts = np.full(n_fenetres, np.nan)  # Début (s) de chaque fenêtre du tampon
+        self.somme = np.zeros((len(mesures), n_voies))
+        self.n_pas = 0
+        self.n_fenetres = 0
+
+    def ajouter(self, valeurs):
+        """Cumule les mesures d'un pas (tableau mesures x voies)"""
+        self.somme += valeurs
+        self.n_pas += 1
+
+    def clore(self, debut):
+        """Termine la fenêtre courante ; renvoie ses moyennes (mesures x voies)"""
+        moyenne = self.somme / max(self.n_pas, 1)
+        indice = self.n_fenetres % len(self.tampon)
+        self.tampon[indice] = moyenne
+        self.debuts[indice] = debut
+        self.n_fenetres += 1
+        self.somme[:] = 0
+        self.n_pas = 0
+        return moyenne
+
+    def historique(self):
+        """Fenêtres gardées, de la plus ancienne à la plus récente"""
+        n = min(self.n_fenetres, len(self.tampon))
+        ordre = (np.arange(n) + self.n_fenetres - n) % len(self.tampon)
+        return self.debuts[ordre], self.tampon[ordre]
+
+
+def voies_controlees():
+    """Voies contrôlées par chaque feu (sans doublons) et longueurs, lues une seule fois"""
+    voies, feux = [], []
+    for tl_id in traci.trafficlight.getIDList():
+        for lane_id in dict.fromkeys(traci.trafficlight.getControlledLanes(tl_id)):
+            voies.append(lane_id)
+            feux.append(tl_id)
+    longueurs = np.array([traci.lane.getLength(lane_id) for lane_id in voies])
+    return voies, feux, longueurs
+
+
+def mesurer(voies, longueurs):
+    """Densité (véh/km), débit (véh/h) et occupation (%) de chaque voie au dernier pas"""
+    resultats = traci.lane.getAllSubscriptionResults()
+    n = np.array([resultats[v][tc.LAST_STEP_VEHICLE_NUMBER] for v in voies], dtype=float)
+    vitesse = np.array([max(resultats[v][tc.LAST_STEP_MEAN_SPEED], 0.0) for v in voies])
+    occupation = np.array([resultats[v][tc.LAST_STEP_OCCUPANCY] for v in voies])
+    densite = np.divide(n, longueurs, out=np.zeros_like(n), where=longueurs > 0) * 1000
+    debit = densite * vitesse * 3.6  # q = k.v
+    return np.stack([densite, debit, occupation])
+
+
+def ecrire_fenetre(f, writer, fenetres, debut, fin, voies, feux):
+    """Clôt la fenêtre courante, écrit ses moyennes (une ligne par voie) et son résumé console"""
+    moyenne = fenetres.clore(debut)
+    writer.writerows([debut, feux[i], voies[i]] + [round(float(v), 3) for v in moyenne[:, i]]
+                     for i in range(len(voies)))
+    f.flush()
+    if RESUME_CONSOLE:
+        afficher_resume(debut, fin, moyenne, fenetres, voies, feux)
 
-# Démarrer SUMO avec TraCI
-traci.start(["sumo-gui", "-c", config_file])  # Utilise "sumo" pour la version sans interface graphique
 
-# Boucle de simulation
-step = True
-while step:
-    traci.simulationStep()  # Avancer d'un pas de temps
+def afficher_resume(debut, fin, moyenne, fenetres, voies, feux):
+    """Résumé console : voies les plus denses de la fenêtre et tendance des fenêtres gardées"""
+    _, gardees = fenetres.historique()
+    densites = gardees[:, 0].mean(axis=1)  # Densité moyenne de chaque fenêtre gardée
+    print(f"[{debut:>6.0f}s - {fin:>6.0f}s] densité moyenne {moyenne[0].mean():.1f} véh/km, "
+          f"débit moyen {moyenne[1].mean():.0f} véh/h "
+          f"({len(densites)} dernières fenêtres : {densites.min():.1f} à {densites.max():.1f} véh/km)")
+    for i in np.argsort(moyenne[0])[::-1][:N_VOIES_RESUME]:
+        print(f"  Feu {feux[i]} voie {voies[i]} : {moyenne[0][i]:.1f} véh/km, "
+              f"{moyenne[1][i]:.0f} véh/h, occupation {moyenne[2][i]:.1f} %")
 
-    # Récupérer la liste des feux de signalisation
-    traffic_light_ids = traci.trafficlight.getIDList()
 
-    # Pour chaque feu de signalisation, récupérer la position, l'état et la densité de véhicules
-    for tl_id in traffic_light_ids:
-        # Récupérer la position du feu de signalisation
-        position = traci.junction.getPosition(tl_id)
+def main():
+    traci.start(commande_sumo(profil, config_file))
+    voies, feux, longueurs = voies_controlees()
+    for lane_id in voies:
+        traci.lane.subscribe(lane_id, VARIABLES)
+    fenetres = FenetresFixes(len(voies))
+    debut = traci.simulation.getTime()
 
-        # Récupérer l'état actuel du feu de signalisation
-        state = traci.trafficlight.getRedYellowGreenState(tl_id)
+    with open(FICHIER_SERIES, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["debut_fenetre", "feu", "voie", "densite_veh_km", "debit_veh_h", "occupation_pct"])
 
-        # Récupérer les identifiants des voies connectées au feu de signalisation
-        lane_ids = traci.trafficlight.getControlledLanes(tl_id)
+        # Jusqu'à ce que la simulation se soit vidée
+        while traci.simulation.getMinExpectedNumber() > 0:
+            traci.simulationStep()
+            fenetres.ajouter(mesurer(voies, longueurs))
+            if traci.simulation.getTime() - debut >= FENETRE:
+                ecrire_fenetre(f, writer, fenetres, debut, traci.simulation.getTime(), voies, feux)
+                debut = traci.simulation.getTime()
 
-        # Calculer la densité de véhicules sur chaque voie connectée
-        lane_densities = {}
-        for lane_id in lane_ids:
-            vehicle_ids = traci.lane.getLastStepVehicleIDs(lane_id)
-            lane_length = traci.lane.getLength(lane_id)
-            if lane_length > 0:
-                density = len(vehicle_ids) / lane_length
-            else:
-                density = 0
-            lane_densities[lane_id] = density
+        # Dernière fenêtre, incomplète : la simulation s'est vidée avant sa fin
+        if fenetres.n_pas > 0:
+            ecrire_fenetre(f, writer, fenetres, debut, traci.simulation.getTime(), voies, feux)
 
-        # Afficher les informations
-        print(f"Feu {tl_id} - Position : {position}, État : {state}")
-        for lane_id, density in lane_densities.items():
-            print(f"  Voie {lane_id} - Densité : {density:.2f} véhicules/mètre")
+    # Fermer TraCI
+    traci.close()
+    print(f"{fenetres.n_fenetres} fenêtres de {FENETRE}s écrites dans {FICHIER_SERIES}")
 
-    # step += 1
 
-# Fermer TraCI
-traci.close()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
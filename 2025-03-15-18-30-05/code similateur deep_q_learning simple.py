@@ -14,9 +14,11 @@ from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense
 from tensorflow.keras.optimizers import Adam
 
+from profils_simulation import commande_sumo
+
 # Configuration de SUMO
 config_file = "osm.sumocfg"
-traci.start(["sumo-gui", "-c", config_file])
+traci.start(commande_sumo("entrainement", config_file))
 
 # Paramètres DQL
 STATE_SIZE = 4  # Par exemple, densité des voies autour du feu
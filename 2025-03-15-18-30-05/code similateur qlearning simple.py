@@ -5,13 +5,26 @@ Created on Wed Apr  2 18:36:43 2025
 @author: user
 """
 
+import os
+import argparse
 import traci
 import random
 import numpy as np
 
+from ferme_evaluation import sauvegarder_q_table, etat_q_table
+from profils_simulation import commande_sumo
+from scenarios_curriculum import Curriculum, FICHIER_CURRICULUM
+from canal_visualisation import Diffuseur, message_instantane, PORT
+from instantanes import CollecteurInstantanes
+
 # Paramètres de simulation
 config_file = "osm.sumocfg"
+profil = "entrainement"  # "demo" pour suivre l'apprentissage dans sumo-gui
 simulation_steps = 100000
+q_table_file = "q_table.pkl"  # Point de contrôle évaluable par ferme_evaluation.py
+diffuser = False  # Publie l'état pour les tableaux de bord distants ("interface pygame final.py --distant")
+port_diffusion = PORT  # Un port par entraînement lancé en parallèle
+utiliser_curriculum = False  # True : suivre scenarios/curriculum.json (python scenarios_curriculum.py)
 
 # Paramètres Q-learning
 alpha = 0.1  # Taux d'apprentissage
@@ -23,10 +36,7 @@ q_table = {}
 
 def get_state(tl_id):
     """Récupère l'état du feu de signalisation (nombre de véhicules en attente)"""
-    state = 0
-    for lane in traci.trafficlight.getControlledLanes(tl_id):
-        state += traci.lane.getLastStepHaltingNumber(lane)
-    return state
+    return etat_q_table(traci, tl_id)  # Partagé avec ferme_evaluation.py : mêmes clés de table Q
 
 def get_reward(tl_id):
     """Calcule la récompense (négative du nombre de véhicules en attente)"""
@@ -69,12 +79,35 @@ def update_q_table(tl_id, state, action, reward, next_state):
 
     q_table[(tl_id, state)][action] = q_table[(tl_id, state)][action] + alpha * (reward + gamma * np.max(q_table[(tl_id, next_state)]) - q_table[(tl_id, state)][action])
 
+parser = argparse.ArgumentParser(description="Q-learning simple des feux")
+parser.add_argument("--diffuser", action="store_true", default=diffuser,
+                    help="publier l'état pour les tableaux de bord distants")
+parser.add_argument("--port", type=int, default=port_diffusion, help="port de diffusion")
+parser.add_argument("--curriculum", action="store_true", default=utiliser_curriculum,
+                    help="suivre le curriculum de demande réduite (python scenarios_curriculum.py)")
+args = parser.parse_args()
+if args.curriculum and not os.path.exists(FICHIER_CURRICULUM):
+    parser.error(f"{FICHIER_CURRICULUM} introuvable : lancer d'abord python scenarios_curriculum.py")
+
+# Curriculum de demande réduite, seulement sur demande explicite
+curriculum = Curriculum() if args.curriculum else None
+if curriculum is not None:
+    config_file = curriculum.config
+
 # Démarrer SUMO avec TraCI
-traci.start(["sumo-gui", "-c", config_file])
+traci.start(commande_sumo(profil, config_file))
+episode_reward = 0
+
+# Diffusion vers les spectateurs : ni abonnements ni encodage tant que personne n'est connecté
+if args.diffuser:
+    diffuseur = Diffuseur(q_table, {tl_id: traci.junction.getPosition(tl_id) for tl_id in traci.trafficlight.getIDList()},
+                          port=args.port)
+collecteur = None  # Créé à l'arrivée d'un spectateur, fermé quand le dernier part
 
 # Boucle de simulation
 for step in range(simulation_steps):
     traci.simulationStep()
+    step_reward = 0
 
     # Contrôle des feux de signalisation avec Q-learning
     for tl_id in traci.trafficlight.getIDList():
@@ -84,6 +117,35 @@ for step in range(simulation_steps):
         next_state = get_state(tl_id)
         reward = get_reward(tl_id)
         update_q_table(tl_id, state, action, reward, next_state)
+        episode_reward += reward
+        step_reward += reward
+        if args.diffuser:
+            diffuseur.noter_q((tl_id, state))
+            diffuseur.noter_q((tl_id, next_state))
+
+    if args.diffuser:
+        if diffuseur.accepter():
+            if collecteur is None:
+                collecteur = CollecteurInstantanes(traci)
+            collecteur.pas()
+            diffuseur.publier(lambda: message_instantane(collecteur.instantane(trajectoires=False), step_reward))
+        elif collecteur is not None:
+            collecteur.fermer()
+            collecteur = None
+
+    # Fin d'épisode : la simulation s'est vidée, on recharge (niveau suivant si le curriculum progresse)
+    if traci.simulation.getMinExpectedNumber() == 0:
+        if curriculum is not None:
+            curriculum.rapporter(episode_reward)
+            config_file = curriculum.config
+        traci.load(commande_sumo(profil, config_file)[1:])
+        episode_reward = 0
+        collecteur = None  # Les abonnements ne survivent pas au rechargement : recréé au pas suivant
 
 # Fermer TraCI
-traci.close()
\ No newline at end of file
+traci.close()
+if args.diffuser:
+    diffuseur.fermer()
+
+# Sauvegarder la table Q
+sauvegarder_q_table(q_table, q_table_file)
\ No newline at end of file
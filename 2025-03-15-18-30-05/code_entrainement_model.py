@@ -1,47 +1,125 @@
+import os
+import time
 import traci
+import traci.constants as tc
 import numpy as np
 import gymnasium as gym
 from stable_baselines3 import PPO
 from stable_baselines3.common.env_checker import check_env
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
+
+from profils_simulation import binaire_profil, config_profil
+from scenarios_curriculum import Curriculum, FICHIER_CURRICULUM
 
 # Configuration de SUMO
-sumo_binary = "sumo-gui"  # ou "sumo" pour la version sans interface graphique
+profil = "entrainement"  # ou "demo" pour la version avec interface graphique (une seule instance)
 sumo_config = "osm.sumocfg"
 
+# Environnements parallèles
+n_envs = 4  # Nombre de processus SUMO collectant les rollouts PPO
+dossier_sorties = "sorties_env"  # Un sous-dossier de sorties SUMO par instance
+mode_reseau = False  # True : un seul environnement contrôle tous les feux du réseau
+repetition_action = 1  # k : secondes simulées pendant lesquelles chaque action est maintenue
+utiliser_curriculum = False  # True : suivre scenarios/curriculum.json (python scenarios_curriculum.py)
+benchmark_repetitions = False  # True : comparer débit et qualité pour plusieurs k avant l'entraînement
+
+# Bibliothèque d'états de départ (reset rapide)
+n_etats_depart = 4  # États sauvegardés, répartis sur la période de demande
+duree_prechauffage = 300  # s simulées avant le premier état sauvegardé
+fin_demande = 3600  # Fin de la période de demande des fichiers trips (s)
+
 # Environnement personnalisé pour SUMO
 class SumoEnv(gym.Env):
-    def __init__(self):
+    def __init__(self, label="sumo_0", seed=None, output_dir=None,
+                 profil=profil, sumo_config=sumo_config, tl_id="tl1",
+                 n_etats=n_etats_depart, seed_sumo=None, options_sumo=()):
         super(SumoEnv, self).__init__()
         # Définir l'espace d'action et d'observation
         self.action_space = gym.spaces.Discrete(2)  # Actions : 0 = rouge, 1 = vert
         self.observation_space = gym.spaces.Box(low=0, high=100, shape=(3,), dtype=np.float32)  # Exemple d'état
 
+        # Chaque instance possède sa propre connexion TraCI nommée
+        self.label = label
+        self.profil = profil
+        self.sumo_config = sumo_config
+        self.tl_id = tl_id
+        self.seed_sumo = seed_sumo  # Graine SUMO imposée (évaluation), sinon tirée à chaque chargement
+        self.options_supplementaires = list(options_sumo)
+        self.output_dir = output_dir or os.path.join(dossier_sorties, label)
+        os.makedirs(self.output_dir, exist_ok=True)
+        if seed is not None:
+            super().reset(seed=seed)
+
         # Démarrer SUMO
-        traci.start([sumo_binary, "-c", sumo_config])
+        traci.start([binaire_profil(self.profil)] + self._options_sumo(), label=self.label)
+        self.conn = traci.getConnection(self.label)
 
         # Vérifier les arêtes disponibles
-        self.edge_ids = traci.edge.getIDList()
+        self.edge_ids = self.conn.edge.getIDList()
         if not self.edge_ids:
             raise ValueError("Aucune arête trouvée dans le réseau SUMO.")
-        print("Arêtes disponibles :", self.edge_ids)
+        print(f"[{self.label}] {len(self.edge_ids)} arêtes disponibles")
 
         # Utiliser la première arête disponible
         self.edge_id = self.edge_ids[0]
 
+        # Pré-chauffer une fois la simulation et sauvegarder les états de départ
+        self.n_etats = n_etats
+        self.etats_depart = self._construire_etats_depart(n_etats) if n_etats else []
+        self.duree_reset = 0.0
+
+    def _construire_etats_depart(self, n_etats):
+        """Sauvegarde n états répartis entre la fin du pré-chauffage et la fin de la demande"""
+        dossier = os.path.join(self.output_dir, "etats")
+        os.makedirs(dossier, exist_ok=True)
+        etats = []
+        for t in np.linspace(duree_prechauffage, fin_demande, n_etats, endpoint=False):
+            self.conn.simulationStep(float(t))
+            if self.conn.simulation.getMinExpectedNumber() == 0:
+                break
+            fichier = os.path.join(dossier, f"etat_{int(t)}.xml.gz")
+            self.conn.simulation.saveState(fichier)
+            etats.append(fichier)
+        return etats
+
+    def _options_sumo(self):
+        # Graine SUMO tirée du générateur de l'environnement, sorties isolées par instance
+        seed_sumo = self.seed_sumo if self.seed_sumo is not None else int(self.np_random.integers(2**31 - 1))
+        return ["-c", config_profil(self.profil, self.sumo_config),
+                "--seed", str(seed_sumo),
+                "--output-prefix", self.output_dir + os.sep] + self.options_supplementaires
+
+    def changer_config(self, sumo_config):
+        """Bascule sur une autre configuration (niveau de curriculum) sans relancer SUMO"""
+        self.sumo_config = sumo_config
+        self.conn.load(self._options_sumo())
+        self.etats_depart = self._construire_etats_depart(self.n_etats) if self.n_etats else []
+
     def reset(self, seed=None, options=None):
-        # Recharger la simulation
-        traci.load(["-c", sumo_config])
-        return self._get_state(), {}  # Retourner l'état et un dictionnaire vide (info)
+        super().reset(seed=seed)
+        debut = time.perf_counter()
+        if self.etats_depart:
+            # Restaurer un état pré-chauffé : le réseau reste chargé en mémoire
+            etat = self.etats_depart[self.np_random.integers(len(self.etats_depart))]
+            self.conn.simulation.loadState(etat)
+        else:
+            # Recharger la simulation
+            self.conn.load(self._options_sumo())
+        self.duree_reset = time.perf_counter() - debut
+        return self._get_state(), {"duree_reset": self.duree_reset}  # Retourner l'état et les infos
 
-    def step(self, action):
+    def _appliquer_action(self, action):
         # Appliquer l'action (changer le feu)
         if action == 0:
-            traci.trafficlight.setRedYellowGreenState("tl1", "rrrrGG")  # Feu rouge
+            self.conn.trafficlight.setRedYellowGreenState(self.tl_id, "rrrrGG")  # Feu rouge
         else:
-            traci.trafficlight.setRedYellowGreenState("tl1", "GGrrrr")  # Feu vert
+            self.conn.trafficlight.setRedYellowGreenState(self.tl_id, "GGrrrr")  # Feu vert
+
+    def step(self, action):
+        self._appliquer_action(action)
 
         # Avancer d'un pas de temps
-        traci.simulationStep()
+        self.conn.simulationStep()
 
         # Obtenir l'état suivant
         next_state = self._get_state()
@@ -50,7 +128,7 @@ class SumoEnv(gym.Env):
         reward = self._calculate_reward()
 
         # Vérifier si la simulation est terminée
-        done = traci.simulation.getMinExpectedNumber() == 0
+        done = self.conn.simulation.getMinExpectedNumber() == 0
 
         # Info supplémentaire (optionnel)
         info = {}
@@ -59,40 +137,261 @@ class SumoEnv(gym.Env):
 
     def _get_state(self):
         # Exemple d'état : Densité du trafic, longueur de la file d'attente, temps d'attente
-        vehicles = traci.edge.getLastStepVehicleIDs(self.edge_id)
+        vehicles = self.conn.edge.getLastStepVehicleIDs(self.edge_id)
         density = len(vehicles)
-        queue_length = traci.edge.getLastStepHaltingNumber(self.edge_id)
-        waiting_time = traci.edge.getWaitingTime(self.edge_id)
+        queue_length = self.conn.edge.getLastStepHaltingNumber(self.edge_id)
+        waiting_time = self.conn.edge.getWaitingTime(self.edge_id)
         return np.array([density, queue_length, waiting_time], dtype=np.float32)
 
     def _calculate_reward(self):
         # Récompense basée sur la réduction de la file d'attente et du temps d'attente
-        queue_length = traci.edge.getLastStepHaltingNumber(self.edge_id)
-        waiting_time = traci.edge.getWaitingTime(self.edge_id)
+        queue_length = self.conn.edge.getLastStepHaltingNumber(self.edge_id)
+        waiting_time = self.conn.edge.getWaitingTime(self.edge_id)
         reward = - (queue_length + waiting_time)  # Récompense négative pour minimiser la congestion
         return reward
 
     def close(self):
-        traci.close()
+        self.conn.close()
+
+
+# Environnement contrôlant tous les feux du réseau à la fois
+class SumoEnvReseau(SumoEnv):
+    # Variables de voie lues par abonnement, agrégées par feu
+    VARIABLES_VOIE = (tc.LAST_STEP_VEHICLE_NUMBER, tc.LAST_STEP_VEHICLE_HALTING_NUMBER, tc.VAR_WAITING_TIME)
+    CARACTERISTIQUES = ("vehicules", "arretes", "attente", "phase")
+
+    def __init__(self, *args, **kwargs):
+        super(SumoEnvReseau, self).__init__(*args, **kwargs)
+
+        # Topologie mise en cache : feux, voies contrôlées et nombre de phases
+        self.tl_ids = list(self.conn.trafficlight.getIDList())
+        if not self.tl_ids:
+            raise ValueError("Aucun feu de signalisation trouvé dans le réseau SUMO.")
+        voies_par_feu = [sorted(set(self.conn.trafficlight.getControlledLanes(tl_id))) for tl_id in self.tl_ids]
+        self.lane_ids = sorted({lane for voies in voies_par_feu for lane in voies})
+        index_voie = {lane: i for i, lane in enumerate(self.lane_ids)}
+        # Matrice feu x voie : l'agrégation par feu devient un produit matriciel
+        self.appartenance = np.zeros((len(self.tl_ids), len(self.lane_ids)), dtype=np.float32)
+        for i, voies in enumerate(voies_par_feu):
+            self.appartenance[i, [index_voie[lane] for lane in voies]] = 1.0
+        self.n_phases = np.array([self._n_phases(tl_id) for tl_id in self.tl_ids])
+
+        # Actions : 0 = maintenir la phase, 1 = passer à la phase suivante, pour chaque feu
+        self.action_space = gym.spaces.MultiDiscrete([2] * len(self.tl_ids))
+        self.observation_space = gym.spaces.Box(low=0, high=np.inf,
+                                                shape=(len(self.tl_ids), len(self.CARACTERISTIQUES)),
+                                                dtype=np.float32)
+        self._souscrire()
+
+    def _n_phases(self, tl_id):
+        # Phases du programme actif, pas du premier programme défini pour le feu
+        actif = self.conn.trafficlight.getProgram(tl_id)
+        programmes = self.conn.trafficlight.getAllProgramLogics(tl_id)
+        logique = next((p for p in programmes if p.programID == actif), programmes[0])
+        return len(logique.phases)
+
+    def _souscrire(self):
+        # Les abonnements sont (re)posés après chaque restauration de la simulation
+        for lane in self.lane_ids:
+            self.conn.lane.subscribe(lane, self.VARIABLES_VOIE)
+        for tl_id in self.tl_ids:
+            self.conn.trafficlight.subscribe(tl_id, (tc.TL_CURRENT_PHASE,))
+
+    def _lire_abonnements(self):
+        # Une requête groupée pour toutes les voies, une pour tous les feux
+        resultats = self.conn.lane.getAllSubscriptionResults()
+        voies = np.array([[resultats.get(lane, {}).get(var, 0.0) for var in self.VARIABLES_VOIE]
+                          for lane in self.lane_ids], dtype=np.float32)
+        phases_feux = self.conn.trafficlight.getAllSubscriptionResults()
+        phases = np.array([phases_feux.get(tl_id, {}).get(tc.TL_CURRENT_PHASE, 0) for tl_id in self.tl_ids])
+        return self.appartenance @ voies, phases
+
+    def reset(self, seed=None, options=None):
+        _, info = super(SumoEnvReseau, self).reset(seed=seed, options=options)
+        self._souscrire()
+        return self._get_state(), info
+
+    def _appliquer_action(self, action):
+        # Appliquer les actions : seuls les feux qui changent de phase sont appelés
+        _, phases = self._lire_abonnements()
+        for i in np.flatnonzero(np.asarray(action) == 1):
+            self.conn.trafficlight.setPhase(self.tl_ids[i], int((phases[i] + 1) % self.n_phases[i]))
+
+    # step() est celui de SumoEnv : état et récompense passent par les deux méthodes ci-dessous
+
+    def _get_state(self):
+        agregats, phases = self._lire_abonnements()
+        return np.column_stack([agregats, phases / self.n_phases]).astype(np.float32)
+
+    def _calculate_reward(self):
+        # Récompense négative pour minimiser files d'attente et attente sur tout le réseau
+        agregats, _ = self._lire_abonnements()
+        return -float(agregats[:, 1].sum() + agregats[:, 2].sum())
+
+
+# Répétition d'action : une décision de l'agent couvre k pas simulés (k secondes au pas de 1 s du profil)
+class RepetitionAction(gym.Wrapper):
+    def __init__(self, env, k):
+        super(RepetitionAction, self).__init__(env)
+        self.k = k
+
+    def step(self, action):
+        base = self.env.unwrapped
+        base._appliquer_action(action)
+
+        # Coût cumulé pas à pas : une congestion qui monte et se résorbe dans l'intervalle compte aussi
+        reward = 0.0
+        done = False
+        for _ in range(self.k):
+            base.conn.simulationStep()
+            reward += base._calculate_reward()
+            done = base.conn.simulation.getMinExpectedNumber() == 0
+            if done:
+                break
+
+        return base._get_state(), reward, done, False, {}
+
+
+# Curriculum de demande : change de niveau entre deux épisodes
+class SuiviCurriculum(gym.Wrapper):
+    def __init__(self, env, curriculum):
+        super(SuiviCurriculum, self).__init__(env)
+        self.curriculum = curriculum
+        self.recompense_episode = 0.0
+        self.episode_en_cours = False
+
+    def reset(self, **kwargs):
+        if self.episode_en_cours and self.curriculum.rapporter(self.recompense_episode):
+            self.env.unwrapped.changer_config(self.curriculum.config)
+        self.recompense_episode = 0.0
+        self.episode_en_cours = True
+        obs, info = self.env.reset(**kwargs)
+        info["echelle_demande"] = self.curriculum.echelle
+        return obs, info
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        self.recompense_episode += reward
+        return obs, reward, terminated, truncated, info
+
+
+def make_env(rank, seed=0, env_class=None, k=None, curriculum=None):
+    """Fabrique un SumoEnv indépendant (connexion, graine et sorties propres à l'instance)"""
+    env_class = env_class or (SumoEnvReseau if mode_reseau else SumoEnv)
+    k = k or repetition_action
+    if curriculum is None and utiliser_curriculum:
+        curriculum = FICHIER_CURRICULUM
+
+    def _init():
+        # Chaque instance suit sa propre progression dans le curriculum
+        suivi = Curriculum(curriculum) if curriculum else None
+        env = env_class(label=f"sumo_{rank}", seed=seed + rank,
+                        output_dir=os.path.join(dossier_sorties, f"env_{rank}"),
+                        sumo_config=suivi.config if suivi else sumo_config)
+        if k > 1:
+            env = RepetitionAction(env, k)
+        return SuiviCurriculum(env, suivi) if suivi else env
+    return _init
+
+
+def make_vec_env(n, seed=0, env_class=None, k=None):
+    """Un processus SUMO par environnement dès que n > 1"""
+    env_fns = [make_env(rank, seed, env_class, k) for rank in range(n)]
+    env = SubprocVecEnv(env_fns) if n > 1 else DummyVecEnv(env_fns)
+    env.seed(seed)
+    return env
+
+
+def mesurer_debit(n, n_pas=500, seed=0):
+    """Pas de temps agent par seconde collectés avec n environnements"""
+    env = make_vec_env(n, seed)
+    env.reset()
+    debut = time.perf_counter()
+    for _ in range(n_pas):
+        env.step(np.array([env.action_space.sample() for _ in range(n)]))
+    duree = time.perf_counter() - debut
+    env.close()
+    return n * n_pas / duree
+
+
+def evaluer(model, env, duree=1000):
+    """Récompense moyenne par seconde simulée, comparable quel que soit k"""
+    obs, _ = env.reset()
+    base = env.unwrapped
+    debut = base.conn.simulation.getTime()
+    total = 0.0
+    while base.conn.simulation.getTime() - debut < duree:
+        action, _states = model.predict(obs, deterministic=True)
+        obs, reward, done, truncated, info = env.step(action)
+        total += reward
+        if done:
+            break
+    return total / max(base.conn.simulation.getTime() - debut, 1.0)
+
+
+def comparer_repetitions(valeurs_k=(1, 2, 5, 10), total_timesteps=10000):
+    """Débit d'entraînement et qualité finale de la politique pour plusieurs k"""
+    resultats = []
+    for k in valeurs_k:
+        env = make_vec_env(n_envs, k=k)
+        model = PPO("MlpPolicy", env, n_steps=2048 // n_envs, verbose=0)
+        debut = time.perf_counter()
+        model.learn(total_timesteps=total_timesteps)
+        debit = total_timesteps / (time.perf_counter() - debut)
+        env.close()
+
+        env = make_env(n_envs, seed=1000, k=k)()
+        qualite = evaluer(model, env)
+        env.close()
+        resultats.append((k, debit, qualite))
+        print(f"k={k:>3} : {debit:8.1f} pas/s, récompense moyenne {qualite:10.2f} par seconde simulée")
+    return resultats
+
+
+if __name__ == "__main__":
+    # Vérifier que l'environnement est correctement défini
+    env_class = SumoEnvReseau if mode_reseau else SumoEnv
+    env = env_class(label="verification")
+    check_env(env)
+
+    # Comparer le reset par état sauvegardé au rechargement complet
+    env.reset()
+    duree_etat = env.duree_reset
+    env.etats_depart, etats = [], env.etats_depart
+    env.reset()
+    duree_load = env.duree_reset
+    env.etats_depart = etats
+    print(f"Reset : {duree_etat * 1000:.1f} ms par état sauvegardé, "
+          f"{duree_load * 1000:.1f} ms par traci.load")
+    env.close()
 
-# Créer l'environnement
-env = SumoEnv()
+    # Mesurer le gain de la collecte parallèle
+    debit_1 = mesurer_debit(1)
+    debit_n = mesurer_debit(n_envs)
+    print(f"Débit 1 env : {debit_1:.1f} pas/s, {n_envs} envs : {debit_n:.1f} pas/s "
+          f"(accélération x{debit_n / debit_1:.2f})")
 
-# Vérifier que l'environnement est correctement défini
-check_env(env)
+    if benchmark_repetitions:
+        comparer_repetitions()
 
-# Créer le modèle PPO
-model = PPO("MlpPolicy", env, verbose=1)
+    # Créer le modèle PPO sur n_envs processus SUMO
+    env = make_vec_env(n_envs)
+    model = PPO("MlpPolicy", env, n_steps=2048 // n_envs, verbose=1)
 
-# Entraîner le modèle
-model.learn(total_timesteps=10000)
+    # Entraîner le modèle
+    debut = time.perf_counter()
+    model.learn(total_timesteps=10000)
+    print(f"Entraînement : {10000 / (time.perf_counter() - debut):.1f} pas/s")
+    model.save("ppo_sumo")
+    env.close()
 
-# Tester le modèle
-obs, _ = env.reset()
-for _ in range(1000):
-    action, _states = model.predict(obs)
-    obs, rewards, done, truncated, info = env.step(action)
-    print(f"Action : {action}, Récompense : {rewards}")
+    # Tester le modèle
+    env = make_env(n_envs, seed=1000)()
+    obs, _ = env.reset()
+    for _ in range(1000):
+        action, _states = model.predict(obs)
+        obs, rewards, done, truncated, info = env.step(action)
+        print(f"Action : {action}, Récompense : {rewards}")
 
-# Fermer l'environnement
-env.close()
\ No newline at end of file
+    # Fermer l'environnement
+    env.close()
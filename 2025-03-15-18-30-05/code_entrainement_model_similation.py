@@ -6,6 +6,9 @@ import tensorflow as tf
 import keras
 from collections import deque
 
+from detecteurs_e2 import LecteurE2
+from profils_simulation import commande_sumo
+
 # Paramètres du RL
 alpha = 0.1  # Taux d'apprentissage
 gamma = 0.9  # Facteur de récompense
@@ -32,8 +35,7 @@ vehicle_density_history = []
 
 def get_state(tl_id):
     """Récupère l'état actuel du trafic autour du feu de signalisation"""
-    vehicle_ids = traci.vehicle.getIDList()
-    congestion_level = sum(traci.vehicle.getSpeed(veh) < 2 for veh in vehicle_ids)  # Nombre de véhicules à l'arrêt
+    congestion_level = mesures[tl_id]["arretes"]  # Véhicules à l'arrêt sur les détecteurs E2 du feu
     return np.array([congestion_level])
 
 
@@ -63,11 +65,14 @@ def replay():
 
 # Démarrer SUMO
 config_file = "osm.sumocfg"
-traci.start(["sumo-gui", "-c", config_file])
+traci.start(commande_sumo("entrainement", config_file, detecteurs=True))  # Seul script qui lit les détecteurs E2
+lecteur = LecteurE2(traci)
+mesures = {}
 
 # Boucle de simulation
 for step in range(1000):
     traci.simulationStep()
+    mesures = lecteur.lire()  # Agrégats par feu, lus une fois par pas
     total_reward = 0
     total_speed = 0
     total_vehicles = 0
@@ -90,13 +95,12 @@ for step in range(1000):
         
         print(f"{tl_name} - État actuel: {traci.trafficlight.getRedYellowGreenState(tl_id)}")
         
-        segment_vehicles = traci.lanearea.getIDList()
-        for segment in segment_vehicles:
-            num_vehicles = traci.lanearea.getLastStepVehicleNumber(segment)
-            avg_speed = traci.lanearea.getLastStepMeanSpeed(segment)
-            total_speed += avg_speed
-            total_vehicles += num_vehicles
-            print(f"Segment {segment}: {num_vehicles} véhicules, Vitesse Moyenne: {avg_speed:.2f} m/s")
+        num_vehicles = mesures[tl_id]["vehicules"]
+        avg_speed = mesures[tl_id]["vitesse"]
+        total_speed += avg_speed * num_vehicles
+        total_vehicles += num_vehicles
+        print(f"Détecteurs {tl_name}: {num_vehicles} véhicules, Vitesse Moyenne: {avg_speed:.2f} m/s, "
+              f"File: {mesures[tl_id]['file']:.0f} m")
     
     rewards_history.append(total_reward)
     avg_speed_history.append(total_speed / (total_vehicles + 1e-5))
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline de données hors ligne pour le RL des feux.
+
+Convertit les journaux par pas (traffic_log.csv, journaux de transitions des
+futures exécutions) en jeux de transitions découpés en shards .npy, ouverts en
+mémoire mappée et lus en flux. Un entraîneur par lots apprend ensuite un DQN
+directement depuis le disque, sans lancer SUMO.
+
+Utilisation :
+    python dataset_hors_ligne.py convertir traffic_log.csv datasets/traffic_log
+    python dataset_hors_ligne.py entrainer datasets/traffic_log
+"""
+
+import os
+import csv
+import json
+import time
+import argparse
+
+import numpy as np
+
+from cache_contenu import empreinte_fichier
+
+TAILLE_SHARD = 50000  # Transitions par shard
+CHAMPS = ("etats", "actions", "recompenses", "etats_suivants", "terminaux")
+
+# Caractéristiques d'état extraites de traffic_log.csv pour chaque feu
+CARACTERISTIQUES_TRAFFIC_LOG = ["vehicules", "congestion_moyenne", "vitesse_moyenne"]
+
+
+class JournalTransitions:
+    """Journal CSV par pas (état, action, récompense) pour les futures exécutions"""
+
+    def __init__(self, fichier, caracteristiques):
+        self.caracteristiques = list(caracteristiques)
+        self.fichier = open(fichier, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.fichier)
+        self.writer.writerow(["Step", "TrafficLight"] + self.caracteristiques + ["Action", "Reward"])
+
+    def enregistrer(self, step, tl_id, etat, action, recompense):
+        """Enregistre l'état observé, l'action choisie et la récompense obtenue"""
+        self.writer.writerow([step, tl_id] + [f"{v:g}" for v in etat] + [action, f"{recompense:g}"])
+
+    def close(self):
+        self.fichier.close()
+
+
+def lire_traffic_log(fichier):
+    """Lit traffic_log.csv et agrège les voies de chaque feu, pas par pas.
+
+    Produit (step, feu, état, action, récompense) ; la récompense n'étant pas
+    journalisée, elle vaut None et sera dérivée du pas suivant.
+    """
+    def agreger(step, lignes_par_feu):
+        for tl_id, (voies, action) in lignes_par_feu.items():
+            comptes, congestions, vitesses = zip(*voies.values())
+            etat = [sum(comptes), float(np.mean(congestions)), float(np.mean(vitesses))]
+            yield step, tl_id, etat, action, None
+
+    with open(fichier, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        step_courant = None
+        lignes_par_feu = {}
+        for ligne in reader:
+            step = int(ligne["Step"])
+            if step != step_courant:
+                if step_courant is not None:
+                    yield from agreger(step_courant, lignes_par_feu)
+                step_courant = step
+                lignes_par_feu = {}
+            voies, _ = lignes_par_feu.setdefault(ligne["TrafficLight"], ({}, None))
+            # Les lignes en double d'une même voie sont fusionnées
+            voies[ligne["Lane"]] = (int(ligne["VehicleCount"]),
+                                    float(ligne["Congestion"].rstrip("%")),
+                                    float(ligne["AvgSpeed"]))
+            lignes_par_feu[ligne["TrafficLight"]] = (voies, ligne["Action"])
+        if step_courant is not None:
+            yield from agreger(step_courant, lignes_par_feu)
+
+
+def lire_journal(fichier):
+    """Lit un journal écrit par JournalTransitions"""
+    with open(fichier, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        entete = next(reader)
+        n = len(entete) - 4
+        for ligne in reader:
+            etat = [float(v) for v in ligne[2:2 + n]]
+            yield int(ligne[0]), ligne[1], etat, ligne[2 + n], float(ligne[3 + n])
+
+
+def transitions(entrees, actions):
+    """Apparie les entrées consécutives d'un même feu en transitions (s, a, r, s').
+
+    `actions` associe chaque libellé d'action à son indice et s'étend au besoin.
+    Sans récompense journalisée, r = -nombre de véhicules au pas suivant.
+    """
+    precedent = {}  # feu -> (step, état, action, récompense)
+    for step, tl_id, etat, action, recompense in entrees:
+        if action not in actions:
+            actions[action] = len(actions)
+        if tl_id in precedent:
+            step_p, etat_p, action_p, recompense_p = precedent[tl_id]
+            if step == step_p + 1:
+                r = recompense_p if recompense_p is not None else -etat[0]
+                yield etat_p, actions[action_p], r, etat, False
+            else:
+                # Trou dans le journal : l'épisode de ce feu s'arrête là
+                r = recompense_p if recompense_p is not None else 0.0
+                yield etat_p, actions[action_p], r, etat_p, True
+        precedent[tl_id] = (step, etat, action, recompense)
+
+    for step_p, etat_p, action_p, recompense_p in precedent.values():
+        r = recompense_p if recompense_p is not None else 0.0
+        yield etat_p, actions[action_p], r, etat_p, True
+
+
+def ecrire_dataset(source, dossier, caracteristiques, entrees, taille_shard=TAILLE_SHARD):
+    """Écrit les transitions en shards .npy et décrit le jeu dans manifest.json"""
+    os.makedirs(dossier, exist_ok=True)
+    actions = {}
+    shards = []
+    lot = []
+
+    def vider(lot):
+        nom = f"shard_{len(shards):05d}"
+        os.makedirs(os.path.join(dossier, nom), exist_ok=True)
+        etats, acts, recompenses, suivants, terminaux = zip(*lot)
+        tableaux = {
+            "etats": np.array(etats, dtype=np.float32),
+            "actions": np.array(acts, dtype=np.int16),
+            "recompenses": np.array(recompenses, dtype=np.float32),
+            "etats_suivants": np.array(suivants, dtype=np.float32),
+            "terminaux": np.array(terminaux, dtype=np.bool_),
+        }
+        for champ, tableau in tableaux.items():
+            np.save(os.path.join(dossier, nom, champ + ".npy"), tableau)
+        shards.append({"nom": nom, "transitions": len(lot)})
+
+    for transition in transitions(entrees, actions):
+        lot.append(transition)
+        if len(lot) >= taille_shard:
+            vider(lot)
+            lot = []
+    if lot:
+        vider(lot)
+
+    manifest = {
+        "source": os.path.basename(source),
+        "empreinte_source": empreinte_fichier(source),
+        "caracteristiques": list(caracteristiques),
+        "actions": actions,
+        "shards": shards,
+        "transitions": sum(s["transitions"] for s in shards),
+    }
+    with open(os.path.join(dossier, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def convertir(source, dossier, taille_shard=TAILLE_SHARD):
+    """Convertit traffic_log.csv ou un journal de transitions en jeu de données"""
+    with open(source, encoding="utf-8") as f:
+        entete = f.readline().strip().split(",")
+    if "Lane" in entete:
+        entrees = lire_traffic_log(source)
+        caracteristiques = CARACTERISTIQUES_TRAFFIC_LOG
+    else:
+        entrees = lire_journal(source)
+        caracteristiques = entete[2:-2]
+    return ecrire_dataset(source, dossier, caracteristiques, entrees, taille_shard)
+
+
+class DatasetTransitions:
+    """Jeu de transitions lu en flux, shard par shard, en mémoire mappée"""
+
+    def __init__(self, dossier):
+        self.dossier = dossier
+        with open(os.path.join(dossier, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.n_caracteristiques = len(self.manifest["caracteristiques"])
+        self.n_actions = len(self.manifest["actions"])
+
+    def __len__(self):
+        return self.manifest["transitions"]
+
+    def shard(self, nom):
+        """Ouvre les tableaux d'un shard sans les charger en mémoire"""
+        return {champ: np.load(os.path.join(self.dossier, nom, champ + ".npy"), mmap_mode="r")
+                for champ in CHAMPS}
+
+    def lots(self, batch_size, melanger=True, rng=None):
+        """Parcourt le jeu par mini-lots ; seul un shard est ouvert à la fois"""
+        rng = rng or np.random.default_rng()
+        ordre = [s["nom"] for s in self.manifest["shards"]]
+        if melanger:
+            rng.shuffle(ordre)
+        for nom in ordre:
+            tableaux = self.shard(nom)
+            n = len(tableaux["actions"])
+            indices = rng.permutation(n) if melanger else np.arange(n)
+            for debut in range(0, n, batch_size):
+                idx = np.sort(indices[debut:debut + batch_size])  # Lecture séquentielle du mmap
+                yield {champ: np.asarray(t[idx]) for champ, t in tableaux.items()}
+
+
+def build_model(n_caracteristiques, n_actions, learning_rate=0.001):
+    """Construire le réseau neuronal pour DQN"""
+    import keras
+
+    model = keras.Sequential([
+        keras.Input(shape=(n_caracteristiques,)),
+        keras.layers.Dense(24, activation='relu'),
+        keras.layers.Dense(24, activation='relu'),
+        keras.layers.Dense(n_actions, activation='linear')
+    ])
+    model.compile(optimizer=keras.optimizers.Adam(learning_rate=learning_rate), loss='mse')
+    return model
+
+
+def entrainer(dataset, epochs=5, batch_size=256, gamma=0.9, learning_rate=0.001,
+              synchro_cible=500, fichier_poids="dqn_hors_ligne.weights.h5", seed=0):
+    """Entraîne un DQN (avec réseau cible) uniquement à partir du jeu de données"""
+    model = build_model(dataset.n_caracteristiques, dataset.n_actions, learning_rate)
+    cible = build_model(dataset.n_caracteristiques, dataset.n_actions, learning_rate)
+    cible.set_weights(model.get_weights())
+    rng = np.random.default_rng(seed)
+
+    mises_a_jour = 0
+    for epoch in range(epochs):
+        debut = time.perf_counter()
+        pertes = []
+        echantillons = 0
+        for lot in dataset.lots(batch_size, rng=rng):
+            q_suivants = cible.predict_on_batch(lot["etats_suivants"])
+            targets = model.predict_on_batch(lot["etats"])
+            retour = lot["recompenses"] + gamma * np.max(q_suivants, axis=1) * (~lot["terminaux"])
+            targets[np.arange(len(targets)), lot["actions"]] = retour
+            pertes.append(float(model.train_on_batch(lot["etats"], targets)))
+            echantillons += len(targets)
+            mises_a_jour += 1
+            if mises_a_jour % synchro_cible == 0:
+                cible.set_weights(model.get_weights())
+        duree = time.perf_counter() - debut
+        print(f"Époque {epoch + 1}/{epochs} - perte moyenne : {np.mean(pertes):.4f}, "
+              f"{echantillons / duree:.0f} transitions/s")
+
+    model.save_weights(fichier_poids)
+    print(f"Poids enregistrés dans {fichier_poids}")
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jeux de transitions hors ligne pour le DQN")
+    commandes = parser.add_subparsers(dest="commande", required=True)
+
+    p = commandes.add_parser("convertir", help="journal CSV -> shards de transitions")
+    p.add_argument("source")
+    p.add_argument("dossier")
+    p.add_argument("--taille-shard", type=int, default=TAILLE_SHARD)
+
+    p = commandes.add_parser("entrainer", help="entraîner un DQN sans SUMO")
+    p.add_argument("dossier")
+    p.add_argument("--epochs", type=int, default=5)
+    p.add_argument("--batch-size", type=int, default=256)
+    p.add_argument("--gamma", type=float, default=0.9)
+    p.add_argument("--poids", default="dqn_hors_ligne.weights.h5")
+
+    args = parser.parse_args()
+    if args.commande == "convertir":
+        manifest = convertir(args.source, args.dossier, args.taille_shard)
+        print(f"{manifest['transitions']} transitions en {len(manifest['shards'])} shard(s), "
+              f"actions : {manifest['actions']}")
+    else:
+        entrainer(DatasetTransitions(args.dossier), epochs=args.epochs,
+                  batch_size=args.batch_size, gamma=args.gamma, fichier_poids=args.poids)
+
+
+if __name__ == "__main__":
+    main()
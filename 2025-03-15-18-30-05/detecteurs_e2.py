@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Détecteurs E2 (laneAreaDetector) sur les voies contrôlées par les feux.
+
+osm.sumocfg ne déclare aucun détecteur : ce module en génère un par voie
+entrante contrôlée, couvrant ses LONGUEUR_E2 derniers mètres avant la ligne
+d'arrêt, dans un fichier additionnel mis en cache sous l'empreinte du réseau.
+Les détecteurs n'écrivent aucun fichier (sortie vers /dev/null, reconnu par SUMO
+sur tous les systèmes) : plusieurs simulations peuvent tourner en parallèle,
+avec ou sans --output-prefix, et les valeurs passent par les abonnements.
+LecteurE2 s'abonne ensuite à ces détecteurs et agrège, par feu, longueur de
+file, occupation et vitesse moyenne : quelques valeurs par pas au lieu d'un
+parcours de tous les véhicules.
+
+Utilisation :
+    python detecteurs_e2.py --longueur 100
+"""
+
+import os
+import gzip
+import argparse
+import xml.etree.ElementTree as ET
+
+from cache_contenu import empreinte, empreinte_fichier, chemin_cache
+from scenarios_curriculum import fichier_reseau
+
+config_file = "osm.sumocfg"
+LONGUEUR_E2 = 100  # m couverts en amont de la ligne d'arrêt
+PERIODE_E2 = 300  # s d'agrégation des détecteurs (sortie fichier désactivée)
+SORTIE_E2 = "/dev/null"  # Périphérique nul de SUMO, Windows compris : rien n'est écrit, pas de préfixe
+VERSION_DETECTEURS = 2  # À incrémenter si le fichier généré change
+PREFIXE = "e2_"
+
+
+def voies_et_longueurs(net_file):
+    """Longueur de chaque voie et feu qui contrôle chaque voie entrante, lus en flux"""
+    longueurs, controle = {}, {}
+    ouvrir = gzip.open if net_file.endswith(".gz") else open
+    with ouvrir(net_file, "rb") as f:
+        for _, element in ET.iterparse(f):
+            if element.tag == "lane":
+                longueurs[element.get("id")] = float(element.get("length"))
+            elif element.tag == "connection" and element.get("tl") and not element.get("from").startswith(":"):
+                controle[f"{element.get('from')}_{element.get('fromLane')}"] = element.get("tl")
+            if element.tag in ("edge", "junction", "connection", "tlLogic", "roundabout"):
+                element.clear()
+    return longueurs, controle
+
+
+def generer_detecteurs(net_file, longueur=LONGUEUR_E2, periode=PERIODE_E2):
+    """Écrit (ou réutilise) le fichier additionnel des détecteurs E2 ; renvoie son chemin"""
+    cle = empreinte(empreinte_fichier(net_file), longueur, periode, VERSION_DETECTEURS)
+    chemin = chemin_cache("detecteurs", cle, ".e2.add.xml")
+    if os.path.exists(chemin):
+        return chemin
+
+    longueurs, controle = voies_et_longueurs(net_file)
+    racine = ET.Element("additional")
+    for voie in sorted(controle):
+        longueur_voie = longueurs[voie]
+        ET.SubElement(racine, "laneAreaDetector", id=PREFIXE + voie, lane=voie,
+                      pos=f"{max(longueur_voie - longueur, 0.0):.2f}", endPos=f"{longueur_voie:.2f}",
+                      freq=str(periode), file=SORTIE_E2,
+                      friendlyPos="true")
+    arbre = ET.ElementTree(racine)
+    ET.indent(arbre, space="    ")
+    temporaire = chemin + ".tmp"
+    arbre.write(temporaire, encoding="UTF-8", xml_declaration=True)
+    os.replace(temporaire, chemin)
+    return chemin
+
+
+def detecteurs_config(config=config_file, longueur=LONGUEUR_E2, periode=PERIODE_E2):
+    """Fichier de détecteurs E2 adapté au réseau d'une configuration"""
+    return generer_detecteurs(fichier_reseau(config), longueur, periode)
+
+
+class LecteurE2:
+    """Abonnements aux détecteurs E2 et agrégats par feu à chaque pas"""
+
+    def __init__(self, conn):
+        import traci.constants as tc
+
+        self.conn = conn
+        self.variables = {
+            "file": tc.JAM_LENGTH_METERS,
+            "occupation": tc.LAST_STEP_OCCUPANCY,
+            "vitesse": tc.LAST_STEP_MEAN_SPEED,
+            "vehicules": tc.LAST_STEP_VEHICLE_NUMBER,
+            "arretes": tc.LAST_STEP_VEHICLE_HALTING_NUMBER,
+        }
+        voie_detecteur = {conn.lanearea.getLaneID(d): d for d in conn.lanearea.getIDList()}
+        self.detecteurs = {}  # Feu -> détecteurs de ses voies contrôlées
+        for tl_id in conn.trafficlight.getIDList():
+            voies = dict.fromkeys(conn.trafficlight.getControlledLanes(tl_id))
+            self.detecteurs[tl_id] = [voie_detecteur[v] for v in voies if v in voie_detecteur]
+        for detecteurs in self.detecteurs.values():
+            for d in detecteurs:
+                conn.lanearea.subscribe(d, list(self.variables.values()))
+        self.mesures = {}
+
+    def lire(self):
+        """Agrège les résultats d'abonnement du dernier pas : {feu: {file, occupation, vitesse, ...}}"""
+        resultats = self.conn.lanearea.getAllSubscriptionResults()
+        v = self.variables
+        self.mesures = {}
+        for tl_id, detecteurs in self.detecteurs.items():
+            valeurs = [resultats[d] for d in detecteurs if d in resultats]
+            vehicules = sum(r[v["vehicules"]] for r in valeurs)
+            # Vitesse moyenne pondérée par le nombre de véhicules (-1 sur un détecteur vide)
+            vitesse = sum(r[v["vitesse"]] * r[v["vehicules"]] for r in valeurs if r[v["vehicules"]])
+            self.mesures[tl_id] = {
+                "file": sum(r[v["file"]] for r in valeurs),
+                "occupation": sum(r[v["occupation"]] for r in valeurs) / len(valeurs) if valeurs else 0.0,
+                "vitesse": vitesse / vehicules if vehicules else 0.0,
+                "vehicules": vehicules,
+                "arretes": sum(r[v["arretes"]] for r in valeurs),
+            }
+        return self.mesures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Détecteurs E2 sur les voies contrôlées par les feux")
+    parser.add_argument("--config", default=config_file)
+    parser.add_argument("--longueur", type=float, default=LONGUEUR_E2)
+    parser.add_argument("--periode", type=int, default=PERIODE_E2)
+    args = parser.parse_args()
+    chemin = detecteurs_config(args.config, args.longueur, args.periode)
+    n = sum(1 for element in ET.parse(chemin).getroot() if element.tag == "laneAreaDetector")
+    print(f"{n} détecteurs E2 dans {chemin}")
+
+
+if __name__ == "__main__":
+    main()
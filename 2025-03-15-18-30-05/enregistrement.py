@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Enregistrement et relecture des pas de simulation, sans SUMO.
+
+Enregistreur écrit à chaque pas positions et vitesses des véhicules, états
+des feux, actions, récompense et congestion dans un fichier binaire découpé
+en blocs de TAILLE_BLOC pas compressés (zlib). Le premier pas d'un bloc est
+complet ; les suivants ne stockent que les différences avec le pas
+précédent : véhicules partis et arrivés, déplacements quantifiés au
+décimètre (int16), feux qui ont changé. Un index des blocs, écrit à la
+fermeture, permet d'atteindre n'importe quel pas en ne décodant qu'un bloc.
+
+Lecteur rejoue un fichier : accès direct à un pas (via l'index, reconstruit
+par un parcours des blocs si l'enregistrement a été interrompu) et lecture
+séquentielle rapide grâce aux blocs décodés gardés en cache.
+
+Utilisation :
+    python enregistrement.py session.rec   # Résumé d'un enregistrement
+"""
+
+import json
+import zlib
+import struct
+import argparse
+from bisect import bisect_right
+from collections import namedtuple, OrderedDict
+
+import numpy as np
+
+TAILLE_BLOC = 100  # Pas par bloc : un pas complet puis des différences
+RESOLUTION = 10  # Positions en décimètres
+RESOLUTION_VITESSE = 100  # Vitesses en cm/s
+BLOCS_EN_CACHE = 4
+MAGIQUE = b"SUMOREC1"
+MAGIQUE_BLOC = b"BLOC"
+MAGIQUE_INDEX = b"IDX1"
+ENTETE_BLOC = struct.Struct("!4sQII")  # Magique, premier pas, nombre de pas, taille compressée
+LONGUEUR = struct.Struct("!I")
+FIN = struct.Struct("!Q4s")  # Position de l'index, magique
+
+Pas = namedtuple("Pas", ["numero", "temps", "vehicules", "positions", "vitesses", "etats_feux",
+                         "actions", "recompense", "congestion"])
+
+
+class Enregistreur:
+    """Écrit un pas à la fois ; bloc compressé tous les TAILLE_BLOC pas, index à la fermeture"""
+
+    def __init__(self, chemin, feux, positions_feux=None, taille_bloc=TAILLE_BLOC, meta=None):
+        self.fichier = open(chemin, "wb")
+        self.feux = list(feux)
+        self.taille_bloc = taille_bloc
+        entete = {"version": 1, "feux": self.feux, "taille_bloc": taille_bloc,
+                  "positions_feux": {tl_id: list(p) for tl_id, p in (positions_feux or {}).items()},
+                  "meta": meta or {}}
+        texte = json.dumps(entete).encode("utf-8")
+        self.fichier.write(MAGIQUE + LONGUEUR.pack(len(texte)) + texte)
+        self.index = []  # [premier pas, position, nombre de pas, temps du premier pas]
+        self.n_pas = 0
+        self.bloc = []
+        self.precedent = None  # (ids, positions quantifiées, états des feux) du pas précédent
+
+    def ajouter(self, temps, vehicules, positions, vitesses, etats_feux, actions=None, recompense=0.0,
+                congestion=0.0):
+        """Ajoute un pas : positions (N x 2) et vitesses (N) dans l'ordre de `vehicules`"""
+        ids = list(vehicules)
+        positions = np.round(np.asarray(positions, dtype=float).reshape(-1, 2) * RESOLUTION).astype(np.int32)
+        vitesses = np.round(np.clip(np.asarray(vitesses, dtype=float).reshape(-1), -327, 327)
+                            * RESOLUTION_VITESSE).astype(np.int16)
+        actions = np.full(len(self.feux), -1, dtype=np.int8) if actions is None else \
+            np.asarray(actions, dtype=np.int8)
+        etats_feux = list(etats_feux)
+
+        entete = {"t": float(temps), "r": float(recompense), "c": float(congestion), "k": not self.bloc}
+        if self.precedent is not None:
+            # Ordre stocké : véhicules du pas précédent encore présents (même ordre), puis nouveaux
+            ids_prec, pos_prec, feux_prec = self.precedent
+            rang = {veh_id: i for i, veh_id in enumerate(ids)}
+            rang_prec = {veh_id: i for i, veh_id in enumerate(ids_prec)}
+            gardes = [i for i, veh_id in enumerate(ids_prec) if veh_id in rang]
+            retraits = [i for i, veh_id in enumerate(ids_prec) if veh_id not in rang]
+            ajouts = [veh_id for veh_id in ids if veh_id not in rang_prec]
+            ordre = [rang[ids_prec[i]] for i in gardes] + [rang[veh_id] for veh_id in ajouts]
+            ids = [ids[i] for i in ordre]
+            positions, vitesses = positions[ordre], vitesses[ordre]
+            deltas = positions[:len(gardes)] - pos_prec[gardes]
+            if len(deltas) and np.abs(deltas).max() > 32767:
+                entete["k"] = True  # Saut trop grand pour un int16 (téléportation) : pas complet
+
+        if entete["k"]:
+            entete["ids"] = ids
+            entete["feux"] = etats_feux
+            tableaux = [positions]
+        else:
+            entete["n_retraits"] = len(retraits)
+            entete["ajouts"] = ajouts
+            entete["feux"] = {i: e for i, (e, p) in enumerate(zip(etats_feux, feux_prec)) if e != p}
+            tableaux = [np.array(retraits, dtype=np.int32), deltas.astype(np.int16), positions[len(gardes):]]
+        tableaux += [vitesses, actions]
+        texte = json.dumps(entete, separators=(",", ":")).encode("utf-8")
+
+        if not self.bloc:
+            self.index.append([self.n_pas, None, 0, float(temps)])
+        self.bloc.append(LONGUEUR.pack(len(texte)) + texte + b"".join(t.tobytes() for t in tableaux))
+        self.precedent = (ids, positions, etats_feux)
+        self.n_pas += 1
+        if len(self.bloc) >= self.taille_bloc:
+            self._ecrire_bloc()
+
+    def _ecrire_bloc(self):
+        donnees = zlib.compress(b"".join(self.bloc), 6)
+        entree = self.index[-1]
+        entree[1] = self.fichier.tell()
+        entree[2] = len(self.bloc)
+        self.fichier.write(ENTETE_BLOC.pack(MAGIQUE_BLOC, entree[0], len(self.bloc), len(donnees)) + donnees)
+        self.bloc = []
+
+    def fermer(self):
+        if self.bloc:
+            self._ecrire_bloc()
+        position = self.fichier.tell()
+        self.fichier.write(json.dumps(self.index).encode("utf-8"))
+        self.fichier.write(FIN.pack(position, MAGIQUE_INDEX))
+        self.fichier.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+
+def _decoder_bloc(donnees, premier, n_feux):
+    """Liste des pas (complets) d'un bloc décompressé"""
+    pas = []
+    ids, positions, etats_feux = None, None, None
+    curseur = 0
+    while curseur < len(donnees):
+        (n_texte,) = LONGUEUR.unpack_from(donnees, curseur)
+        curseur += LONGUEUR.size
+        entete = json.loads(donnees[curseur:curseur + n_texte].decode("utf-8"))
+        curseur += n_texte
+
+        def lire(dtype, n, forme=None):
+            nonlocal curseur
+            tableau = np.frombuffer(donnees, dtype=dtype, count=n, offset=curseur)
+            curseur += tableau.nbytes
+            return tableau.reshape(forme) if forme else tableau
+
+        if entete["k"]:
+            ids = entete["ids"]
+            positions = lire(np.int32, 2 * len(ids), (-1, 2))
+            etats_feux = list(entete["feux"])
+        else:
+            retraits = lire(np.int32, entete["n_retraits"])
+            n_gardes = len(ids) - len(retraits)
+            deltas = lire(np.int16, 2 * n_gardes, (-1, 2))
+            nouveaux = lire(np.int32, 2 * len(entete["ajouts"]), (-1, 2))
+            if len(retraits):
+                retires = set(retraits.tolist())
+                ids = [v for i, v in enumerate(ids) if i not in retires]
+                positions = np.delete(positions, retraits, axis=0)
+            ids = ids + entete["ajouts"]
+            positions = np.concatenate([positions + deltas, nouveaux])
+            etats_feux = list(etats_feux)
+            for i, etat in entete["feux"].items():
+                etats_feux[int(i)] = etat
+        vitesses = lire(np.int16, len(ids))
+        actions = lire(np.int8, n_feux)
+        pas.append(Pas(premier + len(pas), entete["t"], tuple(ids), positions.astype(np.float32) / RESOLUTION,
+                       vitesses.astype(np.float32) / RESOLUTION_VITESSE, tuple(etats_feux), actions,
+                       entete["r"], entete["c"]))
+    return pas
+
+
+class Lecteur:
+    """Relecture d'un enregistrement : accès direct par pas et blocs décodés gardés en cache"""
+
+    def __init__(self, chemin, blocs_en_cache=BLOCS_EN_CACHE):
+        self.fichier = open(chemin, "rb")
+        if self.fichier.read(len(MAGIQUE)) != MAGIQUE:
+            raise ValueError(f"{chemin} n'est pas un enregistrement de simulation")
+        (n,) = LONGUEUR.unpack(self.fichier.read(LONGUEUR.size))
+        self.entete = json.loads(self.fichier.read(n).decode("utf-8"))
+        self.feux = self.entete["feux"]
+        self.positions_feux = {tl_id: tuple(p) for tl_id, p in self.entete["positions_feux"].items()}
+        self.debut_blocs = self.fichier.tell()
+        self.index = self._lire_index()
+        self.premiers = [entree[0] for entree in self.index]
+        self.n_pas = self.index[-1][0] + self.index[-1][2] if self.index else 0
+        self.blocs_en_cache = blocs_en_cache
+        self.cache = OrderedDict()
+
+    def _lire_index(self):
+        self.fichier.seek(0, 2)
+        taille = self.fichier.tell()
+        if taille - self.debut_blocs >= FIN.size:
+            self.fichier.seek(taille - FIN.size)
+            position, magique = FIN.unpack(self.fichier.read(FIN.size))
+            if magique == MAGIQUE_INDEX:
+                self.fichier.seek(position)
+                return json.loads(self.fichier.read(taille - FIN.size - position).decode("utf-8"))
+        # Enregistrement interrompu (pas d'index) : parcours des en-têtes de blocs complets
+        index = []
+        position = self.debut_blocs
+        while position + ENTETE_BLOC.size <= taille:
+            self.fichier.seek(position)
+            magique, premier, n, longueur = ENTETE_BLOC.unpack(self.fichier.read(ENTETE_BLOC.size))
+            if magique != MAGIQUE_BLOC or position + ENTETE_BLOC.size + longueur > taille:
+                break
+            index.append([premier, position, n, None])
+            position += ENTETE_BLOC.size + longueur
+        return index
+
+    def _bloc(self, k):
+        pas = self.cache.get(k)
+        if pas is not None:
+            self.cache.move_to_end(k)
+            return pas
+        premier, position, _, _ = self.index[k]
+        self.fichier.seek(position)
+        _, _, _, longueur = ENTETE_BLOC.unpack(self.fichier.read(ENTETE_BLOC.size))
+        pas = _decoder_bloc(zlib.decompress(self.fichier.read(longueur)), premier, len(self.feux))
+        self.cache[k] = pas
+        if len(self.cache) > self.blocs_en_cache:
+            self.cache.popitem(last=False)
+        return pas
+
+    def pas(self, numero):
+        """Pas `numero` (0 <= numero < n_pas), reconstitué"""
+        k = bisect_right(self.premiers, numero) - 1
+        return self._bloc(k)[numero - self.premiers[k]]
+
+    def __len__(self):
+        return self.n_pas
+
+    def fermer(self):
+        self.fichier.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Résumé d'un enregistrement de simulation")
+    parser.add_argument("fichier")
+    args = parser.parse_args()
+    lecteur = Lecteur(args.fichier)
+    print(f"{lecteur.n_pas} pas en {len(lecteur.index)} blocs, {len(lecteur.feux)} feux")
+    if lecteur.n_pas:
+        premier, dernier = lecteur.pas(0), lecteur.pas(lecteur.n_pas - 1)
+        print(f"De {premier.temps:.0f}s à {dernier.temps:.0f}s, {len(dernier.vehicules)} véhicules au dernier pas")
+    lecteur.fermer()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Entraînement DQN asynchrone : un processus acteur pilote SUMO, un processus
+apprenant entraîne le réseau en continu.
+
+L'acteur choisit les durées de phase avec une copie locale du modèle et pousse
+ses transitions dans une file. L'apprenant échantillonne sa mémoire, entraîne
+par mini-lots et republie ses poids toutes les K mises à jour. Les deux débits
+(pas de simulation/s et mises à jour/s) se recouvrent au lieu de s'additionner.
+"""
+
+import sys
+import time
+import queue
+import traceback
+import random
+import multiprocessing as mp
+from collections import deque
+
+import numpy as np
+
+# Configuration de SUMO
+config_file = "osm.sumocfg"
+profil = "entrainement"  # "demo" pour suivre la simulation dans sumo-gui
+simulation_steps = 1000
+
+# Paramètres du RL
+ACTIONS = [5, 10, 15, 20]  # Durées de phase possibles (s)
+STATE_SIZE = 1
+GAMMA = 0.9
+EPSILON = 0.1
+LEARNING_RATE = 0.01
+MEMORY_SIZE = 20000
+BATCH_SIZE = 32
+
+# Paramètres de l'architecture acteur / apprenant
+PUBLICATION_INTERVAL = 50  # K : publication des poids toutes les K mises à jour
+TRANSITIONS_PAR_PAQUET = 64  # Transitions regroupées avant envoi à l'apprenant
+TAILLE_FILE_TRANSITIONS = 256  # Paquets en attente avant abandon côté acteur
+FICHIER_POIDS = "dqn_asynchrone.weights.h5"
+FICHIER_JOURNAL = "journal_dqn_asynchrone.csv"  # Rejouable hors ligne (dataset_hors_ligne.py)
+ATTENTE_STATS = 1.0  # s entre deux vérifications des processus pendant l'attente de leurs résultats
+
+
+def build_model():
+    """Construire le réseau neuronal pour DQN"""
+    import keras
+
+    model = keras.Sequential([
+        keras.Input(shape=(STATE_SIZE,)),
+        keras.layers.Dense(24, activation='relu'),
+        keras.layers.Dense(24, activation='relu'),
+        keras.layers.Dense(len(ACTIONS), activation='linear')  # 4 actions (durée du feu)
+    ])
+    model.compile(optimizer=keras.optimizers.Adam(learning_rate=LEARNING_RATE), loss='mse')
+    return model
+
+
+def publier_poids(file_poids, poids):
+    """Publie les poids en remplaçant une publication pas encore consommée"""
+    try:
+        file_poids.get_nowait()
+    except queue.Empty:
+        pass
+    try:
+        file_poids.put_nowait(poids)
+    except queue.Full:
+        pass  # L'acteur recevra la prochaine publication
+
+
+def executer(nom, fonction, file_stats, arret, *args):
+    """Lance `fonction` et publie toujours un résultat, même en cas d'erreur, puis signale l'arrêt"""
+    stats = {"erreur": "interrompu"}
+    try:
+        stats = fonction(*args)
+    except BaseException:
+        stats = {"erreur": traceback.format_exc()}
+        raise
+    finally:
+        arret.set()
+        file_stats.put((nom, stats))
+
+
+def acteur(file_transitions, file_poids, file_stats, arret):
+    """Processus acteur : simulation protégée, résultat toujours publié"""
+    executer("acteur", simuler, file_stats, arret, file_transitions, file_poids)
+
+
+def apprenant(file_transitions, file_poids, file_stats, arret):
+    """Processus apprenant : entraînement protégé, résultat toujours publié"""
+    executer("apprenant", entrainer, file_stats, arret, file_transitions, file_poids, arret)
+
+
+def simuler(file_transitions, file_poids):
+    """Fait avancer SUMO et choisit les actions avec une copie locale du modèle"""
+    import traci
+    from dataset_hors_ligne import JournalTransitions
+    from profils_simulation import commande_sumo
+
+    model = build_model()
+    journal = JournalTransitions(FICHIER_JOURNAL, ["vehicules_arretes"])
+    try:
+        traci.start(commande_sumo(profil, config_file))
+        try:
+            return _boucle_acteur(traci, model, journal, file_transitions, file_poids)
+        finally:
+            traci.close()
+    finally:
+        journal.close()
+
+
+def _boucle_acteur(traci, model, journal, file_transitions, file_poids):
+    """Boucle de simulation de l'acteur ; renvoie ses statistiques"""
+    controlled_lanes = {}  # Topologie mise en cache : feu -> voies contrôlées
+
+    def get_state(tl_id):
+        """Nombre de véhicules à l'arrêt sur les voies contrôlées par le feu"""
+        if tl_id not in controlled_lanes:
+            controlled_lanes[tl_id] = sorted(set(traci.trafficlight.getControlledLanes(tl_id)))
+        return sum(traci.lane.getLastStepHaltingNumber(lane) for lane in controlled_lanes[tl_id])
+
+    paquet = []
+    paquets_abandonnes = 0
+    transitions = 0
+    versions_recues = 0
+    precedent = {}  # feu -> (état, indice d'action) du pas précédent
+    debut = time.perf_counter()
+
+    def envoyer(paquet):
+        """Envoie un paquet de transitions sans jamais bloquer la simulation"""
+        etats, actions, recompenses, etats_suivants = zip(*paquet)
+        try:
+            file_transitions.put_nowait((
+                np.array(etats, dtype=np.float32).reshape(-1, STATE_SIZE),
+                np.array(actions, dtype=np.int64),
+                np.array(recompenses, dtype=np.float32),
+                np.array(etats_suivants, dtype=np.float32).reshape(-1, STATE_SIZE),
+            ))
+            return 0
+        except queue.Full:
+            return 1
+
+    for step in range(simulation_steps):
+        # Récupérer la dernière publication de poids, sans attendre
+        try:
+            model.set_weights(file_poids.get_nowait())
+            versions_recues += 1
+        except queue.Empty:
+            pass
+
+        traci.simulationStep()
+
+        traffic_light_ids = traci.trafficlight.getIDList()
+        states = {tl_id: get_state(tl_id) for tl_id in traffic_light_ids}
+
+        # Transitions du pas précédent : l'état suivant est observé maintenant
+        for tl_id, (state, action_idx) in precedent.items():
+            new_state = states[tl_id]
+            paquet.append((state, action_idx, -new_state, new_state))
+            journal.enregistrer(step - 1, tl_id, [state], ACTIONS[action_idx], -new_state)
+        precedent = {}
+
+        actifs = [tl_id for tl_id in traffic_light_ids if states[tl_id] > 0]
+        if actifs:
+            # Une seule passe avant pour tous les feux actifs
+            q_values = model(np.array([[states[tl_id]] for tl_id in actifs], dtype=np.float32),
+                             training=False).numpy()
+            for tl_id, q in zip(actifs, q_values):
+                if np.random.rand() < EPSILON:
+                    action_idx = random.randrange(len(ACTIONS))  # Exploration
+                else:
+                    action_idx = int(np.argmax(q))
+                traci.trafficlight.setPhaseDuration(tl_id, ACTIONS[action_idx])
+                precedent[tl_id] = (states[tl_id], action_idx)
+
+        if len(paquet) >= TRANSITIONS_PAR_PAQUET:
+            transitions += len(paquet)
+            paquets_abandonnes += envoyer(paquet)
+            paquet = []
+
+    if paquet:
+        transitions += len(paquet)
+        paquets_abandonnes += envoyer(paquet)
+
+    duree = time.perf_counter() - debut
+    return {
+        "pas": simulation_steps,
+        "duree": duree,
+        "pas_par_s": simulation_steps / duree,
+        "transitions": transitions,
+        "paquets_abandonnes": paquets_abandonnes,
+        "versions_poids_recues": versions_recues,
+    }
+
+
+def entrainer(file_transitions, file_poids, arret):
+    """Entraîne le modèle en continu sur les transitions reçues de l'acteur"""
+    model = build_model()
+    memory = deque(maxlen=MEMORY_SIZE)
+    mises_a_jour = 0
+    publications = 0
+    duree_entrainement = 0.0
+    debut = time.perf_counter()
+
+    def recevoir(paquet):
+        """Ajoute un paquet de transitions à la mémoire de replay"""
+        memory.extend(zip(*paquet))
+
+    while not (arret.is_set() and file_transitions.empty()):
+        # Vider la file sans bloquer si la mémoire permet déjà d'entraîner
+        try:
+            recevoir(file_transitions.get(timeout=0.05 if len(memory) < BATCH_SIZE else 0.001))
+            while True:
+                recevoir(file_transitions.get_nowait())
+        except queue.Empty:
+            pass
+
+        if len(memory) < BATCH_SIZE:
+            continue
+
+        t0 = time.perf_counter()
+        minibatch = random.sample(memory, BATCH_SIZE)
+        states, actions, rewards, next_states = (np.array(x) for x in zip(*minibatch))
+
+        # Cibles calculées pour tout le mini-lot en deux passes avant
+        targets = model.predict_on_batch(states)
+        next_q = model.predict_on_batch(next_states)
+        targets[np.arange(BATCH_SIZE), actions] = rewards + GAMMA * np.max(next_q, axis=1)
+        model.train_on_batch(states, targets)
+        duree_entrainement += time.perf_counter() - t0
+        mises_a_jour += 1
+
+        if mises_a_jour % PUBLICATION_INTERVAL == 0:
+            publier_poids(file_poids, model.get_weights())
+            publications += 1
+
+    duree = time.perf_counter() - debut
+    model.save_weights(FICHIER_POIDS)
+    return {
+        "mises_a_jour": mises_a_jour,
+        "duree": duree,
+        "duree_entrainement": duree_entrainement,
+        "mises_a_jour_par_s": mises_a_jour / max(duree_entrainement, 1e-9),
+        "echantillons_par_s": mises_a_jour * BATCH_SIZE / max(duree_entrainement, 1e-9),
+        "publications": publications,
+        "memoire": len(memory),
+    }
+
+
+def attendre_stats(processus, file_stats, arret):
+    """Résultats de chaque processus ; un processus mort sans rien publier est signalé au lieu de bloquer"""
+    stats = {}
+    while len(stats) < len(processus):
+        try:
+            nom, valeurs = file_stats.get(timeout=ATTENTE_STATS)
+            stats[nom] = valeurs
+        except queue.Empty:
+            # Plus rien dans la file : un processus terminé sans résultat ne publiera plus
+            for p in processus:
+                if p.exitcode is not None and p.name not in stats:
+                    stats[p.name] = {"erreur": f"processus terminé sans résultat (code {p.exitcode})"}
+                    arret.set()
+    return stats
+
+
+def main():
+    # "spawn" : TensorFlow ne supporte pas d'être hérité par fork
+    ctx = mp.get_context("spawn")
+    file_transitions = ctx.Queue(maxsize=TAILLE_FILE_TRANSITIONS)
+    file_poids = ctx.Queue(maxsize=1)
+    file_stats = ctx.Queue()
+    arret = ctx.Event()
+
+    debut = time.perf_counter()
+    processus = [
+        ctx.Process(target=acteur, args=(file_transitions, file_poids, file_stats, arret), name="acteur"),
+        ctx.Process(target=apprenant, args=(file_transitions, file_poids, file_stats, arret), name="apprenant"),
+    ]
+    for p in processus:
+        p.start()
+    stats = attendre_stats(processus, file_stats, arret)
+    for p in processus:
+        p.join()
+    duree_totale = time.perf_counter() - debut
+
+    erreurs = {nom: s["erreur"] for nom, s in stats.items() if "erreur" in s}
+    if erreurs:
+        for nom, erreur in erreurs.items():
+            print(f"Échec du processus {nom} :\n{erreur}", file=sys.stderr)
+        sys.exit(1)
+
+    a, l = stats["acteur"], stats["apprenant"]
+    print(f"Acteur    : {a['pas']} pas en {a['duree']:.1f}s ({a['pas_par_s']:.1f} pas/s), "
+          f"{a['transitions']} transitions, {a['paquets_abandonnes']} paquets abandonnés, "
+          f"{a['versions_poids_recues']} versions de poids reçues")
+    print(f"Apprenant : {l['mises_a_jour']} mises à jour ({l['mises_a_jour_par_s']:.1f}/s, "
+          f"{l['echantillons_par_s']:.0f} échantillons/s), {l['publications']} publications")
+    # En séquentiel, simulation et entraînement se seraient additionnés
+    print(f"Durée totale : {duree_totale:.1f}s "
+          f"(séquentiel estimé : {a['duree'] + l['duree_entrainement']:.1f}s)")
+    print(f"Poids finaux enregistrés dans {FICHIER_POIDS}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Extraction d'un sous-réseau autour de quelques feux.
+
+À partir d'une liste de feux (ou d'un rectangle), découpe osm.net.xml.gz avec
+une marge, route la demande sur le réseau complet puis la coupe à la frontière
+du sous-réseau (cutRoutes.py), et écrit un .sumocfg prêt pour l'entraînement.
+Le résultat est mis en cache sous l'empreinte des entrées, et un rapport
+indique la demande perdue à la frontière.
+
+Utilisation :
+    python extraction_sous_reseau.py --feux 26853498 26853499 --marge 300
+    python extraction_sous_reseau.py --bbox 1000 1000 2500 2200 --marge 0
+"""
+
+import os
+import sys
+import gzip
+import json
+import argparse
+import subprocess
+import xml.etree.ElementTree as ET
+
+from cache_contenu import empreinte, empreinte_config, DOSSIER_CACHE
+from cache_routes import router_demande
+from scenarios_curriculum import fichiers_routes, fichier_reseau, ELEMENTS_DEMANDE
+
+if "SUMO_HOME" in os.environ:
+    sys.path.append(os.path.join(os.environ["SUMO_HOME"], "tools"))
+import sumolib
+
+config_file = "osm.sumocfg"
+MARGE = 300  # m ajoutés autour des feux ou du rectangle sélectionnés
+DOSSIER_SOUS_RESEAUX = os.path.join(DOSSIER_CACHE, "sous_reseaux")
+
+
+def outil_sumo(*chemin):
+    """Chemin d'un script des outils SUMO"""
+    return os.path.join(os.environ["SUMO_HOME"], "tools", *chemin)
+
+
+def rectangle_feux(net_file, tl_ids, marge=MARGE):
+    """Rectangle englobant les voies contrôlées par les feux, élargi de la marge"""
+    net = sumolib.net.readNet(net_file, withPrograms=False)
+    xs, ys = [], []
+    for tl_id in tl_ids:
+        for entree, sortie, _ in net.getTLS(tl_id).getConnections():
+            for x, y in entree.getShape() + sortie.getShape():
+                xs.append(x)
+                ys.append(y)
+    if not xs:
+        raise ValueError(f"Aucune voie contrôlée trouvée pour les feux {tl_ids}")
+    return min(xs) - marge, min(ys) - marge, max(xs) + marge, max(ys) + marge
+
+
+def aretes_reseau(net_file):
+    """Identifiants des arêtes (hors arêtes internes) d'un réseau, lus en flux"""
+    aretes = set()
+    ouvrir = gzip.open if net_file.endswith(".gz") else open
+    with ouvrir(net_file, "rb") as f:
+        for _, element in ET.iterparse(f):
+            if element.tag == "edge" and element.get("function") != "internal":
+                aretes.add(element.get("id"))
+            if element.tag in ("edge", "junction", "connection", "tlLogic", "roundabout"):
+                element.clear()
+    return aretes
+
+
+def classer_demande(fichier_routes, aretes):
+    """Compte les éléments de demande entièrement dedans, coupés par la frontière ou dehors"""
+    compte = {"dedans": 0, "frontiere": 0, "dehors": 0}
+    profondeur = 0
+    for evenement, element in ET.iterparse(fichier_routes, events=("start", "end")):
+        if evenement == "start":
+            profondeur += 1
+            continue
+        profondeur -= 1
+        if profondeur != 1 or element.tag not in ELEMENTS_DEMANDE:
+            continue
+        parcours = [e for sous in element.iter() if sous.get("edges") for e in sous.get("edges").split()]
+        dedans = sum(e in aretes for e in parcours)
+        if parcours and dedans == len(parcours):
+            compte["dedans"] += 1
+        elif dedans:
+            compte["frontiere"] += 1
+        else:
+            compte["dehors"] += 1
+        element.clear()
+    return compte
+
+
+def compter_demande(fichier_routes):
+    """Nombre d'éléments de demande d'un fichier"""
+    n = 0
+    profondeur = 0
+    for evenement, element in ET.iterparse(fichier_routes, events=("start", "end")):
+        if evenement == "start":
+            profondeur += 1
+            continue
+        profondeur -= 1
+        if profondeur == 1 and element.tag in ELEMENTS_DEMANDE:
+            n += 1
+            element.clear()
+    return n
+
+
+def extraire(tl_ids=None, bbox=None, marge=MARGE, base=config_file):
+    """Construit (ou réutilise) le scénario réduit et renvoie son rapport
+
+    La marge élargit la zone, qu'elle vienne des feux ou d'un rectangle (marge=0 : rectangle tel quel).
+    """
+    net_file = fichier_reseau(base)
+    cle = empreinte(empreinte_config(base), sorted(tl_ids or []), bbox, marge)
+    dossier = os.path.join(DOSSIER_SOUS_RESEAUX, cle[:16])
+    chemin_rapport = os.path.join(dossier, "rapport.json")
+    if os.path.exists(chemin_rapport):
+        with open(chemin_rapport, encoding="utf-8") as f:
+            return json.load(f)
+    os.makedirs(dossier, exist_ok=True)
+
+    if bbox is None:
+        bbox = rectangle_feux(net_file, tl_ids, marge)
+    else:
+        xmin, ymin, xmax, ymax = bbox
+        bbox = (xmin - marge, ymin - marge, xmax + marge, ymax + marge)
+    sous_reseau = os.path.join(dossier, "sous_reseau.net.xml.gz")
+    subprocess.run([sumolib.checkBinary("netconvert"), "-s", net_file,
+                    "--keep-edges.in-boundary", ",".join(f"{v:.2f}" for v in bbox),
+                    "-o", sous_reseau, "--no-warnings"], check=True)
+    aretes = aretes_reseau(sous_reseau)
+
+    rapport = {"feux": tl_ids, "bbox": list(bbox), "marge": marge, "aretes": len(aretes), "demande": {}}
+    routes_coupees = []
+    for source in fichiers_routes(base):
+        nom = os.path.basename(source).replace(".trips.xml", ".rou.xml")
+        routes = source
+        if source.endswith(".trips.xml"):
+            # Les trips n'ont pas d'itinéraire : on les route d'abord sur le réseau complet (cache partagé)
+            routes = router_demande(net_file, source)
+        coupe = os.path.join(dossier, nom)
+        subprocess.run([sys.executable, outil_sumo("route", "cutRoutes.py"), sous_reseau, routes,
+                        "--routes-output", coupe, "--orig-net", net_file,
+                        "--disconnected-action", "discard"], check=True)
+        classes = classer_demande(routes, aretes)
+        conserves = compter_demande(coupe)
+        rapport["demande"][os.path.basename(source)] = dict(
+            classes, conserves=conserves,
+            perdus_frontiere=classes["dedans"] + classes["frontiere"] - conserves)
+        routes_coupees.append(coupe)
+
+    # Configuration réduite : mêmes options que la base, sans polygones ni vue GUI
+    config = os.path.join(dossier, "osm.sumocfg")
+    arbre = ET.parse(base)
+    entrees = arbre.getroot().find("input")
+    for element in list(entrees):
+        if element.tag == "additional-files":
+            entrees.remove(element)
+    entrees.find("net-file").set("value", os.path.basename(sous_reseau))
+    entrees.find("route-files").set("value", ",".join(os.path.basename(f) for f in routes_coupees))
+    gui = arbre.getroot().find("gui_only")
+    if gui is not None:
+        arbre.getroot().remove(gui)
+    arbre.write(config, encoding="UTF-8", xml_declaration=True)
+
+    rapport["config"] = config
+    with open(chemin_rapport, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, indent=2)
+    return rapport
+
+
+def afficher_rapport(rapport):
+    print(f"Sous-réseau : {rapport['aretes']} arêtes, rectangle {[round(v) for v in rapport['bbox']]}")
+    print(f"Configuration : {rapport['config']}")
+    total_utiles, total_perdus = 0, 0
+    for fichier, d in rapport["demande"].items():
+        utiles = d["dedans"] + d["frontiere"]
+        total_utiles += utiles
+        total_perdus += d["perdus_frontiere"]
+        print(f"  {fichier:<30} dedans {d['dedans']:>5}, coupés {d['frontiere']:>5}, dehors {d['dehors']:>5}"
+              f" -> conservés {d['conserves']:>5}, perdus à la frontière {d['perdus_frontiere']:>4}")
+    if total_utiles:
+        print(f"Demande perdue à la frontière : {total_perdus}/{total_utiles} "
+              f"({total_perdus / total_utiles:.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Découpe d'un sous-réseau et de sa demande")
+    groupe = parser.add_mutually_exclusive_group(required=True)
+    groupe.add_argument("--feux", nargs="+", help="identifiants des feux à conserver")
+    groupe.add_argument("--bbox", type=float, nargs=4, metavar=("XMIN", "YMIN", "XMAX", "YMAX"))
+    parser.add_argument("--marge", type=float, default=MARGE,
+                        help="m ajoutés autour des feux ou du rectangle (0 : rectangle tel quel)")
+    parser.add_argument("--config", default=config_file)
+    args = parser.parse_args()
+    afficher_rapport(extraire(args.feux, args.bbox, args.marge, args.config))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Ferme d'évaluation des politiques de feux.
+
+Évalue des politiques sauvegardées (PPO .zip, poids DQN .weights.h5, tables Q
+.pkl, ou "programme_fixe" comme référence) sur une grille de graines et
+d'échelles de demande, en parallèle sur plusieurs instances SUMO. Les
+indicateurs sont lus dans les sorties de SUMO (indicateurs_sorties.py) ; la
+référence tourne avec `sumo` seul, sans TraCI. Chaque
+résultat est mis en cache sous l'empreinte politique + configuration + graine :
+une évaluation déjà faite n'est jamais relancée.
+
+Utilisation :
+    python ferme_evaluation.py ppo_sumo.zip q_table.pkl programme_fixe --seeds 0 1 2 --echelles 0.5 1.0
+"""
+
+import os
+import csv
+import json
+import pickle
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from cache_contenu import empreinte, empreinte_fichier, empreinte_config, chemin_cache
+from indicateurs_sorties import evaluer_sans_traci, indicateurs, options_sorties, voies_controlees
+from profils_simulation import PROFILS, binaire_profil, config_profil
+from scenarios_curriculum import fichier_reseau
+
+# Configuration de SUMO
+config_file = "osm.sumocfg"
+profil = "evaluation"  # Sans interface, sorties lues par indicateurs_sorties.py
+
+DUREE_EVALUATION = 3600  # s simulées par évaluation
+VERSION_KPI = 2  # À incrémenter si le calcul des indicateurs change (invalide le cache)
+REFERENCE = "programme_fixe"  # Pseudo-politique : programmes des feux non modifiés
+FICHIER_RESULTATS = "resultats_evaluation.csv"
+COLONNES_KPI = ["retard_moyen", "file_moyenne", "debit_horaire", "teleportations", "vehicules_arrives",
+                "longueur_file_moyenne", "longueur_file_max", "vitesse_moyenne"]
+
+
+def type_politique(politique):
+    """Déduit le type de politique du nom de fichier"""
+    if politique == REFERENCE:
+        return "reference"
+    if politique.endswith(".zip"):
+        return "ppo"
+    if politique.endswith(".weights.h5"):
+        return "dqn"
+    if politique.endswith(".pkl"):
+        return "q_table"
+    raise ValueError(f"Type de politique inconnu : {politique}")
+
+
+def sauvegarder_q_table(q_table, fichier, etat_max=None):
+    """Point de contrôle d'une table Q, lisible par la ferme d'évaluation"""
+    with open(fichier, "wb") as f:
+        pickle.dump({"q_table": dict(q_table), "etat_max": etat_max}, f)
+
+
+def etat_q_table(conn, tl_id, voies=None):
+    """État tabulaire du Q-learning : véhicules à l'arrêt sur les voies contrôlées par le feu.
+
+    Liste brute de getControlledLanes, doublons compris (une voie compte une fois par
+    connexion contrôlée) : l'entraînement et l'évaluation doivent calculer les mêmes clés.
+    """
+    if voies is None:
+        voies = conn.trafficlight.getControlledLanes(tl_id)
+    return sum(conn.lane.getLastStepHaltingNumber(lane) for lane in voies)
+
+
+def cle_evaluation(politique, config, seed, echelle, duree):
+    """Clé de cache : contenu de la politique, de la configuration et paramètres"""
+    contenu = REFERENCE if politique == REFERENCE else empreinte_fichier(politique)
+    # 3600 et 3600.0 (API / ligne de commande) désignent la même évaluation
+    return empreinte(VERSION_KPI, contenu, empreinte_config(config), PROFILS[profil], seed, float(echelle),
+                     float(duree))
+
+
+class ControleurReference:
+    """Laisse les feux suivre leur programme"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def pas(self):
+        self.conn.simulationStep()
+
+
+class ControleurQTable(ControleurReference):
+    """Politique gloutonne issue d'une table Q (0 = maintien, 1 = inversion r/g)"""
+
+    def __init__(self, conn, fichier):
+        super().__init__(conn)
+        with open(fichier, "rb") as f:
+            checkpoint = pickle.load(f)
+        self.q_table = checkpoint["q_table"]
+        self.etat_max = checkpoint.get("etat_max")
+        # Même liste de voies qu'à l'entraînement (sans dédoublonnage), lue une fois
+        self.voies = {tl_id: list(conn.trafficlight.getControlledLanes(tl_id))
+                      for tl_id in conn.trafficlight.getIDList()}
+
+    def pas(self):
+        for tl_id, voies in self.voies.items():
+            state = etat_q_table(self.conn, tl_id, voies)
+            if self.etat_max is not None:
+                state = min(state, self.etat_max)
+            q = self.q_table.get((tl_id, state))
+            if q is not None and np.argmax(q) == 1:
+                current = self.conn.trafficlight.getRedYellowGreenState(tl_id)
+                self.conn.trafficlight.setRedYellowGreenState(
+                    tl_id, ''.join({'r': 'g', 'g': 'r'}.get(c, c) for c in current))
+        self.conn.simulationStep()
+
+
+class ControleurDQN(ControleurReference):
+    """Durées de phase choisies par le DQN de entrainement_dqn_asynchrone.py"""
+
+    def __init__(self, conn, fichier):
+        super().__init__(conn)
+        import entrainement_dqn_asynchrone as dqn
+
+        self.actions = dqn.ACTIONS
+        self.model = dqn.build_model()
+        self.model.load_weights(fichier)
+        self.voies = {tl_id: sorted(set(conn.trafficlight.getControlledLanes(tl_id)))
+                      for tl_id in conn.trafficlight.getIDList()}
+
+    def pas(self):
+        self.conn.simulationStep()
+        states = {tl_id: sum(self.conn.lane.getLastStepHaltingNumber(lane) for lane in voies)
+                  for tl_id, voies in self.voies.items()}
+        actifs = [tl_id for tl_id, state in states.items() if state > 0]
+        if actifs:
+            q_values = self.model(np.array([[states[tl_id]] for tl_id in actifs], dtype=np.float32),
+                                  training=False).numpy()
+            for tl_id, q in zip(actifs, q_values):
+                self.conn.trafficlight.setPhaseDuration(tl_id, self.actions[int(np.argmax(q))])
+
+
+class ControleurPPO:
+    """Politique PPO jouée dans l'environnement avec lequel elle a été entraînée"""
+
+    def __init__(self, env, fichier):
+        from stable_baselines3 import PPO
+
+        self.env = env
+        self.conn = env.conn
+        self.model = PPO.load(fichier)
+        self.obs = env._get_state()
+
+    def pas(self):
+        action, _states = self.model.predict(self.obs, deterministic=True)
+        self.obs, _, _, _, _ = self.env.step(action)
+
+
+def evaluer(politique, config, seed, echelle, duree, dossier):
+    """Exécute une évaluation et renvoie ses indicateurs"""
+    genre = type_politique(politique)
+    if genre == "reference":
+        # Aucune décision à prendre pendant la simulation : `sumo` seul suffit
+        return evaluer_sans_traci(config, seed, echelle, duree, dossier)
+
+    import traci
+
+    label = f"eval_{os.getpid()}"
+    options = ["--scale", str(echelle)]
+
+    if genre == "ppo":
+        import code_entrainement_model as entrainement
+        from stable_baselines3 import PPO
+
+        espace = PPO.load(politique).observation_space
+        env_class = entrainement.SumoEnvReseau if len(espace.shape) == 2 else entrainement.SumoEnv
+        env = env_class(label=label, seed_sumo=seed, output_dir=dossier, profil=profil,
+                        sumo_config=config, n_etats=0,
+                        # Le préfixe de sortie de l'environnement place déjà les fichiers dans `dossier`
+                        options_sumo=options + options_sorties())
+        controleur = ControleurPPO(env, politique)
+    else:
+        # Sorties du profil redirigées dans `dossier` : les instances parallèles ne partagent aucun fichier
+        traci.start([binaire_profil(profil), "-c", config_profil(profil, config), "--seed", str(seed)]
+                    + options + options_sorties(dossier), label=label)
+        conn = traci.getConnection(label)
+        if genre == "q_table":
+            controleur = ControleurQTable(conn, politique)
+        else:
+            controleur = ControleurDQN(conn, politique)
+
+    # La boucle ne fait que jouer la politique : les indicateurs sont lus ensuite dans les sorties
+    conn = controleur.conn
+    debut = conn.simulation.getTime()
+    while conn.simulation.getTime() - debut < duree and conn.simulation.getMinExpectedNumber() > 0:
+        controleur.pas()
+    conn.close()  # Ferme SUMO, ce qui termine l'écriture des sorties
+    return indicateurs(dossier, voies_controlees(fichier_reseau(config)))
+
+
+def _tache(politique, config, seed, echelle, duree, cle):
+    """Point d'entrée d'un processus de la ferme : évalue puis écrit le cache"""
+    dossier = os.path.join("sorties_evaluation", cle[:16])
+    os.makedirs(dossier, exist_ok=True)
+    kpi = evaluer(politique, config, seed, echelle, duree, dossier)
+    with open(chemin_cache("evaluations", cle, ".json"), "w", encoding="utf-8") as f:
+        json.dump({"politique": politique, "seed": seed, "echelle": echelle, "duree": duree, "kpi": kpi}, f)
+    return kpi
+
+
+def lancer_ferme(politiques, seeds, echelles, config=config_file, duree=DUREE_EVALUATION,
+                 workers=None, fichier_resultats=FICHIER_RESULTATS):
+    """Évalue la grille politiques x graines x échelles et écrit la table des indicateurs"""
+    lignes = []
+    a_calculer = {}
+    for politique in politiques:
+        for seed in seeds:
+            for echelle in echelles:
+                cle = cle_evaluation(politique, config, seed, echelle, duree)
+                ligne = {"politique": politique, "seed": seed, "echelle": echelle, "cle": cle[:16]}
+                cache = chemin_cache("evaluations", cle, ".json")
+                if os.path.exists(cache):
+                    with open(cache, encoding="utf-8") as f:
+                        ligne.update(json.load(f)["kpi"], en_cache=True)
+                else:
+                    a_calculer[cle] = ligne
+                lignes.append(ligne)
+
+    print(f"{len(lignes)} évaluations, {len(lignes) - len(a_calculer)} déjà en cache, "
+          f"{len(a_calculer)} à lancer")
+    if a_calculer:
+        # "spawn" : chaque processus a son propre TraCI et, le cas échéant, son TensorFlow
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+            futures = {pool.submit(_tache, l["politique"], config, l["seed"], l["echelle"], duree, cle): cle
+                       for cle, l in a_calculer.items()}
+            for future in as_completed(futures):
+                ligne = a_calculer[futures[future]]
+                ligne.update(future.result(), en_cache=False)
+                print(f"  {ligne['politique']} seed={ligne['seed']} échelle={ligne['echelle']} : "
+                      f"retard {ligne['retard_moyen']:.1f}s, file {ligne['file_moyenne']:.1f}")
+
+    colonnes = ["politique", "seed", "echelle"] + COLONNES_KPI + ["en_cache", "cle"]
+    with open(fichier_resultats, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=colonnes)
+        writer.writeheader()
+        writer.writerows(lignes)
+
+    # Moyennes par politique et échelle de demande
+    print(f"\n{'politique':<30} {'échelle':>7} " + " ".join(f"{c:>16}" for c in COLONNES_KPI))
+    for politique in politiques:
+        for echelle in echelles:
+            groupe = [l for l in lignes if l["politique"] == politique and l["echelle"] == echelle]
+            moyennes = [np.mean([l[c] for l in groupe]) for c in COLONNES_KPI]
+            print(f"{politique:<30} {echelle:>7} " + " ".join(f"{m:>16.2f}" for m in moyennes))
+    return lignes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Évaluation parallèle et mise en cache des politiques")
+    parser.add_argument("politiques", nargs="+", help=f"fichiers .zip, .weights.h5, .pkl ou {REFERENCE}")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--echelles", type=float, nargs="+", default=[1.0])
+    parser.add_argument("--config", default=config_file)
+    parser.add_argument("--duree", type=float, default=DUREE_EVALUATION)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--sortie", default=FICHIER_RESULTATS)
+    args = parser.parse_args()
+    lancer_ferme(args.politiques, args.seeds, args.echelles, args.config, args.duree,
+                 args.workers, args.sortie)
+
+
+if __name__ == "__main__":
+    main()
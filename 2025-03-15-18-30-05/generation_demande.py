@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Génération de la demande par classe de véhicules (remplace build.bat).
+
+Lance randomTrips.py pour chaque classe (vélo, bus, moto, voiture, piéton,
+camion) avec les paramètres de build.bat, en parallèle, avec une graine et des
+densités d'insertion explicites. Chaque classe est rangée dans cache/demande
+sous l'empreinte de ses entrées (réseau, paramètres, graine, version de
+randomTrips.py) : une demande déjà générée n'est jamais recalculée.
+
+Utilisation :
+    python generation_demande.py --seed 42
+    python generation_demande.py --densite passenger=20 truck=5 --sortie .
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from cache_contenu import empreinte, empreinte_fichier, chemin_cache
+from scenarios_curriculum import ecrire_config
+
+net_file = "osm.net.xml.gz"
+config_file = "osm.sumocfg"
+DEBUT, FIN = 0, 3600  # Période de demande (s)
+
+VIA_EDGE_TYPES = ("highway.motorway,highway.motorway_link,highway.trunk_link,highway.primary_link,"
+                  "highway.secondary_link,highway.tertiary_link")
+OPTIONS_VEHICULES = ["--trip-attributes", 'departLane="best"',
+                     "--fringe-start-attributes", 'departSpeed="max"',
+                     "--validate", "--remove-loops", "--via-edge-types", VIA_EDGE_TYPES]
+
+# Paramètres de build.bat, classe par classe
+CLASSES_DEMANDE = {
+    "bicycle": {"fringe_factor": 2, "densite": 4.2, "prefixe": "bike",
+                "options": OPTIONS_VEHICULES + ["--vehicle-class", "bicycle", "--vclass", "bicycle",
+                                                "--max-distance", "8000"]},
+    "bus": {"fringe_factor": 5, "densite": 4.4, "prefixe": "bus",
+            "options": OPTIONS_VEHICULES + ["--vehicle-class", "bus", "--vclass", "bus",
+                                            "--min-distance", "600", "--min-distance.fringe", "10"]},
+    "motorcycle": {"fringe_factor": 4.1, "densite": 4.6, "prefixe": "motorcycle",
+                   "options": OPTIONS_VEHICULES + ["--vehicle-class", "motorcycle", "--vclass", "motorcycle",
+                                                   "--max-distance", "1200"]},
+    "passenger": {"fringe_factor": 5, "densite": 12.7, "prefixe": "veh",
+                  "options": OPTIONS_VEHICULES + ["--vehicle-class", "passenger", "--vclass", "passenger",
+                                                  "--min-distance", "300", "--min-distance.fringe", "10",
+                                                  "--allow-fringe.min-length", "1000", "--lanes"]},
+    "pedestrian": {"fringe_factor": 25, "densite": 10, "prefixe": "ped",
+                   "options": ["--vehicle-class", "pedestrian", "--pedestrians", "--max-distance", "2000"]},
+    "truck": {"fringe_factor": 5, "densite": 8.4, "prefixe": "truck",
+              "options": OPTIONS_VEHICULES + ["--vehicle-class", "truck", "--vclass", "truck",
+                                              "--min-distance", "600", "--min-distance.fringe", "10"]},
+}
+
+
+def random_trips():
+    """Chemin de randomTrips.py dans l'installation SUMO"""
+    if "SUMO_HOME" not in os.environ:
+        raise EnvironmentError("SUMO_HOME n'est pas défini : randomTrips.py est introuvable")
+    return os.path.join(os.environ["SUMO_HOME"], "tools", "randomTrips.py")
+
+
+def generer_classe(classe, seed, densite=None, net=net_file, debut=DEBUT, fin=FIN):
+    """Génère (ou réutilise) trips et routes d'une classe ; renvoie leurs chemins en cache"""
+    parametres = dict(CLASSES_DEMANDE[classe])
+    if densite is not None:
+        parametres["densite"] = densite
+    outil = random_trips()
+    cle = empreinte(empreinte_fichier(net), empreinte_fichier(outil), classe, parametres, seed, debut, fin)
+    trips = chemin_cache("demande", cle, f".osm.{classe}.trips.xml")
+    routes = chemin_cache("demande", cle, f".osm.{classe}.rou.xml")
+    if os.path.exists(trips) and os.path.exists(routes):
+        return trips, routes, False
+
+    temporaires = trips + ".tmp", routes + ".tmp"
+    subprocess.run([sys.executable, outil, "-n", net,
+                    "--fringe-factor", str(parametres["fringe_factor"]),
+                    "--insertion-density", str(parametres["densite"]),
+                    "-o", temporaires[0], "-r", temporaires[1],
+                    "-b", str(debut), "-e", str(fin),
+                    "--prefix", parametres["prefixe"], "--seed", str(seed)] + parametres["options"],
+                   check=True, stdout=subprocess.DEVNULL)
+    os.replace(temporaires[0], trips)
+    os.replace(temporaires[1], routes)
+    return trips, routes, True
+
+
+def generer_demande(classes=None, seed=42, densites=None, net=net_file, debut=DEBUT, fin=FIN, workers=None):
+    """Génère toutes les classes en parallèle ; renvoie {classe: (trips, routes, recalculé)}"""
+    classes = classes or list(CLASSES_DEMANDE)
+    densites = densites or {}
+    with ThreadPoolExecutor(max_workers=workers or len(classes)) as pool:
+        resultats = pool.map(lambda c: generer_classe(c, seed, densites.get(c), net, debut, fin), classes)
+        return dict(zip(classes, resultats))
+
+
+def installer(demande, dossier):
+    """Copie la demande générée sous les noms attendus par osm.sumocfg"""
+    for classe, (trips, routes, _) in demande.items():
+        shutil.copyfile(trips, os.path.join(dossier, f"osm.{classe}.trips.xml"))
+        shutil.copyfile(routes, os.path.join(dossier, f"osm.{classe}.rou.xml"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génération de la demande par classe (randomTrips.py)")
+    parser.add_argument("--classes", nargs="+", choices=list(CLASSES_DEMANDE), default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--densite", nargs="+", default=[], metavar="CLASSE=VALEUR",
+                        help="densité d'insertion (véhicules/h/km) par classe")
+    parser.add_argument("--debut", type=float, default=DEBUT)
+    parser.add_argument("--fin", type=float, default=FIN)
+    parser.add_argument("--net", default=net_file)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--sortie", default=None,
+                        help="dossier où copier les fichiers (comme build.bat) ; sinon seul le cache est rempli")
+    args = parser.parse_args()
+
+    densites = {classe: float(valeur) for classe, valeur in (d.split("=") for d in args.densite)}
+    demande = generer_demande(args.classes, args.seed, densites, args.net, args.debut, args.fin, args.workers)
+    for classe, (trips, routes, recalcule) in demande.items():
+        print(f"{classe:<11} {'généré' if recalcule else 'en cache':<9} {trips}")
+
+    # Configuration pointant vers la demande en cache (piétons routés, véhicules en trips, comme osm.sumocfg)
+    fichiers = [routes if classe == "pedestrian" else trips for classe, (trips, routes, _) in demande.items()]
+    config = chemin_cache("demande", empreinte(sorted(fichiers)), "." + os.path.basename(config_file))
+    ecrire_config(config_file, config, fichiers)
+    print(f"Configuration : {config}")
+
+    if args.sortie:
+        installer(demande, args.sortie)
+        print(f"Fichiers copiés dans {args.sortie}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Trajectoires récentes des véhicules dans des tampons circulaires numpy.
+
+Chaque véhicule en circulation occupe un emplacement : une ligne d'un
+tableau (emplacements, longueur, 2) où ses dernières positions tournent en
+rond. L'emplacement est rendu dès que SUMO signale l'arrivée du véhicule
+(getArrivedIDList) et réutilisé par le suivant ; le tableau ne grandit que
+jusqu'à un plafond en octets, au-delà duquel les nouveaux véhicules ne sont
+plus suivis. Mémoire et parcours ne dépendent donc que des véhicules
+présents, jamais de tous ceux vus depuis le début.
+"""
+
+import numpy as np
+
+LONGUEUR = 100  # Positions gardées par véhicule
+OCTETS_MAX = 64 * 1024 * 1024  # Plafond de mémoire des positions
+CAPACITE_INITIALE = 1024  # Emplacements alloués au départ (doublés au besoin)
+
+
+class HistoriqueTrajectoires:
+    """Emplacements à tampon circulaire, alloués au départ des véhicules et libérés à leur arrivée"""
+
+    def __init__(self, longueur=LONGUEUR, octets_max=OCTETS_MAX, capacite_initiale=CAPACITE_INITIALE):
+        self.longueur = longueur
+        self.capacite_max = max(octets_max // (longueur * 2 * np.dtype(np.float32).itemsize), 1)
+        self.vider(min(capacite_initiale, self.capacite_max))
+
+    def vider(self, capacite=None):
+        """Oublie tous les véhicules (rechargement de la simulation)"""
+        capacite = capacite or len(self.ids)
+        self.positions = np.zeros((capacite, self.longueur, 2), dtype=np.float32)
+        self.ajouts = np.zeros(capacite, dtype=np.int64)  # Positions reçues ; la prochaine va en ajouts % longueur
+        self.actif = np.zeros(capacite, dtype=bool)
+        self.ids = [None] * capacite
+        self.emplacements = {}  # Véhicule -> emplacement
+        self.libres = list(range(capacite - 1, -1, -1))
+        self.refuses = 0  # Positions ignorées faute d'emplacement sous le plafond
+
+    @property
+    def octets(self):
+        return self.positions.nbytes
+
+    def __len__(self):
+        return len(self.emplacements)
+
+    def _agrandir(self):
+        ancienne = len(self.ids)
+        capacite = min(ancienne * 2, self.capacite_max)
+        if capacite == ancienne:
+            return False
+        positions = np.zeros((capacite, self.longueur, 2), dtype=np.float32)
+        positions[:ancienne] = self.positions
+        self.positions = positions
+        self.ajouts = np.concatenate([self.ajouts, np.zeros(capacite - ancienne, dtype=np.int64)])
+        self.actif = np.concatenate([self.actif, np.zeros(capacite - ancienne, dtype=bool)])
+        self.ids.extend([None] * (capacite - ancienne))
+        self.libres.extend(range(capacite - 1, ancienne - 1, -1))
+        return True
+
+    def _emplacement(self, veh_id):
+        emplacement = self.emplacements.get(veh_id)
+        if emplacement is None:
+            if not self.libres and not self._agrandir():
+                self.refuses += 1
+                return None
+            emplacement = self.libres.pop()
+            self.emplacements[veh_id] = emplacement
+            self.ids[emplacement] = veh_id
+            self.actif[emplacement] = True
+            self.ajouts[emplacement] = 0
+        return emplacement
+
+    def ajouter(self, ids, positions):
+        """Ajoute la position courante de chaque véhicule (positions : N x 2)"""
+        emplacements, lignes = [], []
+        for i, veh_id in enumerate(ids):
+            emplacement = self._emplacement(veh_id)
+            if emplacement is not None:
+                emplacements.append(emplacement)
+                lignes.append(i)
+        if not emplacements:
+            return
+        emplacements = np.array(emplacements)
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+        self.positions[emplacements, self.ajouts[emplacements] % self.longueur] = positions[lignes]
+        self.ajouts[emplacements] += 1
+
+    def liberer(self, ids):
+        """Rend les emplacements des véhicules arrivés"""
+        for veh_id in ids:
+            emplacement = self.emplacements.pop(veh_id, None)
+            if emplacement is not None:
+                self.actif[emplacement] = False
+                self.ids[emplacement] = None
+                self.libres.append(emplacement)
+
+    def actifs(self):
+        """Emplacements occupés"""
+        return np.flatnonzero(self.actif)
+
+    def trajectoires(self, emplacements=None):
+        """Positions de chaque emplacement occupé, de la plus ancienne à la plus récente (copies)"""
+        if emplacements is None:
+            emplacements = self.actifs()
+        if not len(emplacements):
+            return []
+        ajouts = self.ajouts[emplacements]
+        # Remet chaque tampon dans l'ordre chronologique en une seule indexation
+        ordre = (np.arange(self.longueur) + ajouts[:, None]) % self.longueur
+        ordonnees = self.positions[np.asarray(emplacements)[:, None], ordre]
+        n = np.minimum(ajouts, self.longueur)
+        return [t[self.longueur - k:] for t, k in zip(ordonnees, n)]
+
+    def dernieres_positions(self, emplacements=None):
+        """Dernière position de chaque emplacement occupé (N x 2)"""
+        if emplacements is None:
+            emplacements = self.actifs()
+        return self.positions[emplacements, (self.ajouts[emplacements] - 1) % self.longueur]
+
+    def vitesses(self, dt, emplacements=None):
+        """Vitesse (m/s) estimée sur les deux dernières positions de chaque emplacement occupé"""
+        if emplacements is None:
+            emplacements = self.actifs()
+        ajouts = self.ajouts[emplacements]
+        derniere = self.positions[emplacements, (ajouts - 1) % self.longueur]
+        precedente = self.positions[emplacements, (ajouts - 2) % self.longueur]
+        return np.where(ajouts >= 2, np.linalg.norm(derniere - precedente, axis=1) / dt, 0.0)
+
+    def items(self):
+        """(véhicule, trajectoire) des seuls véhicules en circulation"""
+        emplacements = self.actifs()
+        return zip([self.ids[e] for e in emplacements], self.trajectoires(emplacements))
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Indicateurs d'évaluation lus dans les fichiers de sortie de SUMO.
+
+Une évaluation n'a pas besoin d'accéder à la simulation à chaque pas : retard,
+files et débit se déduisent des sorties de SUMO (tripinfo, summary, laneData,
+edgeData, queue). Ce module active ces sorties, lance `sumo` seul (sans TraCI)
+et les lit en flux, en mémoire constante quelle que soit la durée simulée.
+
+Utilisation :
+    python indicateurs_sorties.py --seeds 0 1 2 --echelle 1.0
+    python indicateurs_sorties.py --lire sorties_evaluation/0123456789abcdef
+"""
+
+import os
+import csv
+import gzip
+import argparse
+import subprocess
+import xml.etree.ElementTree as ET
+
+from profils_simulation import binaire_profil, config_profil
+from scenarios_curriculum import fichier_reseau
+
+config_file = "osm.sumocfg"
+profil = "evaluation"
+DUREE_EVALUATION = 3600  # s simulées par évaluation
+
+# Fichiers de sortie activés, par option SUMO
+SORTIES = {
+    "tripinfo-output": "tripinfo.xml",
+    "summary-output": "summary.xml",
+    "lanedata-output": "lanedata.xml",
+    "edgedata-output": "edgedata.xml",
+    "queue-output": "queue.xml",
+}
+
+
+def options_sorties(dossier=None):
+    """Options SUMO qui écrivent toutes les sorties dans `dossier`
+
+    Sans dossier, les noms seuls sont renvoyés : c'est alors --output-prefix
+    (SumoEnv) qui les place.
+    """
+    return [arg for option, nom in SORTIES.items()
+            for arg in ("--" + option, os.path.join(dossier, nom) if dossier else nom)]
+
+
+def voies_controlees(net_file):
+    """Voies entrantes contrôlées par un feu, lues en flux dans le réseau"""
+    voies = set()
+    ouvrir = gzip.open if net_file.endswith(".gz") else open
+    with ouvrir(net_file, "rb") as f:
+        for _, element in ET.iterparse(f):
+            if element.tag == "connection" and element.get("tl"):
+                voies.add(f"{element.get('from')}_{element.get('fromLane')}")
+            if element.tag in ("edge", "junction", "connection", "tlLogic", "roundabout"):
+                element.clear()
+    return voies
+
+
+def lire_tripinfo(fichier):
+    """Retard, attente et durée moyens des trajets de véhicules terminés"""
+    n, retard, attente, duree = 0, 0.0, 0.0, 0.0
+    for _, element in ET.iterparse(fichier):
+        if element.tag == "tripinfo":
+            n += 1
+            retard += float(element.get("timeLoss", 0))
+            attente += float(element.get("waitingTime", 0))
+            duree += float(element.get("duration", 0))
+        element.clear()
+    if not n:
+        return {"trajets": 0, "retard_moyen": 0.0, "attente_moyenne": 0.0, "duree_moyenne": 0.0}
+    return {"trajets": n, "retard_moyen": retard / n, "attente_moyenne": attente / n, "duree_moyenne": duree / n}
+
+
+def lire_summary(fichier):
+    """Compteurs cumulés du dernier pas et moyennes du réseau sur la durée simulée"""
+    dernier, pas, arrets, vitesse = None, 0, 0.0, 0.0
+    for _, element in ET.iterparse(fichier):
+        if element.tag == "step":
+            pas += 1
+            arrets += float(element.get("halting", 0))
+            vitesse += max(float(element.get("meanSpeed", 0)), 0.0)  # -1 quand le réseau est vide
+            dernier = dict(element.attrib)
+        element.clear()
+    if dernier is None:
+        return {"duree_simulee": 0.0, "vehicules_arrives": 0, "teleportations": 0,
+                "arrets_reseau_moyens": 0.0, "vitesse_moyenne": 0.0}
+    return {
+        "duree_simulee": float(dernier["time"]),
+        "vehicules_arrives": int(dernier.get("arrived", dernier.get("ended", 0))),
+        "teleportations": int(dernier.get("teleports", 0)),
+        "arrets_reseau_moyens": arrets / pas,
+        "vitesse_moyenne": vitesse / pas,
+    }
+
+
+def lire_donnees_voies(fichier, voies=None):
+    """Cumul par voie des données agrégées (laneData) : attente, véhicules entrés, temps observé
+
+    Renvoie aussi la durée totale des intervalles lus.
+    """
+    table, duree = {}, 0.0
+    for _, element in ET.iterparse(fichier):
+        if element.tag == "lane":
+            voie = element.get("id")
+            if voies is None or voie in voies:
+                cumul = table.setdefault(voie, {"attente": 0.0, "entrees": 0.0, "temps_observe": 0.0})
+                cumul["attente"] += float(element.get("waitingTime", 0))
+                cumul["entrees"] += float(element.get("entered", 0))
+                cumul["temps_observe"] += float(element.get("sampledSeconds", 0))
+            element.clear()
+        elif element.tag == "edge":
+            element.clear()
+        elif element.tag == "interval":
+            duree += float(element.get("end")) - float(element.get("begin"))
+            element.clear()
+    return table, duree
+
+
+def lire_donnees_aretes(fichier):
+    """Cumul par arête des données agrégées (edgeData) : attente, véhicules entrés, vitesse pondérée"""
+    table = {}
+    for _, element in ET.iterparse(fichier):
+        if element.tag == "edge":
+            cumul = table.setdefault(element.get("id"), {"attente": 0.0, "entrees": 0.0, "temps_observe": 0.0,
+                                                          "distance": 0.0})
+            temps = float(element.get("sampledSeconds", 0))
+            cumul["attente"] += float(element.get("waitingTime", 0))
+            cumul["entrees"] += float(element.get("entered", 0))
+            cumul["temps_observe"] += temps
+            cumul["distance"] += float(element.get("speed", 0)) * temps
+            element.clear()
+        elif element.tag == "interval":
+            element.clear()
+    return table
+
+
+def lire_files(fichier, voies=None):
+    """Longueur de file (m) moyenne par pas et maximale, sur les voies retenues"""
+    pas, total, maximum = 0, 0.0, 0.0
+    for _, element in ET.iterparse(fichier):
+        if element.tag == "data":
+            longueur = sum(float(lane.get("queueing_length", 0)) for lane in element.iter("lane")
+                           if voies is None or lane.get("id") in voies)
+            pas += 1
+            total += longueur
+            maximum = max(maximum, longueur)
+            element.clear()
+    return {"longueur_file_moyenne": total / pas if pas else 0.0, "longueur_file_max": maximum}
+
+
+def ecrire_table_aretes(dossier, fichier="aretes.csv"):
+    """Table par arête (edgeData) : attente, véhicules entrés, vitesse moyenne pondérée"""
+    table = lire_donnees_aretes(os.path.join(dossier, SORTIES["edgedata-output"]))
+    chemin = os.path.join(dossier, fichier)
+    with open(chemin, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["arete", "attente", "entrees", "temps_observe", "vitesse_moyenne"])
+        for arete, d in sorted(table.items(), key=lambda item: -item[1]["attente"]):
+            vitesse = d["distance"] / d["temps_observe"] if d["temps_observe"] else 0.0
+            writer.writerow([arete, d["attente"], d["entrees"], d["temps_observe"], round(vitesse, 3)])
+    return chemin
+
+
+def indicateurs(dossier, voies=None):
+    """Table des indicateurs d'une évaluation à partir des sorties écrites dans `dossier`
+
+    `voies` restreint files et attentes aux voies contrôlées par les feux.
+    """
+    chemin = {option: os.path.join(dossier, nom) for option, nom in SORTIES.items()}
+    resume = lire_summary(chemin["summary-output"])
+    table, duree_voies = lire_donnees_voies(chemin["lanedata-output"], voies)
+    duree = max(resume["duree_simulee"], 1.0)
+    kpi = {
+        "retard_moyen": lire_tripinfo(chemin["tripinfo-output"])["retard_moyen"],
+        # Véhicules à l'arrêt sur les voies contrôlées, en moyenne par seconde simulée
+        "file_moyenne": sum(v["attente"] for v in table.values()) / max(duree_voies, 1.0),
+        "debit_horaire": resume["vehicules_arrives"] * 3600.0 / duree,
+        "teleportations": resume["teleportations"],
+        "vehicules_arrives": resume["vehicules_arrives"],
+    }
+    kpi.update(lire_files(chemin["queue-output"], voies))
+    kpi["vitesse_moyenne"] = resume["vitesse_moyenne"]
+    return kpi
+
+
+def evaluer_sans_traci(config, seed, echelle=1.0, duree=DUREE_EVALUATION, dossier="sorties_evaluation"):
+    """Simulation `sumo` seule (programmes des feux inchangés) puis lecture des sorties"""
+    os.makedirs(dossier, exist_ok=True)
+    subprocess.run([binaire_profil(profil), "-c", config_profil(profil, config),
+                    "--seed", str(seed), "--scale", str(echelle), "--end", str(duree)] + options_sorties(dossier),
+                   check=True, stdout=subprocess.DEVNULL)
+    return indicateurs(dossier, voies_controlees(fichier_reseau(config)))
+
+
+def afficher(kpi, titre=""):
+    print(titre + " ".join(f"{nom}={valeur:.2f}" for nom, valeur in kpi.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indicateurs d'évaluation lus dans les sorties SUMO")
+    parser.add_argument("--config", default=config_file)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--echelle", type=float, default=1.0)
+    parser.add_argument("--duree", type=float, default=DUREE_EVALUATION)
+    parser.add_argument("--lire", metavar="DOSSIER", default=None,
+                        help="lire les sorties d'une simulation déjà faite au lieu d'en lancer une")
+    args = parser.parse_args()
+
+    voies = voies_controlees(fichier_reseau(args.config))
+    if args.lire:
+        afficher(indicateurs(args.lire, voies))
+        print(f"Table par arête : {ecrire_table_aretes(args.lire)}")
+        return
+    for seed in args.seeds:
+        dossier = os.path.join("sorties_evaluation", f"sans_traci_{seed}_{args.echelle}")
+        afficher(evaluer_sans_traci(args.config, seed, args.echelle, args.duree, dossier), f"seed={seed} ")
+        ecrire_table_aretes(dossier)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Instantanés de simulation et passage par double tampon.
+
+Seul le fil de simulation parle à TraCI. À la fin d'un pas, il fige l'état
+utile à l'affichage (positions, vitesses, trajectoires, états des feux,
+séries temporelles) dans un Instantane immuable et le publie dans un
+DoubleTampon ; l'interface lit le dernier instantané publié à sa propre
+cadence, sans jamais appeler TraCI ni attendre la simulation.
+"""
+
+import time
+import threading
+from collections import namedtuple, deque
+
+import numpy as np
+
+from historique_trajectoires import HistoriqueTrajectoires
+
+LONGUEUR_TRAJECTOIRE = 100  # Positions gardées par véhicule
+LONGUEUR_SERIES = 1000  # Points gardés par série temporelle
+PERIODE_PUBLICATION = 1 / 30  # s entre deux instantanés : inutile de publier plus vite que l'écran
+
+Instantane = namedtuple("Instantane", ["numero", "temps", "vehicules", "positions", "vitesses",
+                                       "trajectoires", "feux", "etats_feux", "series", "extras"])
+DonneesStatiques = namedtuple("DonneesStatiques", ["segments", "feux", "limites"])
+
+
+def _fige(tableau):
+    tableau.setflags(write=False)
+    return tableau
+
+
+def donnees_statiques(conn):
+    """Réseau, positions des feux et limites : lus une fois, sur le fil de simulation"""
+    segments = tuple(_fige(np.array(conn.lane.getShape(lane))) for lane in conn.lane.getIDList()
+                     if not lane.startswith(":"))
+    feux = {tl_id: conn.junction.getPosition(tl_id) for tl_id in conn.trafficlight.getIDList()}
+    (xmin, ymin), (xmax, ymax) = conn.simulation.getNetBoundary()
+    return DonneesStatiques(segments, feux, (xmin, ymin, xmax, ymax))
+
+
+class DoubleTampon:
+    """Deux emplacements : le producteur écrit à l'arrière puis échange, le lecteur lit l'avant"""
+
+    def __init__(self):
+        self._tampons = [None, None]
+        self._avant = 0
+        self._verrou = threading.Lock()
+        self.statiques = None
+
+    def publier(self, instantane):
+        arriere = 1 - self._avant
+        self._tampons[arriere] = instantane
+        with self._verrou:
+            self._avant = arriere
+
+    def dernier(self):
+        """Dernier instantané publié (None avant le premier pas)"""
+        with self._verrou:
+            return self._tampons[self._avant]
+
+
+class CollecteurInstantanes:
+    """Côté simulation : suit véhicules et feux par abonnements et fabrique les instantanés"""
+
+    def __init__(self, conn, longueur_trajectoire=LONGUEUR_TRAJECTOIRE, longueur_series=LONGUEUR_SERIES):
+        import traci.constants as tc
+
+        self.conn = conn
+        self.tc = tc
+        self.feux = tuple(conn.trafficlight.getIDList())
+        for tl_id in self.feux:
+            conn.trafficlight.subscribe(tl_id, [tc.TL_RED_YELLOW_GREEN_STATE])
+        self.voies = tuple(dict.fromkeys(lane for tl_id in self.feux
+                                         for lane in conn.trafficlight.getControlledLanes(tl_id)))
+        for lane in self.voies:
+            conn.lane.subscribe(lane, [tc.LAST_STEP_VEHICLE_HALTING_NUMBER])
+        for veh_id in conn.vehicle.getIDList():
+            self._suivre(veh_id)
+
+        self.trajectoires = HistoriqueTrajectoires(longueur_trajectoire)
+        self.series = {nom: deque(maxlen=longueur_series) for nom in ("temps", "vehicules", "feux", "congestion")}
+        self.resultats = {}
+        self.numero = 0
+
+    def _suivre(self, veh_id):
+        self.conn.vehicle.subscribe(veh_id, [self.tc.VAR_POSITION, self.tc.VAR_SPEED])
+
+    def pas(self):
+        """À appeler après chaque simulationStep : met à jour trajectoires et séries"""
+        for veh_id in self.conn.simulation.getDepartedIDList():
+            self._suivre(veh_id)
+        self.trajectoires.liberer(self.conn.simulation.getArrivedIDList())
+        self.resultats = self.conn.vehicle.getAllSubscriptionResults()
+        self.trajectoires.ajouter(self.resultats, [r[self.tc.VAR_POSITION] for r in self.resultats.values()])
+
+        voies = self.conn.lane.getAllSubscriptionResults()
+        self.series["temps"].append(self.conn.simulation.getTime())
+        self.series["vehicules"].append(len(self.resultats))
+        self.series["feux"].append(len(self.feux))
+        self.series["congestion"].append(sum(r[self.tc.LAST_STEP_VEHICLE_HALTING_NUMBER] for r in voies.values()))
+        self.numero += 1
+
+    def fermer(self):
+        """Retire les abonnements : plus personne ne lit les instantanés"""
+        for veh_id in self.conn.vehicle.getIDList():
+            self.conn.vehicle.unsubscribe(veh_id)
+        for lane in self.voies:
+            self.conn.lane.unsubscribe(lane)
+        for tl_id in self.feux:
+            self.conn.trafficlight.unsubscribe(tl_id)
+
+    def instantane(self, trajectoires=True, extras=None):
+        """Copie immuable de l'état courant"""
+        ids = tuple(self.resultats)
+        positions = np.array([self.resultats[v][self.tc.VAR_POSITION] for v in ids], dtype=float).reshape(-1, 2)
+        vitesses = np.array([self.resultats[v][self.tc.VAR_SPEED] for v in ids], dtype=float)
+        etats = self.conn.trafficlight.getAllSubscriptionResults()
+        return Instantane(
+            numero=self.numero,
+            temps=self.series["temps"][-1] if self.series["temps"] else 0.0,
+            vehicules=ids,
+            positions=_fige(positions),
+            vitesses=_fige(vitesses),
+            trajectoires=tuple(_fige(t) for t in self.trajectoires.trajectoires()) if trajectoires else (),
+            feux=self.feux,
+            etats_feux=tuple(etats[tl_id][self.tc.TL_RED_YELLOW_GREEN_STATE] for tl_id in self.feux),
+            series={nom: _fige(np.array(valeurs)) for nom, valeurs in self.series.items()},
+            extras=dict(extras or {}),
+        )
+
+
+class Publication:
+    """Limite la fréquence des instantanés publiés (coût de copie borné, quelle que soit la vitesse)"""
+
+    def __init__(self, tampon, collecteur, periode=PERIODE_PUBLICATION):
+        self.tampon = tampon
+        self.collecteur = collecteur
+        self.periode = periode
+        self.derniere = 0.0
+
+    def pas(self, forcer=False, extras=None):
+        """`extras` : fonction renvoyant des données supplémentaires, appelée seulement si l'on publie"""
+        maintenant = time.perf_counter()
+        if forcer or maintenant - self.derniere >= self.periode:
+            self.tampon.publier(self.collecteur.instantane(extras=extras() if extras else None))
+            self.derniere = maintenant
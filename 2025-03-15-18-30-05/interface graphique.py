@@ -8,24 +8,65 @@ Created on Tue Apr  1 15:39:13 2025
 import sys
 import traci
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, 
-                             QWidget, QLabel, QPushButton, QScrollArea, QGroupBox)
-from PyQt5.QtCore import QTimer, Qt
+                             QWidget, QPushButton, QGroupBox, QCheckBox)
+from PyQt5.QtCore import QTimer, Qt, QThread
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import numpy as np
-from collections import deque
+
+from carte_blit import CarteBlit, CourbesTemps, couleur_feu
+from instantanes import CollecteurInstantanes, DoubleTampon, Publication, donnees_statiques
+from profils_simulation import commande_sumo
+from tables_qt import ModeleInstantane, TableFiltrable
+
+class SimulationWorker(QThread):
+    """Fil de simulation : seul à appeler TraCI, il publie un instantané à la fin des pas"""
+
+    def __init__(self, config_file, buffer):
+        super().__init__()
+        self.config_file = config_file
+        self.buffer = buffer
+        self.running = True
+        self.paused = False
+        self.step_requested = False
+
+    def run(self):
+        # Démarrer SUMO avec TraCI
+        try:
+            traci.start(commande_sumo("demo", self.config_file))
+        except Exception as e:
+            print(f"Erreur lors du démarrage de SUMO: {e}")
+            return
+        self.buffer.statiques = donnees_statiques(traci)
+        collector = CollecteurInstantanes(traci)
+        publication = Publication(self.buffer, collector)
+
+        while self.running:
+            if (self.paused and not self.step_requested) or traci.simulation.getMinExpectedNumber() == 0:
+                self.msleep(20)
+                continue
+            traci.simulationStep()
+            collector.pas()
+            # En pause (pas à pas), chaque pas est publié ; sinon au plus un instantané par image
+            publication.pas(forcer=self.step_requested)
+            self.step_requested = False
+
+        # Fermer proprement la simulation SUMO, sur le fil qui l'a ouverte
+        traci.close()
+
+    def stop(self):
+        self.running = False
+        self.wait()
 
 class SUMODashboard(QMainWindow):
     def __init__(self, config_file):
         super().__init__()
         self.config_file = config_file
         self.simulation_running = False
-        self.data_history = {
-            'vehicles': deque(maxlen=1000),
-            'traffic_lights': deque(maxlen=1000),
-            'positions': {}  # Pour stocker les positions historiques des véhicules
-        }
+        self.buffer = DoubleTampon()
+        self.static_ready = False
+        self.last_frame = -1  # Numéro du dernier instantané affiché
         
         self.initUI()
         self.initSimulation()
@@ -62,14 +103,19 @@ class SUMODashboard(QMainWindow):
         self.trafficlight_ax = self.trafficlight_fig.add_subplot(111)
         self.trafficlight_canvas = FigureCanvas(self.trafficlight_fig)
         left_layout.addWidget(self.trafficlight_canvas)
+
+        # Artistes persistants : la carte est redessinée par blitting, les courbes en place
+        self.position_map = CarteBlit(self.position_canvas, self.position_ax, 'Positions des Véhicules et Feux')
+        self.vehicle_curve = CourbesTemps(self.vehicle_canvas, self.vehicle_ax, ['b-'],
+                                          'Nombre de Véhicules au Cours du Temps', 'Temps (s)', 'Nombre de Véhicules')
+        self.trafficlight_curve = CourbesTemps(self.trafficlight_canvas, self.trafficlight_ax, ['r-'],
+                                               'Nombre de Feux de Signalisation Actifs', 'Temps (s)', 'Nombre de Feux')
         
         main_layout.addWidget(left_widget, 70)  # 70% de l'espace
         
-        # Partie droite - Informations et contrôles
-        right_widget = QScrollArea()
-        right_widget.setWidgetResizable(True)
-        right_content = QWidget()
-        right_layout = QVBoxLayout(right_content)
+        # Partie droite - Informations et contrôles (les tables défilent elles-mêmes)
+        right_widget = QWidget()
+        right_layout = QVBoxLayout(right_widget)
         
         # Contrôles
         control_group = QGroupBox("Contrôles de Simulation")
@@ -83,37 +129,44 @@ class SUMODashboard(QMainWindow):
         self.step_button.clicked.connect(self.step_simulation)
         control_layout.addWidget(self.step_button)
         
+        self.speed_map_cb = QCheckBox("Carte des vitesses (vue dense)")
+        self.speed_map_cb.stateChanged.connect(self.toggle_speed_map)
+        control_layout.addWidget(self.speed_map_cb)
+        
         control_group.setLayout(control_layout)
         right_layout.addWidget(control_group)
         
-        # Informations véhicules
+        # Informations véhicules : table virtualisée (seules les lignes visibles sont rendues)
         self.vehicle_group = QGroupBox("Informations Véhicules")
         self.vehicle_layout = QVBoxLayout()
+        self.vehicle_model = ModeleInstantane(["Véhicule", "X (m)", "Y (m)", "Vitesse (m/s)"],
+                                              ["{}", "{:.1f}", "{:.1f}", "{:.2f}"])
+        self.vehicle_layout.addWidget(TableFiltrable(self.vehicle_model, "Filtrer les véhicules..."))
         self.vehicle_group.setLayout(self.vehicle_layout)
-        right_layout.addWidget(self.vehicle_group)
+        right_layout.addWidget(self.vehicle_group, 2)
         
         # Informations feux
         self.trafficlight_group = QGroupBox("Informations Feux de Signalisation")
         self.trafficlight_layout = QVBoxLayout()
+        self.trafficlight_model = ModeleInstantane(["Feu", "X (m)", "Y (m)", "État"],
+                                                   ["{}", "{:.1f}", "{:.1f}", "{}"])
+        self.trafficlight_layout.addWidget(TableFiltrable(self.trafficlight_model, "Filtrer les feux..."))
         self.trafficlight_group.setLayout(self.trafficlight_layout)
-        right_layout.addWidget(self.trafficlight_group)
+        right_layout.addWidget(self.trafficlight_group, 1)
         
-        right_widget.setWidget(right_content)
         main_layout.addWidget(right_widget, 30)  # 30% de l'espace
         
-        # Timer pour la mise à jour des graphiques
+        # Timer pour la mise à jour des graphiques, à la cadence de l'interface (pas de la simulation)
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_plots)
-        self.timer.start(100)  # Rafraîchissement toutes les 100ms
+        self.timer.start(33)  # Environ 30 images par seconde
         
     def initSimulation(self):
-        # Démarrer SUMO avec TraCI
-        try:
-            traci.start(["sumo-gui", "-c", self.config_file])
-            self.simulation_running = True
-            self.start_button.setText("Pause Simulation")
-        except Exception as e:
-            print(f"Erreur lors du démarrage de SUMO: {e}")
+        # La simulation tourne sur son propre fil ; l'interface ne lit que les instantanés publiés
+        self.worker = SimulationWorker(self.config_file, self.buffer)
+        self.worker.start()
+        self.simulation_running = True
+        self.start_button.setText("Pause Simulation")
     
     def toggle_simulation(self):
         if self.simulation_running:
@@ -122,120 +175,46 @@ class SUMODashboard(QMainWindow):
         else:
             self.simulation_running = True
             self.start_button.setText("Pause Simulation")
+        self.worker.paused = not self.simulation_running
     
     def step_simulation(self):
-        self.run_simulation_step()
+        self.worker.step_requested = True
     
-    def run_simulation_step(self):
-        if not self.simulation_running:
-            return
-            
-        traci.simulationStep()
-        
-        # Récupérer les données des véhicules
-        vehicle_ids = traci.vehicle.getIDList()
-        vehicle_data = []
-        
-        # Effacer les anciennes informations
-        for i in reversed(range(self.vehicle_layout.count())): 
-            self.vehicle_layout.itemAt(i).widget().setParent(None)
-            
-        for veh_id in vehicle_ids:
-            position = traci.vehicle.getPosition(veh_id)
-            speed = traci.vehicle.getSpeed(veh_id)
-            vehicle_data.append((veh_id, position, speed))
-            
-            # Ajouter à l'historique des positions
-            if veh_id not in self.data_history['positions']:
-                self.data_history['positions'][veh_id] = deque(maxlen=100)
-            self.data_history['positions'][veh_id].append(position)
-            
-            # Afficher les informations dans le panneau
-            label = QLabel(f"{veh_id}: Pos={position}, Vitesse={speed:.2f}m/s")
-            self.vehicle_layout.addWidget(label)
-        
-        self.data_history['vehicles'].append((traci.simulation.getTime(), len(vehicle_ids)))
-        
-        # Récupérer les données des feux
-        traffic_light_ids = traci.trafficlight.getIDList()
-        traffic_light_data = []
-        
-        # Effacer les anciennes informations
-        for i in reversed(range(self.trafficlight_layout.count())): 
-            self.trafficlight_layout.itemAt(i).widget().setParent(None)
-            
-        for tl_id in traffic_light_ids:
-            position = traci.junction.getPosition(tl_id)
-            state = traci.trafficlight.getRedYellowGreenState(tl_id)
-            traffic_light_data.append((tl_id, position, state))
-            
-            # Afficher les informations dans le panneau
-            label = QLabel(f"{tl_id}: Pos={position}, État={state}")
-            self.trafficlight_layout.addWidget(label)
-        
-        self.data_history['traffic_lights'].append((traci.simulation.getTime(), len(traffic_light_ids)))
+    def toggle_speed_map(self, state):
+        # Quand la carte passe en densité : vitesse moyenne par case au lieu du nombre de véhicules
+        self.position_map.carte = "vitesse" if state == Qt.Checked else "densite"
     
     def update_plots(self):
-        if not self.simulation_running:
+        snapshot = self.buffer.dernier()
+        if snapshot is None or snapshot.numero == self.last_frame:
             return
-            
-        self.run_simulation_step()
-        
-        # Mettre à jour le graphique des positions
-        self.position_ax.clear()
-        
-        # Afficher les positions actuelles des véhicules
-        vehicle_ids = traci.vehicle.getIDList()
-        for veh_id in vehicle_ids:
-            position = traci.vehicle.getPosition(veh_id)
-            self.position_ax.plot(position[0], position[1], 'bo')
-            self.position_ax.text(position[0], position[1], veh_id, fontsize=8)
-            
-            # Afficher l'historique des positions
-            if veh_id in self.data_history['positions']:
-                positions = list(self.data_history['positions'][veh_id])
-                x = [p[0] for p in positions]
-                y = [p[1] for p in positions]
-                self.position_ax.plot(x, y, 'b-', alpha=0.3)
-        
-        # Afficher les feux de signalisation
-        traffic_light_ids = traci.trafficlight.getIDList()
-        for tl_id in traffic_light_ids:
-            position = traci.junction.getPosition(tl_id)
-            self.position_ax.plot(position[0], position[1], 'rs', markersize=10)
-            self.position_ax.text(position[0], position[1], tl_id, fontsize=8)
-        
-        self.position_ax.set_title('Positions des Véhicules et Feux')
-        self.position_ax.set_xlabel('X (m)')
-        self.position_ax.set_ylabel('Y (m)')
-        self.position_ax.grid(True)
-        self.position_canvas.draw()
-        
-        # Mettre à jour le graphique du nombre de véhicules
-        self.vehicle_ax.clear()
-        if self.data_history['vehicles']:
-            times, counts = zip(*self.data_history['vehicles'])
-            self.vehicle_ax.plot(times, counts, 'b-')
-            self.vehicle_ax.set_title('Nombre de Véhicules au Cours du Temps')
-            self.vehicle_ax.set_xlabel('Temps (s)')
-            self.vehicle_ax.set_ylabel('Nombre de Véhicules')
-            self.vehicle_ax.grid(True)
-            self.vehicle_canvas.draw()
-        
-        # Mettre à jour le graphique du nombre de feux
-        self.trafficlight_ax.clear()
-        if self.data_history['traffic_lights']:
-            times, counts = zip(*self.data_history['traffic_lights'])
-            self.trafficlight_ax.plot(times, counts, 'r-')
-            self.trafficlight_ax.set_title('Nombre de Feux de Signalisation Actifs')
-            self.trafficlight_ax.set_xlabel('Temps (s)')
-            self.trafficlight_ax.set_ylabel('Nombre de Feux')
-            self.trafficlight_ax.grid(True)
-            self.trafficlight_canvas.draw()
+        self.last_frame = snapshot.numero
+        static = self.buffer.statiques
+        if not self.static_ready:
+            # Fond statique de la carte : réseau, feux et limites, lus une seule fois par le fil de simulation
+            self.position_map.definir_fond(static.segments, static.feux, static.limites)
+            self.static_ready = True
+        
+        # Mettre à jour la carte : positions, trajectoires et états des feux de l'instantané
+        self.position_map.mettre_a_jour(snapshot.positions, snapshot.vehicules, snapshot.trajectoires,
+                                        [couleur_feu(state) for state in snapshot.etats_feux],
+                                        vitesses=snapshot.vitesses)
+        
+        # Afficher les informations dans les tables (mise à jour des modèles, aucun widget créé)
+        self.vehicle_model.mettre_a_jour(snapshot.vehicules, snapshot.positions[:, 0],
+                                         snapshot.positions[:, 1], snapshot.vitesses)
+        tl_positions = np.array([static.feux[tl_id] for tl_id in snapshot.feux], dtype=float).reshape(-1, 2)
+        self.trafficlight_model.mettre_a_jour(snapshot.feux, tl_positions[:, 0], tl_positions[:, 1],
+                                              snapshot.etats_feux)
+        
+        # Mettre à jour les courbes en place
+        series = snapshot.series
+        self.vehicle_curve.mettre_a_jour((series['temps'], series['vehicules']))
+        self.trafficlight_curve.mettre_a_jour((series['temps'], series['feux']))
     
     def closeEvent(self, event):
-        # Fermer proprement la simulation SUMO
-        traci.close()
+        self.timer.stop()
+        self.worker.stop()
         event.accept()
 
 if __name__ == '__main__':
@@ -247,4 +226,4 @@ if __name__ == '__main__':
     dashboard = SUMODashboard(config_file)
     dashboard.show()
     
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
\ No newline at end of file
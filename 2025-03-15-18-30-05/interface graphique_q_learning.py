@@ -9,21 +9,24 @@ import sys
 import traci
 import random
 import numpy as np
-from collections import defaultdict, deque
+from collections import defaultdict
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout,
                              QWidget, QLabel, QPushButton, QGroupBox, QScrollArea,
                              QComboBox, QSlider, QCheckBox)
-from PyQt5.QtCore import QTimer, Qt, QThread, pyqtSignal
+from PyQt5.QtCore import QTimer, Qt, QThread
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 
-class SimulationThread(QThread):
-    update_signal = pyqtSignal()
+from carte_blit import CarteBlit, CourbesTemps, couleur_feu
+from instantanes import CollecteurInstantanes, DoubleTampon, Publication, donnees_statiques
+from profils_simulation import commande_sumo
 
-    def __init__(self, config_file):
+class SimulationThread(QThread):
+    def __init__(self, config_file, buffer):
         super().__init__()
         self.config_file = config_file
+        self.buffer = buffer  # Seul lien avec l'interface : les instantanés publiés
         self.running = False
         self.paused = False
         self.speed = 1
@@ -31,21 +34,30 @@ class SimulationThread(QThread):
         self.alpha = 0.1
         self.gamma = 0.9
         self.epsilon = 0.1
+        self.action_count = defaultdict(int)  # Modifié par ce fil seulement ; copié dans les instantanés
 
     def run(self):
-        traci.start(["sumo-gui", "-c", self.config_file, "--start", "--quit-on-end"])
+        traci.start(commande_sumo("demo", self.config_file) + ["--start", "--quit-on-end"])
+        self.buffer.statiques = donnees_statiques(traci)
+        collector = CollecteurInstantanes(traci, longueur_trajectoire=10, longueur_series=100)
+        publication = Publication(self.buffer, collector)
         self.running = True
 
         while self.running:
-            if not self.paused:
+            if not self.paused and traci.simulation.getMinExpectedNumber() > 0:
                 for _ in range(self.speed):
                     traci.simulationStep()
                     self.run_qlearning_step()
-
-            self.update_signal.emit()
+                    collector.pas()
+                # Copies faites ici : l'interface ne lit jamais la table ni les compteurs en cours de modification
+                publication.pas(extras=lambda: {'q_table': {k: list(v) for k, v in self.q_table.items()},
+                                                'action_count': dict(self.action_count)})
 
             QThread.msleep(50)  # Réduire la charge CPU
 
+        # TraCI n'est utilisé que depuis ce fil, y compris pour la fermeture
+        traci.close()
+
     def run_qlearning_step(self):
         for tl_id in traci.trafficlight.getIDList():
             state = self.get_state(tl_id)
@@ -54,6 +66,7 @@ class SimulationThread(QThread):
             next_state = self.get_state(tl_id)
             reward = self.get_reward(tl_id)
             self.update_q_table(tl_id, state, action, reward, next_state)
+            self.action_count[int(action)] += 1
 
     def get_state(self, tl_id):
         return min(sum(traci.lane.getLastStepHaltingNumber(lane)
@@ -83,7 +96,6 @@ class SimulationThread(QThread):
     def stop(self):
         self.running = False
         self.wait()
-        traci.close()
 
 class TrafficDashboard(QMainWindow):
     def __init__(self, config_file):
@@ -95,10 +107,10 @@ class TrafficDashboard(QMainWindow):
         self.show_trajectories = True
         self.show_vehicle_ids = True
 
-        # Données pour visualisation
-        self.vehicle_history = defaultdict(lambda: deque(maxlen=10))
-        self.congestion_data = deque(maxlen=100)
-        self.action_data = deque(maxlen=100)
+        # Données pour visualisation : dernier instantané publié par le fil de simulation
+        self.buffer = DoubleTampon()
+        self.static_ready = False
+        self.last_frame = -1
 
         self.initUI()
         self.initThread()
@@ -129,6 +141,13 @@ class TrafficDashboard(QMainWindow):
         self.metrics_canvas = FigureCanvas(self.metrics_fig)
         left_layout.addWidget(self.metrics_canvas, 40)
 
+        # Artistes persistants : carte redessinée par blitting, courbe et barres mises à jour en place
+        self.traffic_map = CarteBlit(self.map_canvas, self.map_ax, 'Carte du Trafic en Temps Réel')
+        self.congestion_curve = CourbesTemps(self.metrics_canvas, self.congestion_ax, ['r-'], 'Congestion Totale')
+        self.action_bars = self.actions_ax.bar(['Maintien', 'Changement'], [0, 0])
+        self.actions_ax.set_title('Actions RL')
+        self.actions_ax.grid(True)
+
         main_layout.addWidget(left_widget, 70)
 
         # Partie droite - Contrôles (30%)
@@ -162,6 +181,10 @@ class TrafficDashboard(QMainWindow):
         self.ids_cb.stateChanged.connect(self.toggle_ids)
         control_layout.addWidget(self.ids_cb)
 
+        self.speed_map_cb = QCheckBox("Carte des vitesses (vue dense)")
+        self.speed_map_cb.stateChanged.connect(self.toggle_speed_map)
+        control_layout.addWidget(self.speed_map_cb)
+
         control_group.setLayout(control_layout)
         right_layout.addWidget(control_group)
 
@@ -183,6 +206,9 @@ class TrafficDashboard(QMainWindow):
         # Informations temps réel
         info_group = QGroupBox("Statistiques Temps Réel")
         self.info_layout = QVBoxLayout()
+        self.info_labels = [QLabel() for _ in range(3)]
+        for label in self.info_labels:
+            self.info_layout.addWidget(label)
         info_group.setLayout(self.info_layout)
         right_layout.addWidget(info_group)
 
@@ -196,8 +222,7 @@ class TrafficDashboard(QMainWindow):
         self.ui_timer.start(self.update_interval)
 
     def initThread(self):
-        self.sim_thread = SimulationThread(self.config_file)
-        self.sim_thread.update_signal.connect(self.update_data)
+        self.sim_thread = SimulationThread(self.config_file, self.buffer)
 
     def toggle_simulation(self):
         if not self.sim_thread.isRunning():
@@ -212,105 +237,69 @@ class TrafficDashboard(QMainWindow):
 
     def toggle_trajectories(self, state):
         self.show_trajectories = state == Qt.Checked
-        self.update_map()
+        self.update_map(self.buffer.dernier())
 
     def toggle_ids(self, state):
         self.show_vehicle_ids = state == Qt.Checked
-        self.update_map()
-
-    def update_data(self):
-        # Mettre à jour les données de visualisation
-        for veh_id in traci.vehicle.getIDList():
-            self.vehicle_history[veh_id].append(traci.vehicle.getPosition(veh_id))
-
-        # Calculer la congestion totale
-        congestion = sum(traci.lane.getLastStepHaltingNumber(lane)
-                         for tl in traci.trafficlight.getIDList()
-                         for lane in traci.trafficlight.getControlledLanes(tl))
-        self.congestion_data.append(congestion)
-
-        # Mettre à jour la liste des feux
-        current_tl = self.tl_combo.currentText()
-        self.tl_combo.clear()
-        self.tl_combo.addItems(traci.trafficlight.getIDList())
-        if current_tl in traci.trafficlight.getIDList():
-            self.tl_combo.setCurrentText(current_tl)
+        self.update_map(self.buffer.dernier())
 
-    def update_ui(self):
-        self.update_map()
-        self.update_metrics()
-        self.update_info()
-        self.update_q_info()
-
-    def update_map(self):
-        self.map_ax.clear()
-
-        # Afficher les véhicules
-        for veh_id, positions in self.vehicle_history.items():
-            if positions:
-                x, y = zip(*positions)
-                if self.show_trajectories and len(x) > 1:
-                    self.map_ax.plot(x, y, 'b-', alpha=0.3, linewidth=0.5)
-                self.map_ax.plot(x[-1], y[-1], 'bo', markersize=4)
-                if self.show_vehicle_ids:
-                    self.map_ax.text(x[-1], y[-1], veh_id, fontsize=6)
-
-        # Afficher les feux
-        for tl_id in traci.trafficlight.getIDList():
-            pos = traci.junction.getPosition(tl_id)
-            state = traci.trafficlight.getRedYellowGreenState(tl_id)
-            color = 'red' if 'r' in state else 'green'
-            self.map_ax.plot(pos[0], pos[1], 's', color=color, markersize=8)
-            self.map_ax.text(pos[0], pos[1], tl_id, fontsize=7)
+    def toggle_speed_map(self, state):
+        self.traffic_map.carte = "vitesse" if state == Qt.Checked else "densite"
+        self.update_map(self.buffer.dernier())
 
-        self.map_ax.set_title('Carte du Trafic en Temps Réel')
-        self.map_ax.grid(True)
-        self.map_canvas.draw()
+    def update_ui(self):
+        # Aucun appel TraCI ici : tout vient du dernier instantané publié
+        snapshot = self.buffer.dernier()
+        if snapshot is None or snapshot.numero == self.last_frame:
+            return
+        self.last_frame = snapshot.numero
+        if not self.static_ready:
+            # Fond de carte (réseau, feux, limites) et liste des feux, une seule fois
+            static = self.buffer.statiques
+            self.traffic_map.definir_fond(static.segments, static.feux, static.limites)
+            self.tl_combo.addItems(snapshot.feux)
+            self.static_ready = True
+        self.update_map(snapshot)
+        self.update_metrics(snapshot)
+        self.update_info(snapshot)
+        self.update_q_info(snapshot)
+
+    def update_map(self, snapshot):
+        if snapshot is None or not self.static_ready:
+            return
 
-    def update_metrics(self):
-        self.congestion_ax.clear()
-        self.actions_ax.clear()
+        # Véhicules et trajectoires : un nuage de points et une LineCollection
+        tl_colors = [couleur_feu(state) for state in snapshot.etats_feux]
+        self.traffic_map.mettre_a_jour(snapshot.positions, snapshot.vehicules,
+                                       snapshot.trajectoires if self.show_trajectories else (),
+                                       tl_colors, self.show_vehicle_ids, snapshot.vitesses)
 
+    def update_metrics(self, snapshot):
         # Graphique de congestion
-        if self.congestion_data:
-            self.congestion_ax.plot(self.congestion_data, 'r-')
-        self.congestion_ax.set_title('Congestion Totale')
-        self.congestion_ax.grid(True)
+        congestion = snapshot.series['congestion']
+        self.congestion_curve.mettre_a_jour((np.arange(len(congestion)), congestion))
 
         # Graphique d'actions (simplifié)
-        if hasattr(self.sim_thread, 'action_count'):
-            self.actions_ax.bar(['Maintien', 'Changement'],
-                                 [self.sim_thread.action_count.get(0, 0),
-                                  self.sim_thread.action_count.get(1, 0)])
-        self.actions_ax.set_title('Actions RL')
-        self.actions_ax.grid(True)
-
-        self.metrics_canvas.draw()
-
-    def update_info(self):
-        # Effacer les anciennes infos
-        for i in reversed(range(self.info_layout.count())):
-            item = self.info_layout.itemAt(i)
-            if item and item.widget():
-                item.widget().setParent(None)
-
-        # Ajouter les nouvelles infos
-        vehicles = traci.vehicle.getIDList()
-        self.info_layout.addWidget(QLabel(f"Véhicules actifs: {len(vehicles)}"))
-        self.info_layout.addWidget(QLabel(f"Feux contrôlés: {len(traci.trafficlight.getIDList())}"))
-
-        if vehicles:
-            sample_veh = vehicles[0]
-            speed = traci.vehicle.getSpeed(sample_veh)
-            self.info_layout.addWidget(QLabel(f"Exemple - {sample_veh}: {speed:.1f} m/s"))
-
-    def update_q_info(self):
+        if 'action_count' in snapshot.extras:
+            counts = [snapshot.extras['action_count'].get(0, 0), snapshot.extras['action_count'].get(1, 0)]
+            for bar, count in zip(self.action_bars, counts):
+                bar.set_height(count)
+            self.actions_ax.set_ylim(0, max(max(counts), 1) * 1.1)
+
+    def update_info(self, snapshot):
+        # Libellés persistants : seul leur texte change
+        vehicles = snapshot.vehicules
+        self.info_labels[0].setText(f"Véhicules actifs: {len(vehicles)}")
+        self.info_labels[1].setText(f"Feux contrôlés: {len(snapshot.feux)}")
+        self.info_labels[2].setText(f"Exemple - {vehicles[0]}: {snapshot.vitesses[0]:.1f} m/s" if vehicles else "")
+
+    def update_q_info(self, snapshot):
         tl_id = self.tl_combo.currentText()
         if not tl_id:
             return
 
         q_text = []
-        for (tid, state), values in self.sim_thread.q_table.items():
+        for (tid, state), values in snapshot.extras.get('q_table', {}).items():
             if tid == tl_id:
                 q_text.append(f"État {state}: Maintien={values[0]:.2f}, Changement={values[1]:.2f}")
 
@@ -326,4 +315,4 @@ if __name__ == '__main__':
     config_file = "osm.sumocfg"  # Remplacez par votre fichier de configuration
     dashboard = TrafficDashboard(config_file)
     dashboard.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
\ No newline at end of file
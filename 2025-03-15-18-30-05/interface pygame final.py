@@ -14,13 +14,24 @@ Created on Thu May 15 19:35:31 2025
 
 import pygame
 import sys
+import argparse
 import traci
 import random
 import numpy as np
-from collections import defaultdict, deque
+from collections import defaultdict
 import math
 from pygame.locals import *
 
+from profils_simulation import commande_sumo
+from cache_textes import CacheTextes, PlacementEtiquettes
+from carte_tuiles import geometrie_reseau, Vue, TuilesReseau
+from scenarios_curriculum import fichier_reseau
+from historique_trajectoires import HistoriqueTrajectoires
+from carte_densite import NiveauDetail, forme_grille, grille, couleurs, TAILLE_CASE, VIDE
+from canal_visualisation import Abonne, PORT
+from enregistrement import Enregistreur, Lecteur
+from agregats import FenetreGlissante
+
 # Configuration de Pygame
 pygame.init()
 info = pygame.display.Info()
@@ -46,9 +57,15 @@ font_medium = pygame.font.SysFont('Arial', 14)
 font_large = pygame.font.SysFont('Arial', 18, bold=True)
 font_title = pygame.font.SysFont('Arial', 24, bold=True)
 
+# Surfaces de texte déjà rendues (identifiants, libellés)
+textes = CacheTextes()
+
 class TrafficLightRL:
-    def __init__(self, config_file):
+    def __init__(self, config_file, record_file=None):
         self.config_file = config_file
+        self.record_file = record_file  # Enregistrement des pas pour relecture sans SUMO
+        self.recorder = None
+        self.last_actions = []
         self.running = False
         self.paused = False
         self.speed = 1
@@ -59,18 +76,28 @@ class TrafficLightRL:
         self.action_count = defaultdict(int)
         
         # Données pour visualisation
-        self.vehicle_history = defaultdict(lambda: deque(maxlen=10))
-        self.congestion_data = deque(maxlen=100)
-        self.reward_data = deque(maxlen=100)
+        self.vehicle_history = HistoriqueTrajectoires(longueur=10)
+        self.congestion_data = FenetreGlissante(100)
+        self.reward_data = FenetreGlissante(100)
         self.selected_tl = None
+        self.step_length = 1.0  # s par pas de simulation
     
     def start_simulation(self):
-        traci.start(["sumo-gui", "-c", self.config_file, "--start", "--quit-on-end"])
+        traci.start(commande_sumo("demo", self.config_file) + ["--start", "--quit-on-end"])
         self.running = True
         self.selected_tl = traci.trafficlight.getIDList()[0] if traci.trafficlight.getIDList() else None
+        self.step_length = traci.simulation.getDeltaT()
+        if self.record_file:
+            tl_ids = traci.trafficlight.getIDList()
+            self.recorder = Enregistreur(self.record_file, tl_ids,
+                                         {tl_id: traci.junction.getPosition(tl_id) for tl_id in tl_ids},
+                                         meta={"config": self.config_file})
     
     def stop_simulation(self):
         self.running = False
+        if self.recorder is not None:
+            self.recorder.fermer()
+            self.recorder = None
         traci.close()
     
     def step(self):
@@ -83,6 +110,7 @@ class TrafficLightRL:
             self.collect_visualization_data()
     
     def run_qlearning_step(self):
+        self.last_actions = []
         for tl_id in traci.trafficlight.getIDList():
             state = self.get_state(tl_id)
             action = self.choose_action(tl_id, state)
@@ -93,6 +121,7 @@ class TrafficLightRL:
             
             # Enregistrer l'action pour visualisation
             self.action_count[action] += 1
+            self.last_actions.append(action)
     
     def get_state(self, tl_id):
         return min(sum(traci.lane.getLastStepHaltingNumber(lane) 
@@ -120,19 +149,166 @@ class TrafficLightRL:
             reward + self.gamma * max_next_q - current_q)
     
     def collect_visualization_data(self):
-        # Historique des véhicules
-        for veh_id in traci.vehicle.getIDList():
-            self.vehicle_history[veh_id].append(traci.vehicle.getPosition(veh_id))
+        # Historique des véhicules : l'emplacement d'un véhicule arrivé est rendu
+        self.vehicle_history.liberer(traci.simulation.getArrivedIDList())
+        vehicle_ids = traci.vehicle.getIDList()
+        positions = [traci.vehicle.getPosition(veh_id) for veh_id in vehicle_ids]
+        self.vehicle_history.ajouter(vehicle_ids, positions)
         
         # Données de congestion
         congestion = sum(traci.lane.getLastStepHaltingNumber(lane)
                          for tl in traci.trafficlight.getIDList()
                          for lane in traci.trafficlight.getControlledLanes(tl))
-        self.congestion_data.append(congestion)
+        self.congestion_data.ajouter(congestion)
         
         # Données de récompense
         total_reward = sum(self.get_reward(tl_id) for tl_id in traci.trafficlight.getIDList())
-        self.reward_data.append(total_reward)
+        self.reward_data.ajouter(total_reward)
+        
+        # Enregistrement du pas (les vitesses ne sont lues que dans ce cas)
+        if self.recorder is not None:
+            self.recorder.ajouter(traci.simulation.getTime(), vehicle_ids, positions,
+                                  [traci.vehicle.getSpeed(veh_id) for veh_id in vehicle_ids],
+                                  [traci.trafficlight.getRedYellowGreenState(tl_id)
+                                   for tl_id in traci.trafficlight.getIDList()],
+                                  self.last_actions, total_reward, congestion)
+    
+    def traffic_lights(self):
+        """(id, position, état) de chaque feu"""
+        return [(tl_id, traci.junction.getPosition(tl_id), traci.trafficlight.getRedYellowGreenState(tl_id))
+                for tl_id in traci.trafficlight.getIDList()]
+
+class RemoteTrafficLight:
+    """Spectateur d'un entraînement lancé dans un autre processus (canal_visualisation).
+    
+    Même interface que TrafficLightRL pour le Dashboard, sans SUMO ni TraCI : chaque pas
+    lit la trame la plus récente publiée par le producteur, sans jamais le ralentir.
+    """
+    def __init__(self, config_file, port=PORT):
+        self.config_file = config_file  # Pour le fond de carte
+        self.abonne = Abonne(port=port)
+        self.running = False
+        self.paused = False
+        self.speed = 1
+        self.q_table = {}
+        self.action_count = defaultdict(int)
+        
+        # Données pour visualisation
+        self.vehicle_history = HistoriqueTrajectoires(longueur=10)
+        self.congestion_data = FenetreGlissante(100)
+        self.reward_data = FenetreGlissante(100)
+        self.selected_tl = None
+        self.step_length = 1.0  # s simulées entre deux trames reçues
+        self.last_time = None
+        self.lights = []
+    
+    def start_simulation(self):
+        self.running = True  # La connexion est (re)tentée à chaque pas tant qu'elle n'est pas établie
+    
+    def stop_simulation(self):
+        self.running = False
+        self.abonne.fermer()
+    
+    def step(self):
+        if not self.running or self.paused:
+            return
+        
+        message = self.abonne.recevoir()
+        self.q_table = self.abonne.q_table
+        if message is None:
+            return
+        
+        # Véhicules absents de la trame : arrivés depuis (éventuellement pendant des trames perdues)
+        vehicle_ids = message["vehicules"]
+        self.vehicle_history.liberer(set(self.vehicle_history.emplacements) - set(vehicle_ids))
+        self.vehicle_history.ajouter(vehicle_ids, message["positions"])
+        if self.last_time is not None and message["temps"] > self.last_time:
+            self.step_length = message["temps"] - self.last_time
+        self.last_time = message["temps"]
+        
+        self.congestion_data.ajouter(message["congestion"])
+        self.reward_data.ajouter(message["recompense"])
+        self.lights = [(tl_id, self.abonne.positions_feux[tl_id], state)
+                       for tl_id, state in zip(message["feux"], message["etats_feux"])
+                       if tl_id in self.abonne.positions_feux]
+        if self.selected_tl is None and message["feux"]:
+            self.selected_tl = message["feux"][0]
+    
+    def traffic_lights(self):
+        return self.lights
+
+class ReplayTrafficLight:
+    """Relecture d'un enregistrement (enregistrement.py) : même interface que TrafficLightRL, sans SUMO.
+    
+    Lecture, pause, avance rapide (le curseur de vitesse donne speed² pas par image) et
+    déplacement direct à un pas (seek), qui ne décode que le bloc concerné.
+    """
+    def __init__(self, record_file, config_file):
+        self.lecteur = Lecteur(record_file)
+        self.config_file = config_file  # Pour le fond de carte
+        self.running = False
+        self.paused = False
+        self.speed = 1
+        self.q_table = {}
+        self.action_count = defaultdict(int)
+        
+        # Données pour visualisation
+        self.vehicle_history = HistoriqueTrajectoires(longueur=10)
+        self.congestion_data = FenetreGlissante(100)
+        self.reward_data = FenetreGlissante(100)
+        self.selected_tl = self.lecteur.feux[0] if self.lecteur.feux else None
+        self.step_length = 1.0
+        self.last_time = None
+        self.position = 0  # Prochain pas à lire
+        self.lights = []
+    
+    def start_simulation(self):
+        self.running = True
+    
+    def stop_simulation(self):
+        self.running = False
+        self.lecteur.fermer()
+    
+    def step(self):
+        if not self.running or self.paused:
+            return
+        
+        fin = min(self.position + self.speed ** 2, len(self.lecteur))
+        for numero in range(self.position, fin):
+            # En avance rapide, seuls les derniers pas servent aux trajectoires affichées
+            self.apply(self.lecteur.pas(numero), fin - numero <= self.vehicle_history.longueur)
+        self.position = fin
+    
+    def seek(self, numero):
+        """Se place au pas `numero` et l'affiche, même en pause"""
+        numero = min(max(numero, 0), len(self.lecteur) - 1)
+        if numero < 0:
+            return
+        self.vehicle_history.vider()
+        self.congestion_data.vider()
+        self.reward_data.vider()
+        self.last_time = None
+        self.apply(self.lecteur.pas(numero))
+        self.position = numero + 1
+    
+    def apply(self, pas, trajectories=True):
+        if trajectories:
+            self.vehicle_history.liberer(set(self.vehicle_history.emplacements) - set(pas.vehicules))
+            self.vehicle_history.ajouter(pas.vehicules, pas.positions)
+            if self.last_time is not None and pas.temps > self.last_time:
+                self.step_length = pas.temps - self.last_time
+            self.last_time = pas.temps
+        self.congestion_data.ajouter(pas.congestion)
+        self.reward_data.ajouter(pas.recompense)
+        for action in pas.actions:
+            if action >= 0:
+                self.action_count[int(action)] += 1
+        self.lights = [(tl_id, self.lecteur.positions_feux[tl_id], state)
+                       for tl_id, state in zip(self.lecteur.feux, pas.etats_feux)
+                       if tl_id in self.lecteur.positions_feux]
+    
+    def traffic_lights(self):
+        return self.lights
 
 class Dashboard:
     def __init__(self, rl_controller):
@@ -140,6 +316,8 @@ class Dashboard:
         self.show_trajectories = True
         self.show_vehicle_ids = True
         self.show_congestion = True
+        self.show_speed_map = False
+        self.niveau_detail = NiveauDetail()  # Marqueurs ou carte de densité selon les véhicules visibles
         self.layout = "horizontal"  # or "vertical"
         
         # UI elements
@@ -149,6 +327,15 @@ class Dashboard:
         self.dropdowns = []
         
         self.init_ui()
+        
+        # Fond de carte : réseau rendu en tuiles, vue déplaçable (glisser) et zoomable (molette)
+        geometrie = geometrie_reseau(fichier_reseau(self.rl.config_file))
+        self.vue = Vue(geometrie.limites, self.map_rect())
+        self.tuiles = TuilesReseau(geometrie, self.vue.echelle_base)
+        self.tuiles.prerendre()
+        self.map_surface = None
+        self.drag = None
+        self.scrubbing = False
     
     def init_ui(self):
         # Créer les éléments UI
@@ -204,6 +391,15 @@ class Dashboard:
             "action": self.toggle_vehicle_ids
         }
         self.checkboxes.append(ids_cb)
+        
+        # Checkbox carte des vitesses (quand la vue est trop dense pour des marqueurs)
+        speed_cb = {
+            "rect": pygame.Rect(20, 180, 20, 20),
+            "checked": False,
+            "label": "Carte des vitesses",
+            "action": self.toggle_speed_map
+        }
+        self.checkboxes.append(speed_cb)
     
     def toggle_simulation(self):
         if not self.rl.running:
@@ -224,6 +420,9 @@ class Dashboard:
     def toggle_vehicle_ids(self, checked):
         self.show_vehicle_ids = checked
     
+    def toggle_speed_map(self, checked):
+        self.show_speed_map = checked
+    
     def handle_events(self):
         for event in pygame.event.get():
             if event.type == QUIT:
@@ -234,26 +433,58 @@ class Dashboard:
                 SCREEN_WIDTH, SCREEN_HEIGHT = event.size
                 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.RESIZABLE)
                 self.init_ui()  # Recalculer les positions des éléments UI
+                self.vue.redimensionner(self.map_rect())
             
             elif event.type == MOUSEBUTTONDOWN:
                 if event.button == 1:  # Clic gauche
-                    self.handle_click(event.pos)
+                    if not self.handle_click(event.pos) and self.map_rect().collidepoint(event.pos):
+                        self.drag = event.pos  # Début d'un déplacement de la carte
+            
+            elif event.type == MOUSEBUTTONUP:
+                if event.button == 1:
+                    self.drag = None
+                    self.scrubbing = False
+            
+            elif event.type == MOUSEMOTION:
+                if self.scrubbing:
+                    self.scrub(event.pos)
+                elif self.drag:
+                    self.vue.deplacer(event.pos[0] - self.drag[0], event.pos[1] - self.drag[1])
+                    self.drag = event.pos
+            
+            elif event.type == MOUSEWHEEL:
+                map_rect = self.map_rect()
+                pos = pygame.mouse.get_pos()
+                if map_rect.collidepoint(pos):
+                    self.vue.zoomer(event.y, (pos[0] - map_rect.x, pos[1] - map_rect.y))
+            
+            elif event.type == KEYDOWN:
+                if event.key == K_HOME:  # Retour à la vue d'ensemble
+                    self.vue.ajuster()
+                elif event.key in (K_LEFT, K_RIGHT) and hasattr(self.rl, "seek"):  # Relecture : ±100 pas
+                    self.rl.seek(self.rl.position - 1 + (100 if event.key == K_RIGHT else -100))
         
         return True
     
     def handle_click(self, pos):
+        # Barre de relecture
+        if hasattr(self.rl, "seek") and self.timeline_rect().collidepoint(pos):
+            self.scrubbing = True
+            self.scrub(pos)
+            return True
+        
         # Vérifier les boutons
         for btn in self.buttons:
             if btn["rect"].collidepoint(pos):
                 btn["action"]()
-                return
+                return True
         
         # Vérifier les checkboxes
         for cb in self.checkboxes:
             if cb["rect"].collidepoint(pos):
                 cb["checked"] = not cb["checked"]
                 cb["action"](cb["checked"])
-                return
+                return True
         
         # Vérifier les sliders
         for slider in self.sliders:
@@ -263,7 +494,20 @@ class Dashboard:
                 pos_in_slider = pos[0] - slider["rect"].x
                 slider["value"] = slider["min"] + int((pos_in_slider / slider["rect"].width) * value_range)
                 self.rl.speed = slider["value"]
-                return
+                return True
+        
+        return False
+    
+    def map_rect(self):
+        return pygame.Rect(20, 20, SCREEN_WIDTH - 320, SCREEN_HEIGHT - 200)
+    
+    def timeline_rect(self):
+        return pygame.Rect(SCREEN_WIDTH - 280, SCREEN_HEIGHT - 40, 260, 16)
+    
+    def scrub(self, pos):
+        rect = self.timeline_rect()
+        fraction = min(max((pos[0] - rect.x) / rect.width, 0.0), 1.0)
+        self.rl.seek(int(fraction * (len(self.rl.lecteur) - 1)))
     
     def draw(self):
         screen.fill(BACKGROUND)
@@ -284,14 +528,14 @@ class Dashboard:
         pygame.draw.rect(screen, BLACK, sidebar_rect, 2)
         
         # Titre
-        title = font_title.render("Contrôle RL", True, BLACK)
+        title = textes.rendre(font_title, "Contrôle RL", BLACK)
         screen.blit(title, (SCREEN_WIDTH - sidebar_width + 20, 20))
         
         # Dessiner les boutons
         for btn in self.buttons:
             pygame.draw.rect(screen, btn["color"], btn["rect"])
             pygame.draw.rect(screen, BLACK, btn["rect"], 2)
-            text = font_medium.render(btn["text"], True, BLACK)
+            text = textes.rendre(font_medium, btn["text"], BLACK)
             text_rect = text.get_rect(center=btn["rect"].center)
             screen.blit(text, text_rect)
         
@@ -305,7 +549,7 @@ class Dashboard:
             pygame.draw.rect(screen, BLUE, (slider["rect"].x, slider["rect"].y, value_pos, slider["rect"].height))
             
             # Texte du label
-            label = font_small.render(f"{slider['label']}: {slider['value']}", True, BLACK)
+            label = textes.rendre(font_small, f"{slider['label']}: {slider['value']}", BLACK)
             screen.blit(label, (slider["rect"].x, slider["rect"].y - 20))
         
         # Dessiner les checkboxes
@@ -319,72 +563,95 @@ class Dashboard:
                                 (cb["rect"].x + cb["rect"].width, cb["rect"].y), 2)
             
             # Texte du label
-            label = font_small.render(cb["label"], True, BLACK)
+            label = textes.rendre(font_small, cb["label"], BLACK)
             screen.blit(label, (cb["rect"].x + 30, cb["rect"].y))
         
+        # Barre de relecture : position dans l'enregistrement (clic ou glisser pour s'y rendre)
+        if hasattr(self.rl, "seek"):
+            rect = self.timeline_rect()
+            fraction = self.rl.position / max(len(self.rl.lecteur), 1)
+            pygame.draw.rect(screen, GRAY, rect)
+            pygame.draw.rect(screen, BLUE, (rect.x, rect.y, rect.width * fraction, rect.height))
+            pygame.draw.rect(screen, BLACK, rect, 1)
+            label = textes.rendre(font_small, f"Relecture : pas {self.rl.position}/{len(self.rl.lecteur)}, "
+                                              f"x{self.rl.speed ** 2}", BLACK)
+            screen.blit(label, (rect.x, rect.y - 20))
+        
         # Afficher les informations Q-learning
         if self.rl.running and self.rl.selected_tl:
             q_info = self.get_q_info()
             y_pos = 200
             for line in q_info.split('\n'):
-                text = font_small.render(line, True, BLACK)
+                text = textes.rendre(font_small, line, BLACK)
                 screen.blit(text, (SCREEN_WIDTH - sidebar_width + 20, y_pos))
                 y_pos += 20
     
     def draw_traffic_map(self):
-        map_width = SCREEN_WIDTH - 320
-        map_height = SCREEN_HEIGHT - 200
-        map_rect = pygame.Rect(20, 20, map_width, map_height)
+        map_rect = self.map_rect()
+        map_width, map_height = map_rect.size
         
-        # Créer une surface pour la carte avec transparence
-        map_surface = pygame.Surface((map_width, map_height), pygame.SRCALPHA)
-        map_surface.fill((240, 240, 240, 0))  # Fond transparent
+        # Surface de la carte, recréée seulement si la fenêtre change de taille
+        if self.map_surface is None or self.map_surface.get_size() != map_rect.size:
+            self.map_surface = pygame.Surface(map_rect.size).convert()
+        map_surface = self.map_surface
+        map_surface.fill(BACKGROUND)
+        
+        # Fond : une copie par tuile visible du réseau pré-rendu
+        self.tuiles.dessiner(map_surface, self.vue)
         
         # Dessiner le cadre de la carte
         pygame.draw.rect(map_surface, BLACK, (0, 0, map_width, map_height), 2)
         
+        # Étiquettes des véhicules : seulement celles qui tiennent dans la carte sans se chevaucher
+        etiquettes = PlacementEtiquettes((0, 0, map_width, map_height))
+        
         if self.rl.running:
             try:
-                # Dessiner les véhicules
-                for veh_id, positions in self.rl.vehicle_history.items():
-                    if positions:
-                        # Convertir les coordonnées SUMO en coordonnées écran
-                        screen_positions = []
-                        for x, y in positions:
-                            sx = (x / 1000) * (map_width - 40)
-                            sy = (y / 1000) * (map_height - 40)
-                            screen_positions.append((sx, sy))
+                # Niveau de détail : trop de véhicules visibles pour la carte -> densité par cases
+                historique = self.rl.vehicle_history
+                emplacements = historique.actifs()
+                ecran = self.vue.vers_ecran(historique.dernieres_positions(emplacements))
+                visibles = ((ecran[:, 0] >= 0) & (ecran[:, 0] < map_width)
+                            & (ecran[:, 1] >= 0) & (ecran[:, 1] < map_height))
+                if self.niveau_detail.choisir(np.count_nonzero(visibles), map_width, map_height):
+                    vitesses = historique.vitesses(self.rl.step_length, emplacements) if self.show_speed_map else None
+                    self.draw_density(map_surface, ecran[visibles], None if vitesses is None else vitesses[visibles])
+                else:
+                    # Marqueurs des seuls véhicules visibles : coût borné par la vue, pas par la ville
+                    choisis = emplacements[visibles]
+                    
+                    # Dessiner les trajectoires (une seule conversion pour toutes)
+                    if self.show_trajectories and len(choisis):
+                        trajectoires = historique.trajectoires(choisis)
+                        fins = np.cumsum([len(t) for t in trajectoires])[:-1]
+                        for screen_positions in np.split(self.vue.vers_ecran(np.concatenate(trajectoires)), fins):
+                            if len(screen_positions) > 1:
+                                pygame.draw.lines(map_surface, LIGHT_BLUE, False, screen_positions.tolist(), 1)
+                    
+                    # Dessiner les véhicules, aux positions écran déjà calculées
+                    for emplacement, (x, y) in zip(choisis, ecran[visibles].astype(int).tolist()):
+                        pygame.draw.circle(map_surface, BLUE, (x, y), 4)
                         
-                        # Dessiner les trajectoires
-                        if self.show_trajectories and len(screen_positions) > 1:
-                            pygame.draw.lines(map_surface, LIGHT_BLUE, False, screen_positions, 1)
-                        
-                        # Dessiner le véhicule
-                        if screen_positions:  # Vérifier que la liste n'est pas vide
-                            last_pos = screen_positions[-1]
-                            pygame.draw.circle(map_surface, BLUE, (int(last_pos[0]), int(last_pos[1])), 4)
-                            
-                            # Dessiner l'ID si activé
-                            if self.show_vehicle_ids:
-                                text = font_small.render(veh_id, True, BLACK)
-                                map_surface.blit(text, (last_pos[0] + 5, last_pos[1] - 5))
+                        # Dessiner l'ID si activé (mesure du texte seulement tant qu'il reste de la place)
+                        if self.show_vehicle_ids and not etiquettes.plein:
+                            veh_id = historique.ids[emplacement]
+                            rect = pygame.Rect((x + 5, y - 5), font_small.size(veh_id))
+                            if etiquettes.placer(rect):
+                                map_surface.blit(textes.rendre(font_small, veh_id, BLACK), rect)
 
                 # Dessiner les feux de signalisation
-                for tl_id in traci.trafficlight.getIDList():
+                for tl_id, position, state in self.rl.traffic_lights():
                     try:
-                        pos = traci.junction.getPosition(tl_id)
-                        sx = (pos[0] / 1000) * (map_width - 40)
-                        sy = (pos[1] / 1000) * (map_height - 40)
+                        sx, sy = self.vue.vers_ecran(position)[0]
                         
-                        # Obtenir l'état actuel du feu
-                        state = traci.trafficlight.getRedYellowGreenState(tl_id)
+                        # Couleur d'après l'état actuel du feu
                         color = RED if 'r' in state.lower() else GREEN
                         
                         # Dessiner le feu
                         pygame.draw.circle(map_surface, color, (int(sx), int(sy)), 8)
                         
                         # Dessiner l'ID
-                        text = font_small.render(tl_id, True, BLACK)
+                        text = textes.rendre(font_small, tl_id, BLACK)
                         map_surface.blit(text, (sx + 10, sy - 5))
                         
                         # Mettre en évidence le feu sélectionné
@@ -395,11 +662,28 @@ class Dashboard:
                         
             except:
                 # Gérer les erreurs de connexion avec TraCI
-                error_text = font_medium.render("En attente de connexion SUMO...", True, RED)
+                error_text = textes.rendre(font_medium, "En attente de connexion SUMO...", RED)
                 map_surface.blit(error_text, (map_width//2 - 100, map_height//2 - 10))
         
+        aide = textes.rendre(font_small, "Molette : zoom   Glisser : déplacer   Origine : vue d'ensemble", DARK_GRAY)
+        map_surface.blit(aide, (10, map_height - 20))
+        
         # Dessiner la surface de la carte sur l'écran principal
-        screen.blit(map_surface, (20, 20))
+        screen.blit(map_surface, map_rect)
+    
+    def draw_density(self, map_surface, points, vitesses=None):
+        """Carte de densité (ou de vitesse moyenne) par cases : coût borné par la taille de la carte"""
+        map_width, map_height = map_surface.get_size()
+        mode = "vitesse" if vitesses is not None else "densite"
+        forme = forme_grille(map_width, map_height)
+        taille = (forme[0] * TAILLE_CASE, forme[1] * TAILLE_CASE)
+        valeurs, comptes = grille(points, vitesses, (0, taille[0], 0, taille[1]), forme, mode)
+        image = pygame.transform.scale(pygame.surfarray.make_surface(couleurs(valeurs, comptes, mode)), taille)
+        image.set_colorkey(VIDE)  # Cases vides : le réseau reste visible
+        map_surface.blit(image, (0, 0))
+        
+        legende = "Vitesse moyenne par case" if mode == "vitesse" else "Densité de véhicules par case"
+        map_surface.blit(textes.rendre(font_small, legende, DARK_GRAY), (10, 10))
     
     def draw_metrics(self):
         metrics_y = SCREEN_HEIGHT - 170
@@ -412,7 +696,7 @@ class Dashboard:
         pygame.draw.rect(screen, BLACK, congestion_rect, 2)
         
         if len(self.rl.congestion_data) > 1:
-            max_congestion = max(self.rl.congestion_data) if max(self.rl.congestion_data) > 0 else 1
+            max_congestion = self.rl.congestion_data.max if self.rl.congestion_data.max > 0 else 1
             points = []
             for i, val in enumerate(self.rl.congestion_data):
                 x = 20 + i * (metrics_width // 2 - 30) / len(self.rl.congestion_data)
@@ -423,7 +707,7 @@ class Dashboard:
                 pygame.draw.lines(screen, RED, False, points, 2)
         
         # Titre
-        title = font_medium.render("Congestion Totale", True, BLACK)
+        title = textes.rendre(font_medium, "Congestion Totale", BLACK)
         screen.blit(title, (30, metrics_y + 10))
         
         # Graphique de récompense
@@ -432,8 +716,8 @@ class Dashboard:
         pygame.draw.rect(screen, BLACK, reward_rect, 2)
         
         if len(self.rl.reward_data) > 1:
-            min_reward = min(self.rl.reward_data)
-            max_reward = max(self.rl.reward_data) if max(self.rl.reward_data) != min_reward else min_reward + 1
+            min_reward = self.rl.reward_data.min
+            max_reward = self.rl.reward_data.max if self.rl.reward_data.max != min_reward else min_reward + 1
             points = []
             for i, val in enumerate(self.rl.reward_data):
                 x = metrics_width // 2 + 20 + i * (metrics_width // 2 - 30) / len(self.rl.reward_data)
@@ -444,7 +728,7 @@ class Dashboard:
                 pygame.draw.lines(screen, GREEN, False, points, 2)
         
         # Titre
-        title = font_medium.render("Récompense Totale", True, BLACK)
+        title = textes.rendre(font_medium, "Récompense Totale", BLACK)
         screen.blit(title, (metrics_width // 2 + 30, metrics_y + 10))
     
     def get_q_info(self):
@@ -461,8 +745,21 @@ class Dashboard:
 def main():
     config_file = "osm.sumocfg"  # Remplacez par votre fichier de configuration
     
-    # Initialiser le contrôleur RL
-    rl_controller = TrafficLightRL(config_file)
+    parser = argparse.ArgumentParser(description="Dashboard de contrôle RL des feux de signalisation")
+    parser.add_argument("--distant", action="store_true",
+                        help="Suivre un entraînement lancé dans un autre processus au lieu de lancer SUMO")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--enregistrer", metavar="FICHIER", help="Enregistrer la simulation pour la relire sans SUMO")
+    parser.add_argument("--relire", metavar="FICHIER", help="Relire un enregistrement au lieu de lancer SUMO")
+    args = parser.parse_args()
+    
+    # Initialiser le contrôleur RL (local, relecture, ou spectateur d'un entraînement distant)
+    if args.relire:
+        rl_controller = ReplayTrafficLight(args.relire, config_file)
+    elif args.distant:
+        rl_controller = RemoteTrafficLight(config_file, args.port)
+    else:
+        rl_controller = TrafficLightRL(config_file, args.enregistrer)
     
     # Initialiser le dashboard
     dashboard = Dashboard(rl_controller)
@@ -490,4 +787,4 @@ def main():
     sys.exit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -3,17 +3,23 @@
 Traffic Light RL Control Dashboard
 """
 
+import os
 import traci
 import random
 import numpy as np
 import pygame
 import sys
+from itertools import islice
 from pygame.locals import *
-from collections import deque
+from profils_simulation import commande_sumo
+from scenarios_curriculum import Curriculum, FICHIER_CURRICULUM
+from cache_textes import CacheTextes
+from agregats import FenetreGlissante, CompteursFeux, MoyenneMaxQ
 
 # Simulation parameters
 config_file = "osm.sumocfg"
 simulation_steps = 100000
+use_curriculum = False  # True: follow scenarios/curriculum.json (python scenarios_curriculum.py)
 
 # RL parameters
 alpha = 0.1
@@ -50,14 +56,19 @@ header_font = pygame.font.SysFont('Arial', 18, bold=True)
 normal_font = pygame.font.SysFont('Arial', 14)
 small_font = pygame.font.SysFont('Arial', 12)
 
+# Rendered text surfaces, reused across frames
+textes = CacheTextes()
+
 # Dashboard layout parameters
 MARGIN = 20
 PANEL_WIDTH = SCREEN_WIDTH // 3 - MARGIN * 1.5
 PANEL_HEIGHT = SCREEN_HEIGHT - MARGIN * 2
 
-# Data structures for visualization
+# Data structures for visualization, aggregated as data arrives
+HISTORY_LENGTH = 50
 congestion_history = {}
-decision_history = {}
+light_counters = CompteursFeux(HISTORY_LENGTH)
+q_summary = MoyenneMaxQ()
 
 def get_state(tl_id):
     """Get traffic light state (number of waiting vehicles)"""
@@ -106,6 +117,8 @@ def update_q_table(tl_id, state, action, reward, next_state):
 
     q_table[(tl_id, state)][action] = q_table[(tl_id, state)][action] + alpha * (
         reward + gamma * np.max(q_table[(tl_id, next_state)]) - q_table[(tl_id, state)][action])
+    q_summary.noter((tl_id, state), q_table[(tl_id, state)])
+    q_summary.noter((tl_id, next_state), q_table[(tl_id, next_state)])
 
 def draw_traffic_light_panel(tl_id, x, y, width, height):
     """Draw traffic light status panel"""
@@ -114,12 +127,12 @@ def draw_traffic_light_panel(tl_id, x, y, width, height):
     pygame.draw.rect(screen, BLACK, (x, y, width, height), 2)
     
     # Title
-    title = header_font.render(f"Traffic Light: {tl_id}", True, BLACK)
+    title = textes.rendre(header_font, f"Traffic Light: {tl_id}", BLACK)
     screen.blit(title, (x + 10, y + 10))
     
-    # Current state
-    state = get_state(tl_id)
-    state_text = normal_font.render(f"Waiting vehicles: {state}", True, BLACK)
+    # Current state (recorded at the last step, no SUMO query)
+    state = light_counters.attentes.get(tl_id, 0)
+    state_text = textes.rendre(normal_font, f"Waiting vehicles: {state}", BLACK)
     screen.blit(state_text, (x + 10, y + 40))
     
     # Light status visualization
@@ -137,11 +150,11 @@ def draw_traffic_light_panel(tl_id, x, y, width, height):
         pygame.draw.circle(screen, color, (light_x, y + 40 + i * 30), 10)
     
     # Congestion graph
-    congestion_title = normal_font.render("Congestion History:", True, BLACK)
+    congestion_title = textes.rendre(normal_font, "Congestion History:", BLACK)
     screen.blit(congestion_title, (x + 10, y + 80))
     
     if len(congestion_history[tl_id]) > 1:
-        max_congestion = max(congestion_history[tl_id]) if max(congestion_history[tl_id]) > 0 else 1
+        max_congestion = congestion_history[tl_id].max if congestion_history[tl_id].max > 0 else 1
         points = []
         for i, val in enumerate(congestion_history[tl_id]):
             x_pos = x + 10 + i * (width - 20) / len(congestion_history[tl_id])
@@ -152,13 +165,14 @@ def draw_traffic_light_panel(tl_id, x, y, width, height):
             pygame.draw.lines(screen, BLUE, False, points, 2)
     
     # Decision history
-    decision_title = normal_font.render("Recent Decisions:", True, BLACK)
+    decision_title = textes.rendre(normal_font, "Recent Decisions:", BLACK)
     screen.blit(decision_title, (x + 10, y + 170))
     
-    for i, decision in enumerate(list(decision_history[tl_id])[-5:]):
+    recent = list(islice(reversed(light_counters.decisions.get(tl_id, [])), 5))[::-1]  # Last 5, oldest first
+    for i, decision in enumerate(recent):
         action_text = "Changed" if decision else "Maintained"
         color = GREEN if decision else RED
-        text = small_font.render(action_text, True, color)
+        text = textes.rendre(small_font, action_text, color)
         screen.blit(text, (x + 10, y + 200 + i * 20))
 
 def draw_q_learning_panel(x, y, width, height):
@@ -168,7 +182,7 @@ def draw_q_learning_panel(x, y, width, height):
     pygame.draw.rect(screen, BLACK, (x, y, width, height), 2)
     
     # Title
-    title = header_font.render("RL Decision Making", True, BLACK)
+    title = textes.rendre(header_font, "RL Decision Making", BLACK)
     screen.blit(title, (x + 10, y + 10))
     
     # Parameters
@@ -179,20 +193,20 @@ def draw_q_learning_panel(x, y, width, height):
     ]
     
     for i, param in enumerate(params):
-        text = normal_font.render(param, True, BLACK)
+        text = textes.rendre(normal_font, param, BLACK)
         screen.blit(text, (x + 10, y + 40 + i * 25))
     
     # Q-table info
-    q_info = normal_font.render(f"States in Q-table: {len(q_table)}", True, BLACK)
+    q_info = textes.rendre(normal_font, f"States in Q-table: {len(q_table)}", BLACK)
     screen.blit(q_info, (x + 10, y + 120))
     
     # Example Q-values (show first few if available)
     if q_table:
-        example = normal_font.render("Example Q-values:", True, BLACK)
+        example = textes.rendre(normal_font, "Example Q-values:", BLACK)
         screen.blit(example, (x + 10, y + 150))
         
         for i, ((tl_id, state), actions) in enumerate(list(q_table.items())[:3]):
-            text = small_font.render(f"TL {tl_id}, State {state}: {actions}", True, BLUE)
+            text = textes.rendre(small_font, f"TL {tl_id}, State {state}: {actions}", BLUE)
             screen.blit(text, (x + 10, y + 180 + i * 20))
 
 def draw_performance_panel(x, y, width, height):
@@ -202,39 +216,32 @@ def draw_performance_panel(x, y, width, height):
     pygame.draw.rect(screen, BLACK, (x, y, width, height), 2)
     
     # Title
-    title = header_font.render("Performance Metrics", True, BLACK)
+    title = textes.rendre(header_font, "Performance Metrics", BLACK)
     screen.blit(title, (x + 10, y + 10))
     
-    # Calculate metrics
-    total_waiting = 0
-    total_changes = 0
-    for tl_id in traci.trafficlight.getIDList():
-        total_waiting += get_state(tl_id)
-        total_changes += sum(decision_history[tl_id])
-    
-    # Display metrics
+    # Metrics maintained at each step (no SUMO query, no history scan)
     metrics = [
-        f"Total Waiting Vehicles: {total_waiting}",
-        f"Total Light Changes: {total_changes}",
-        f"Average Congestion: {total_waiting / max(1, len(traci.trafficlight.getIDList())):.1f}"
+        f"Total Waiting Vehicles: {light_counters.attente_totale}",
+        f"Total Light Changes: {light_counters.changements}",
+        f"Average Congestion: {light_counters.attente_moyenne:.1f}"
     ]
     
     for i, metric in enumerate(metrics):
-        text = normal_font.render(metric, True, BLACK)
+        text = textes.rendre(normal_font, metric, BLACK)
         screen.blit(text, (x + 10, y + 40 + i * 25))
     
     # Learning progress (simple visualization)
-    progress_title = normal_font.render("Learning Progress:", True, BLACK)
+    progress_title = textes.rendre(normal_font, "Learning Progress:", BLACK)
     screen.blit(progress_title, (x + 10, y + 120))
     
     if q_table:
         # Simple measure of learning progress - average Q-value magnitude
-        avg_q = np.mean([np.max(values) for values in q_table.values()])
+        avg_q = q_summary.moyenne
         progress_width = min(width - 40, avg_q * 10)
         pygame.draw.rect(screen, LIGHT_BLUE, (x + 10, y + 150, progress_width, 20))
         pygame.draw.rect(screen, BLACK, (x + 10, y + 150, width - 40, 20), 1)
         
-        progress_text = small_font.render(f"Avg Q: {avg_q:.2f}", True, BLACK)
+        progress_text = textes.rendre(small_font, f"Avg Q: {avg_q:.2f}", BLACK)
         screen.blit(progress_text, (x + 10, y + 175))
 
 def draw_dashboard(step):
@@ -242,11 +249,11 @@ def draw_dashboard(step):
     screen.fill(GRAY)
     
     # Main title
-    title = title_font.render("Traffic Light Reinforcement Learning Control", True, BLACK)
+    title = textes.rendre(title_font, "Traffic Light Reinforcement Learning Control", BLACK)
     screen.blit(title, (MARGIN, MARGIN))
     
     # Simulation step
-    step_text = normal_font.render(f"Simulation Step: {step}/{simulation_steps}", True, BLACK)
+    step_text = textes.rendre(normal_font, f"Simulation Step: {step}/{simulation_steps}", BLACK)
     screen.blit(step_text, (SCREEN_WIDTH - 200, MARGIN))
     
     # Traffic light panels (2 columns)
@@ -287,15 +294,18 @@ def handle_events():
 
 # Main simulation loop
 def run_simulation():
-    traci.start(["sumo-gui", "-c", config_file])
+    # Follow the reduced-demand curriculum only when explicitly enabled
+    curriculum = Curriculum() if use_curriculum and os.path.exists(FICHIER_CURRICULUM) else None
+    level_config = curriculum.config if curriculum else config_file
+    traci.start(commande_sumo("demo", level_config))
     
     # Initialize visualization data structures
     for tl_id in traci.trafficlight.getIDList():
-        congestion_history[tl_id] = deque(maxlen=50)
-        decision_history[tl_id] = deque(maxlen=50)
+        congestion_history[tl_id] = FenetreGlissante(HISTORY_LENGTH)
     
     running = True
     step = 0
+    episode_reward = 0
     
     while step < simulation_steps and running:
         running = handle_events()
@@ -314,8 +324,17 @@ def run_simulation():
             update_q_table(tl_id, state, action, reward, next_state)
             
             # Update visualization data
-            congestion_history[tl_id].append(state)
-            decision_history[tl_id].append(action)
+            congestion_history[tl_id].ajouter(state)
+            light_counters.noter(tl_id, state, action)
+            episode_reward += reward
+        
+        # End of episode: the network has drained, reload (next level if the curriculum advances)
+        if traci.simulation.getMinExpectedNumber() == 0:
+            if curriculum is not None:
+                curriculum.rapporter(episode_reward)
+                level_config = curriculum.config
+            traci.load(commande_sumo("demo", level_config)[1:])
+            episode_reward = 0
         
         # Update dashboard every 10 steps for better performance
         if step % 10 == 0:
@@ -328,4 +347,4 @@ def run_simulation():
     sys.exit()
 
 if __name__ == "__main__":
-    run_simulation()
\ No newline at end of file
+    run_simulation()
\ No newline at end of file
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Profils de simulation générés à partir de osm.sumocfg.
+
+Chaque script choisit un profil par son nom au lieu de modifier le XML à la
+main :
+    - "entrainement" : sans interface, sans polygones ni verbose, pas de temps
+      et téléportation fixés ;
+    - "evaluation"   : sans interface, avec les sorties lues par
+      indicateurs_sorties.py (tripinfo, summary, laneData, edgeData, queue) ;
+    - "demo"         : sumo-gui avec les réglages de vue et les polygones.
+
+Chaque variante part de la configuration routée (cache_routes.py) : SUMO
+charge les .rou.xml précalculés au lieu de router les trips à chaque
+démarrage. Les variantes sont écrites à côté de cette configuration (les
+chemins relatifs restent valables) sous le nom <base>.profil_<nom>.sumocfg.
+Les détecteurs E2 (detecteurs_e2.py) ne sont ajoutés qu'à la demande
+(detecteurs=True), par les seuls scripts qui les lisent :
+<base>.profil_<nom>_e2.sumocfg.
+
+Utilisation :
+    python profils_simulation.py --mesurer 300
+"""
+
+import os
+import json
+import argparse
+import xml.etree.ElementTree as ET
+
+from detecteurs_e2 import detecteurs_config
+
+config_file = "osm.sumocfg"
+FICHIER_MESURES = "mesures_profils.json"
+
+PROFILS = {
+    "entrainement": {
+        "binaire": "sumo",
+        "polygones": False,
+        "retirer": ["verbose", "duration-log.statistics", "gui-settings-file"],
+        "options": {
+            "time": {"step-length": "1"},
+            "processing": {"time-to-teleport": "300"},
+            "report": {"no-step-log": "true", "no-warnings": "true"},
+        },
+    },
+    "evaluation": {
+        "binaire": "sumo",
+        "polygones": False,
+        "retirer": ["verbose", "gui-settings-file"],
+        "options": {
+            "processing": {"time-to-teleport": "300"},
+            "report": {"no-step-log": "true", "duration-log.statistics": "true"},
+            "output": {"tripinfo-output": "tripinfo.xml", "summary-output": "summary.xml",
+                       "lanedata-output": "lanedata.xml", "edgedata-output": "edgedata.xml",
+                       "queue-output": "queue.xml"},
+        },
+    },
+    "demo": {
+        "binaire": "sumo-gui",
+        "polygones": True,
+        "retirer": ["verbose"],
+        "options": {},
+    },
+}
+
+
+def _retirer_polygones(racine):
+    """Retire les fichiers de polygones des fichiers additionnels"""
+    for parent in racine.iter():
+        for element in list(parent):
+            if element.tag != "additional-files":
+                continue
+            fichiers = [f for f in element.get("value", "").split(",")
+                        if f.strip() and ".poly." not in os.path.basename(f)]
+            if fichiers:
+                element.set("value", ",".join(fichiers))
+            else:
+                parent.remove(element)
+
+
+def _definir_option(racine, section, nom, valeur):
+    """Fixe une option, dans sa section existante ou dans une nouvelle section"""
+    for element in racine.iter(nom):
+        element.set("value", valeur)
+        return
+    bloc = racine.find(section)
+    if bloc is None:
+        bloc = ET.SubElement(racine, section)
+    ET.SubElement(bloc, nom, value=valeur)
+
+
+def _ajouter_additionnel(racine, fichier):
+    """Ajoute un fichier aux fichiers additionnels de la configuration"""
+    for element in racine.iter("additional-files"):
+        element.set("value", ",".join(filter(None, [element.get("value"), fichier])))
+        return
+    _definir_option(racine, "input", "additional-files", fichier)
+
+
+def config_profil(nom, base=config_file, routes=True, detecteurs=False):
+    """Écrit (si besoin) la variante `nom` de la configuration et renvoie son chemin
+
+    `routes` : partir de la configuration aux routes précalculées plutôt que des trips.
+    `detecteurs` : ajouter les détecteurs E2 des voies contrôlées (coût à chaque pas).
+    """
+    if routes:
+        from cache_routes import config_routee
+
+        base = config_routee(base)
+    profil = PROFILS[nom]
+    arbre = ET.parse(base)
+    racine = arbre.getroot()
+    for option in profil["retirer"]:
+        for parent in list(racine.iter()):
+            for element in parent.findall(option):
+                parent.remove(element)
+    if not profil["polygones"]:
+        _retirer_polygones(racine)
+    if detecteurs:
+        dossier = os.path.dirname(os.path.abspath(base))
+        _ajouter_additionnel(racine, os.path.relpath(detecteurs_config(base), dossier))
+    for section, options in profil["options"].items():
+        for option, valeur in options.items():
+            _definir_option(racine, section, option, valeur)
+    for section in list(racine):
+        if len(section) == 0:
+            racine.remove(section)  # Section vidée (gui_only du profil sans interface...)
+    ET.indent(arbre, space="    ")
+
+    racine_nom, extension = os.path.splitext(base)
+    chemin = f"{racine_nom}.profil_{nom}{'_e2' if detecteurs else ''}{extension}"
+    contenu = ET.tostring(racine, encoding="unicode")
+    if os.path.exists(chemin):
+        with open(chemin, encoding="utf-8") as f:
+            if f.read() == contenu:
+                return chemin
+    # Écriture atomique : plusieurs environnements peuvent demander le même profil en même temps
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    with open(temporaire, "w", encoding="utf-8") as f:
+        f.write(contenu)
+    os.replace(temporaire, chemin)
+    return chemin
+
+
+def binaire_profil(nom):
+    """Exécutable SUMO associé au profil"""
+    return PROFILS[nom]["binaire"]
+
+
+def commande_sumo(nom, base=config_file, detecteurs=False):
+    """Commande de lancement de SUMO pour un profil : [binaire, "-c", config]"""
+    return [binaire_profil(nom), "-c", config_profil(nom, base, detecteurs=detecteurs)]
+
+
+def mesurer_profils(pas=300, base=config_file, profils=("entrainement", "evaluation")):
+    """Mesure démarrage et durée par pas de la base et des profils sans interface"""
+    from cache_routes import mesurer
+
+    mesures = {"base": mesurer(base, pas)}
+    for nom in profils:
+        mesures[nom] = mesurer(config_profil(nom, base), pas)
+    with open(FICHIER_MESURES, "w", encoding="utf-8") as f:
+        json.dump({nom: {"demarrage_s": d, "ms_par_pas": p * 1000} for nom, (d, p) in mesures.items()},
+                  f, indent=2)
+    return mesures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profils de simulation dérivés de la configuration de base")
+    parser.add_argument("--config", default=config_file)
+    parser.add_argument("--mesurer", type=int, metavar="PAS", default=0,
+                        help="mesurer démarrage et durée par pas de chaque profil")
+    args = parser.parse_args()
+
+    for nom in PROFILS:
+        print(f"{nom:<13} {binaire_profil(nom):<9} {config_profil(nom, args.config)}")
+    if args.mesurer:
+        mesures = mesurer_profils(args.mesurer, args.config)
+        demarrage_base, pas_base = mesures["base"]
+        for nom, (demarrage, duree_pas) in mesures.items():
+            print(f"{nom:<13} démarrage {demarrage:.2f}s ({demarrage / demarrage_base:.0%}), "
+                  f"{duree_pas * 1000:.2f} ms/pas ({duree_pas / pas_base:.0%})")
+        print(f"Mesures enregistrées dans {FICHIER_MESURES}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Scénarios à demande réduite et curriculum d'entraînement.
+
+Construit des variantes de la demande (10 %, 25 %, 50 %...) à partir des
+fichiers trips de osm.sumocfg par échantillonnage déterministe : un véhicule
+est conservé si l'empreinte de son identifiant est sous le seuil de l'échelle.
+Les variantes sont donc emboîtées (les 10 % font partie des 25 %). Chaque
+variante reçoit son propre .sumocfg, et curriculum.json décrit l'ordre des
+niveaux que SumoEnv et les boucles Q-learning suivent jusqu'à la demande
+complète.
+
+Utilisation :
+    python scenarios_curriculum.py --echelles 0.1 0.25 0.5 1.0
+"""
+
+import os
+import json
+import hashlib
+import argparse
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from cache_contenu import empreinte, empreinte_config
+
+config_file = "osm.sumocfg"
+DOSSIER_SCENARIOS = "scenarios"
+FICHIER_CURRICULUM = os.path.join(DOSSIER_SCENARIOS, "curriculum.json")
+ECHELLES = [0.1, 0.25, 0.5, 1.0]
+
+# Éléments de demande échantillonnés ; les autres (vType, route...) sont toujours conservés
+ELEMENTS_DEMANDE = {"trip", "vehicle", "flow", "person", "personFlow", "container", "containerFlow"}
+
+# Critères de passage au niveau suivant
+EPISODES_MIN = 5  # Épisodes minimum par niveau
+EPISODES_MAX = 50  # Passage forcé au-delà
+FENETRE = 3  # Épisodes comparés pour détecter le plateau
+TOLERANCE = 0.05  # Amélioration relative en dessous de laquelle on considère le plateau atteint
+
+
+def conserver(identifiant, echelle, seed):
+    """Tirage déterministe : même identifiant, même graine -> même décision"""
+    h = hashlib.sha256(f"{seed}:{identifiant}".encode("utf-8")).digest()
+    return int.from_bytes(h[:8], "big") / 2**64 < echelle
+
+
+def echantillonner_demande(source, destination, echelle, seed=0):
+    """Réécrit un fichier de demande en ne gardant qu'une fraction des éléments, en flux"""
+    conserves, total = 0, 0
+    with open(destination, "w", encoding="utf-8") as sortie:
+        sortie.write('<?xml version="1.0" encoding="UTF-8"?>\n\n')
+        sortie.write(f'<!-- échantillon {echelle:.0%} (graine {seed}) de {os.path.basename(source)} -->\n\n')
+        sortie.write("<routes>\n")
+        profondeur = 0
+        racine = None
+        for evenement, element in ET.iterparse(source, events=("start", "end")):
+            if evenement == "start":
+                if racine is None:
+                    racine = element
+                profondeur += 1
+                continue
+            profondeur -= 1
+            if profondeur != 1:
+                continue
+            if element.tag in ELEMENTS_DEMANDE:
+                total += 1
+                if not conserver(element.get("id"), echelle, seed):
+                    racine.clear()
+                    continue
+                conserves += 1
+            element.tail = None
+            sortie.write("    " + ET.tostring(element, encoding="unicode").strip() + "\n")
+            racine.clear()  # Mémoire constante quelle que soit la taille du fichier
+        sortie.write("</routes>\n")
+    return conserves, total
+
+
+def ecrire_config(base, destination, fichiers_routes):
+    """Copie de la configuration de base pointant vers les fichiers de demande donnés"""
+    dossier_base = os.path.dirname(os.path.abspath(base))
+    dossier = os.path.dirname(os.path.abspath(destination))
+    arbre = ET.parse(base)
+    for element in arbre.getroot().iter():
+        if element.tag == "route-files":
+            element.set("value", ",".join(os.path.relpath(f, dossier) for f in fichiers_routes))
+        elif element.tag in ("net-file", "additional-files", "gui-settings-file"):
+            valeurs = [os.path.relpath(os.path.join(dossier_base, v.strip()), dossier)
+                       for v in element.get("value").split(",") if v.strip()]
+            element.set("value", ",".join(valeurs))
+    arbre.write(destination, encoding="UTF-8", xml_declaration=True)
+
+
+def fichiers_routes(config):
+    """Fichiers de demande déclarés dans une configuration"""
+    element = ET.parse(config).getroot().find("input/route-files")
+    dossier = os.path.dirname(config)
+    return [os.path.join(dossier, v.strip()) for v in element.get("value").split(",") if v.strip()]
+
+
+def fichier_reseau(config):
+    """Réseau déclaré dans une configuration"""
+    valeur = ET.parse(config).getroot().find("input/net-file").get("value")
+    return os.path.join(os.path.dirname(config), valeur)
+
+
+def generer_scenario(echelle, seed=0, base=config_file, dossier=DOSSIER_SCENARIOS):
+    """Génère (ou réutilise) la variante de demande d'une échelle donnée"""
+    if echelle >= 1.0:
+        return {"echelle": 1.0, "config": base, "vehicules": None}
+    cle = empreinte(empreinte_config(base), echelle, seed)
+    dossier_scenario = os.path.join(dossier, f"demande_{int(round(echelle * 100)):03d}")
+    manifest_path = os.path.join(dossier_scenario, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["cle"] == cle:
+            return manifest["niveau"]
+
+    os.makedirs(dossier_scenario, exist_ok=True)
+    nouveaux, conserves, total = [], 0, 0
+    for source in fichiers_routes(base):
+        destination = os.path.join(dossier_scenario, os.path.basename(source))
+        c, t = echantillonner_demande(source, destination, echelle, seed)
+        conserves, total = conserves + c, total + t
+        nouveaux.append(destination)
+    config = os.path.join(dossier_scenario, os.path.basename(base))
+    ecrire_config(base, config, nouveaux)
+
+    niveau = {"echelle": echelle, "config": config, "vehicules": conserves, "vehicules_source": total}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"cle": cle, "niveau": niveau}, f, indent=2)
+    return niveau
+
+
+def generer_curriculum(echelles=ECHELLES, seed=0, base=config_file, fichier=FICHIER_CURRICULUM):
+    """Génère toutes les variantes et le programme de curriculum"""
+    niveaux = [generer_scenario(e, seed, base) for e in sorted(echelles)]
+    programme = {
+        "niveaux": niveaux,
+        "episodes_min": EPISODES_MIN,
+        "episodes_max": EPISODES_MAX,
+        "fenetre": FENETRE,
+        "tolerance": TOLERANCE,
+    }
+    os.makedirs(os.path.dirname(fichier), exist_ok=True)
+    with open(fichier, "w", encoding="utf-8") as f:
+        json.dump(programme, f, indent=2)
+    return programme
+
+
+class Curriculum:
+    """Suit la progression d'un agent à travers les niveaux de demande"""
+
+    def __init__(self, fichier=FICHIER_CURRICULUM):
+        with open(fichier, encoding="utf-8") as f:
+            programme = json.load(f)
+        self.niveaux = programme["niveaux"]
+        self.episodes_min = programme["episodes_min"]
+        self.episodes_max = programme["episodes_max"]
+        self.fenetre = programme["fenetre"]
+        self.tolerance = programme["tolerance"]
+        self.niveau = 0
+        self.recompenses = []
+
+    @property
+    def config(self):
+        return self.niveaux[self.niveau]["config"]
+
+    @property
+    def echelle(self):
+        return self.niveaux[self.niveau]["echelle"]
+
+    @property
+    def termine(self):
+        return self.niveau == len(self.niveaux) - 1
+
+    def rapporter(self, recompense_episode):
+        """Enregistre la récompense d'un épisode ; renvoie True si le niveau change"""
+        self.recompenses.append(recompense_episode)
+        n = len(self.recompenses)
+        if self.termine or n < self.episodes_min:
+            return False
+        plateau = False
+        if n >= 2 * self.fenetre:
+            recent = np.mean(self.recompenses[-self.fenetre:])
+            precedent = np.mean(self.recompenses[-2 * self.fenetre:-self.fenetre])
+            plateau = recent <= precedent + self.tolerance * abs(precedent)
+        if plateau or n >= self.episodes_max:
+            self.niveau += 1
+            self.recompenses = []
+            print(f"Curriculum : passage à {self.echelle:.0%} de la demande ({self.config})")
+            return True
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Variantes de demande réduite et curriculum")
+    parser.add_argument("--echelles", type=float, nargs="+", default=ECHELLES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--config", default=config_file)
+    args = parser.parse_args()
+    programme = generer_curriculum(args.echelles, args.seed, args.config)
+    for niveau in programme["niveaux"]:
+        vehicules = "demande complète" if niveau["vehicules"] is None else \
+            f"{niveau['vehicules']}/{niveau['vehicules_source']} éléments"
+        print(f"{niveau['echelle']:>5.0%} : {niveau['config']} ({vehicules})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import traci
 
+from profils_simulation import commande_sumo
+
 # Ajouter le chemin de SUMO à Python
 #sumo_path = "C:/Program Files (x86)/Eclipse/Sumo/tools"
 #sys.path.append(sumo_path)
@@ -8,7 +10,7 @@ import traci
 config_file = "osm.sumocfg"
 
 # Démarrer SUMO avec TraCI
-traci.start(["sumo-gui", "-c", config_file])  # Utilise "sumo" pour la version sans interface graphique
+traci.start(commande_sumo("demo", config_file))  # Profil "entrainement" pour la version sans interface graphique
 
 # Boucle de simulation
 step = True
@@ -39,4 +41,4 @@ while step:
     #step += 1
 
 # Fermer TraCI
-traci.close()
\ No newline at end of file
+traci.close()
\ No newline at end of file
@@ -15,10 +15,13 @@ sumo_path = "C:/Program Files (x86)/Eclipse/Sumo/tools"
 sys.path.append(sumo_path)
 
 import traci
+
+from profils_simulation import commande_sumo
+
 # Connexion à SUMO
-sumo_binary = "sumo-gui"  # ou "sumo" si vous ne voulez pas l'interface graphique
+profil = "demo"  # ou "entrainement" si vous ne voulez pas l'interface graphique
 sumo_config = "C:/Users/user/Sumo/2025-03-15-18-30-05/osm.sumocfg"
-traci.start([sumo_binary, "-c", sumo_config])
+traci.start(commande_sumo(profil, sumo_config))
 
 # Définir les phases du feu de signalisation
 PHASE_RED = 0
@@ -48,4 +51,4 @@ while traci.simulation.getMinExpectedNumber() > 0:
             traci.trafficlight.setPhase("feu_id", PHASE_RED)
 
 # Fermer la connexion à SUMO
-traci.close()
\ No newline at end of file
+traci.close()
\ No newline at end of file
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Tables Qt virtualisées sur les données du dernier pas de simulation.
+
+ModeleInstantane expose des colonnes (listes ou tableaux numpy) à un
+QTableView : la vue ne demande que les cellules visibles, et une mise à jour
+ne produit que des signaux d'insertion/suppression de lignes et un seul
+dataChanged sur la plage modifiée, sans créer ni détruire de widget.
+TableFiltrable ajoute tri par colonne et filtre texte (QSortFilterProxyModel).
+"""
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QTableView, QHeaderView, QAbstractItemView
+
+
+class ModeleInstantane(QAbstractTableModel):
+    """Modèle de table sur des colonnes de même longueur, remplacées à chaque pas"""
+
+    def __init__(self, entetes, formats=None, parent=None):
+        super().__init__(parent)
+        self.entetes = list(entetes)
+        self.formats = formats or ["{}"] * len(self.entetes)  # Un format d'affichage par colonne
+        self.colonnes = [[] for _ in self.entetes]
+        self.n_lignes = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.n_lignes
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entetes)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        valeur = self.colonnes[index.column()][index.row()]
+        if role == Qt.DisplayRole:
+            return self.formats[index.column()].format(valeur)
+        if role == Qt.UserRole:  # Valeur brute : tri numérique et non alphabétique
+            return valeur.item() if hasattr(valeur, "item") else valeur
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.entetes[section]
+        return None
+
+    def mettre_a_jour(self, *colonnes):
+        """Remplace les données par celles du dernier pas (une séquence par colonne)"""
+        n = len(colonnes[0]) if colonnes else 0
+        if n > self.n_lignes:
+            self.beginInsertRows(QModelIndex(), self.n_lignes, n - 1)
+            self.colonnes, self.n_lignes = list(colonnes), n
+            self.endInsertRows()
+        elif n < self.n_lignes:
+            self.beginRemoveRows(QModelIndex(), n, self.n_lignes - 1)
+            self.colonnes, self.n_lignes = list(colonnes), n
+            self.endRemoveRows()
+        else:
+            self.colonnes = list(colonnes)
+        if n:
+            # Une seule plage pour toutes les lignes conservées : la vue ne repeint que les cellules visibles
+            self.dataChanged.emit(self.index(0, 0), self.index(n - 1, len(self.entetes) - 1), [Qt.DisplayRole])
+
+
+class TableFiltrable(QWidget):
+    """QTableView triable, avec un champ de filtre sur la première colonne"""
+
+    def __init__(self, modele, texte_filtre="Filtrer...", parent=None):
+        super().__init__(parent)
+        self.modele = modele
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(modele)
+        self.proxy.setSortRole(Qt.UserRole)
+        self.proxy.setFilterKeyColumn(0)
+        self.proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+        self.filtre = QLineEdit()
+        self.filtre.setPlaceholderText(texte_filtre)
+        self.filtre.textChanged.connect(self.proxy.setFilterFixedString)
+
+        self.vue = QTableView()
+        self.vue.setModel(self.proxy)
+        self.vue.setSortingEnabled(True)
+        self.vue.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.vue.verticalHeader().setVisible(False)
+        self.vue.verticalHeader().setDefaultSectionSize(18)  # Hauteur fixe : pas de mesure ligne par ligne
+        self.vue.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.vue.horizontalHeader().setStretchLastSection(True)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.filtre)
+        layout.addWidget(self.vue)